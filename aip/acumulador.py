@@ -0,0 +1,165 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Dict, Sequence, Tuple
+import numpy as np
+if TYPE_CHECKING:
+    import pandas as pd
+
+class _Histograma:
+    # Histograma de ancho fijo con n_bins constantes: si llegan valores fuera del rango,
+    # se duplica el ancho fusionando pares de bins (la memoria no crece con los datos).
+    def __init__(self, n_bins:int=4096):
+        if n_bins < 2 or n_bins % 2: raise ValueError("n_bins debe ser par y >= 2")
+        self.n_bins = n_bins
+        self.cuentas = np.zeros(n_bins, dtype=np.int64)
+        self.lo = None
+        self.ancho = None
+
+    @property
+    def hi(self)->float:
+        return self.lo + self.n_bins*self.ancho
+
+    def _expandir(self, izquierda:bool)->None:
+        pares = self.cuentas.reshape(-1, 2).sum(axis=1)
+        nuevas = np.zeros_like(self.cuentas)
+        if izquierda:
+            nuevas[self.n_bins//2:] = pares
+            self.lo -= self.n_bins*self.ancho
+        else:
+            nuevas[:self.n_bins//2] = pares
+        self.cuentas = nuevas
+        self.ancho *= 2.0
+
+    def agregar(self, x: np.ndarray)->None:
+        if not x.size: return
+        mn, mx = float(x.min()), float(x.max())
+        if self.lo is None:
+            rango = mx - mn
+            if rango <= 0: rango = max(abs(mn), 1.0)*1e-6
+            self.lo = mn - 0.5*rango
+            self.ancho = 2.0*rango/self.n_bins
+        while mn < self.lo: self._expandir(izquierda=True)
+        while mx >= self.hi: self._expandir(izquierda=False)
+        idx = np.clip(((x - self.lo)/self.ancho).astype(np.int64), 0, self.n_bins-1)
+        self.cuentas += np.bincount(idx, minlength=self.n_bins)
+
+    def cdf(self, x) -> np.ndarray:
+        # fracción acumulada en x, interpolando linealmente dentro de cada bin
+        bordes = self.lo + self.ancho*np.arange(self.n_bins+1)
+        acum = np.concatenate([[0.0], np.cumsum(self.cuentas)]) / max(self.cuentas.sum(), 1)
+        return np.interp(x, bordes, acum)
+
+    def cuantil(self, p) -> np.ndarray:
+        bordes = self.lo + self.ancho*np.arange(self.n_bins+1)
+        acum = np.concatenate([[0.0], np.cumsum(self.cuentas)]) / max(self.cuentas.sum(), 1)
+        # np.interp requiere abscisas crecientes: se descartan los bins vacíos repetidos
+        _, primeros = np.unique(acum, return_index=True)
+        return np.interp(p, acum[primeros], bordes[primeros])
+
+class _Momentos:
+    def __init__(self):
+        self.n = 0; self.media = 0.0; self.m2 = 0.0
+        self.minimo = np.inf; self.maximo = -np.inf
+
+    def agregar(self, x: np.ndarray)->None:
+        # combinación por lotes de Chan et al. (Welford en paralelo)
+        nb = x.size
+        if not nb: return
+        mb = float(x.mean()); m2b = float(((x - mb)**2).sum())
+        n = self.n + nb
+        delta = mb - self.media
+        self.media += delta*nb/n
+        self.m2 += m2b + delta*delta*self.n*nb/n
+        self.n = n
+        self.minimo = min(self.minimo, float(x.min())); self.maximo = max(self.maximo, float(x.max()))
+
+    @property
+    def varianza(self)->float:
+        return self.m2/(self.n-1) if self.n > 1 else float("nan")
+
+class AcumuladorPSA:
+    # Resumen en streaming de los resultados del PSA con memoria fija:
+    # media y varianza exactas, percentiles aproximados y un histograma para graficar.
+    def __init__(self, variables: Sequence[str]=("AIP_total","SPF_final"),
+                 percentiles: Sequence[float]=(0.025, 0.5, 0.975), n_bins:int=4096):
+        self.variables = tuple(variables)
+        self.percentiles = tuple(percentiles)
+        self._momentos = {v: _Momentos() for v in self.variables}
+        self._hist = {v: _Histograma(n_bins) for v in self.variables}
+
+    @property
+    def n(self)->int:
+        return self._momentos[self.variables[0]].n
+
+    def actualizar(self, **valores: np.ndarray)->None:
+        for v in self.variables:
+            x = np.asarray(valores[v], dtype=float).ravel()
+            x = x[np.isfinite(x)]
+            self._momentos[v].agregar(x)
+            self._hist[v].agregar(x)
+
+    def media(self, var:str)->float:
+        return self._momentos[var].media
+
+    def desviacion(self, var:str)->float:
+        return float(np.sqrt(self._momentos[var].varianza))
+
+    def percentil(self, var:str, p:float)->float:
+        return float(self._hist[var].cuantil(p))
+
+    def error_estandar_media(self, var:str)->float:
+        m = self._momentos[var]
+        return float(np.sqrt(m.varianza/m.n)) if m.n > 1 else float("inf")
+
+    def error_estandar_percentil(self, var:str, p:float, delta:float=0.01)->float:
+        # EE asintótico sqrt(p(1-p)/n)/f(q_p), con 1/f(q_p) = dQ/dp estimada por diferencias
+        n = self.n
+        if n < 2: return float("inf")
+        lo, hi = max(p - delta, 0.0), min(p + delta, 1.0)
+        dq = (self.percentil(var, hi) - self.percentil(var, lo)) / (hi - lo)
+        return float(dq*np.sqrt(p*(1-p)/n))
+
+    def errores_estandar(self)->Dict[str, Dict[str, float]]:
+        return {v: {"media": self.error_estandar_media(v),
+                    **{f"{100*p:g}%": self.error_estandar_percentil(v, p) for p in self.percentiles}}
+                for v in self.variables}
+
+    def convergido(self, tolerancia:float)->bool:
+        return all(e <= tolerancia for ee in self.errores_estandar().values() for e in ee.values())
+
+    def histograma(self, var:str, nbins:int=50)->Tuple[np.ndarray, np.ndarray]:
+        # (bordes, probabilidad por bin) sobre [min, max] observados
+        m = self._momentos[var]
+        if m.n == 0: return np.array([]), np.array([])
+        bordes = np.linspace(m.minimo, m.maximo if m.maximo > m.minimo else m.minimo + 1.0, nbins+1)
+        acum = self._hist[var].cdf(bordes)
+        acum[0], acum[-1] = 0.0, 1.0   # min y max son exactos
+        return bordes, np.diff(acum)
+
+    def resumen(self)->pd.DataFrame:
+        import pandas as pd
+        filas = {}
+        for v in self.variables:
+            m = self._momentos[v]
+            fila = {"count": m.n, "mean": m.media, "std": self.desviacion(v), "min": m.minimo}
+            fila.update({f"{100*p:g}%": self.percentil(v, p) for p in self.percentiles})
+            fila.update({"max": m.maximo, "ee_media": self.error_estandar_media(v)})
+            filas[v] = fila
+        return pd.DataFrame.from_dict(filas, orient="index")
+
+    def estado(self)->dict:
+        # estado completo en tipos simples y arreglos (para guardar sin pickle, ver aip.sesion)
+        return {"variables": list(self.variables), "percentiles": list(self.percentiles),
+                "momentos": {v: vars(m).copy() for v,m in self._momentos.items()},
+                "hist": {v: {"n_bins": h.n_bins, "lo": h.lo, "ancho": h.ancho, "cuentas": h.cuentas}
+                         for v,h in self._hist.items()}}
+
+    @classmethod
+    def desde_estado(cls, estado: dict)->"AcumuladorPSA":
+        variables = estado["variables"]
+        acc = cls(variables, estado["percentiles"], int(estado["hist"][variables[0]]["n_bins"]))
+        for v in variables:
+            for k, x in estado["momentos"][v].items(): setattr(acc._momentos[v], k, x)
+            h, e = acc._hist[v], estado["hist"][v]
+            h.lo, h.ancho = e["lo"], e["ancho"]
+            h.cuentas = np.asarray(e["cuentas"], dtype=np.int64).copy()
+        return acc
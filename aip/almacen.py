@@ -0,0 +1,131 @@
+from __future__ import annotations
+import json, os, time
+from typing import Callable, Dict, Iterator, Optional, Union
+import numpy as np
+from .acumulador import AcumuladorPSA
+from .core import Inputs, InputsCompilados, _compilado, costos_lote, inputs_a_dict, inputs_desde_dict, resultados_lote
+from .perf import instrumentar
+from .muestreo import muestras_de_sorteos
+from .sensitivity import Progreso, _iterar_bloques_psa, _sorteos_bloque
+
+# Almacén en disco de un PSA: un .npy por variable con una fila por simulación, escrito por
+# bloques (open_memmap) a medida que se calculan, y meta.json con semilla, configuración y caso.
+#   parámetros muestreados: componentes (n, E, 3) antes del RR, rr (n,), shares_actual / shares_nuevo por
+#                           año (n, E, años; en cada periodo rige la del año, ver periodos_por_anio en
+#                           meta.json) y poblacion (n, T) solo si el RR se aplica a la población
+#   resultados por periodo: CA, CN, AIP, SPF (n, T)
+# Al releer, cada variable se abre con mmap: se consulta y se re-resume sin cargarla en memoria.
+
+VERSION_ALMACEN = 3
+
+def _psa_bloque_detalle(c: InputsCompilados, n:int, config:dict, semilla: np.random.SeedSequence, diseno=None):
+    sorteos = _sorteos_bloque(c, n, config, semilla, diseno)
+    muestras = muestras_de_sorteos(c, sorteos, config["aplicar_rr_en"])
+    CA, CN, _, _ = costos_lote(c, **muestras)
+    AIP, SPF = resultados_lote(c, CA, CN)
+    if config["aplicar_rr_en"] == "poblacion": sorteos["poblacion"] = muestras["poblacion"]
+    return {**sorteos, "CA": CA, "CN": CN, "AIP": AIP, "SPF": SPF}
+
+def _json_default(o):
+    if isinstance(o, np.generic): return o.item()
+    if isinstance(o, np.ndarray): return o.tolist()
+    raise TypeError(type(o).__name__)
+
+def _escribir_meta(directorio:str, meta:dict)->None:
+    tmp = os.path.join(directorio, "meta.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=1, default=_json_default)
+    os.replace(tmp, os.path.join(directorio, "meta.json"))
+
+class AlmacenPSA:
+    def __init__(self, directorio:str):
+        self.directorio = directorio
+        with open(os.path.join(directorio, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != VERSION_ALMACEN:
+            raise ValueError(f"Versión de almacén no soportada: {self.meta.get('version')}")
+        if not self.meta.get("completo"):
+            raise ValueError(f"El PSA en {directorio} no terminó ({self.meta.get('escritas', 0)} de {self.meta['nsims']} simulaciones)")
+
+    @property
+    def n(self)->int:
+        return int(self.meta["nsims"])
+
+    @property
+    def variables(self)->Dict[str, tuple]:
+        return {k: tuple(v["forma"]) for k,v in self.meta["variables"].items()}
+
+    def __getitem__(self, variable:str)->np.memmap:
+        if variable not in self.meta["variables"]: raise KeyError(variable)
+        return np.load(os.path.join(self.directorio, f"{variable}.npy"), mmap_mode="r")
+
+    def bloques(self, *variables:str, tam: Optional[int]=None)->Iterator[Dict[str, np.ndarray]]:
+        # vistas sobre el mmap de a `tam` filas (por defecto, el tamaño de bloque con que se escribió)
+        tam = tam or int(self.meta["tam_lote"])
+        arreglos = {v: self[v] for v in (variables or self.meta["variables"])}
+        for inicio in range(0, self.n, tam):
+            yield {v: a[inicio:inicio+tam] for v,a in arreglos.items()}
+
+    def resumir(self, filtro: Optional[Callable[[Dict[str, np.ndarray]], np.ndarray]]=None,
+                tam: Optional[int]=None, acumulador: Optional[AcumuladorPSA]=None)->AcumuladorPSA:
+        # Re-resume AIP_total y SPF_final recorriendo el mmap por bloques. filtro(bloque) -> máscara
+        # booleana de filas (p. ej. lambda b: b["componentes"][:, 0, 0] > 1000) para análisis condicionales.
+        acc = AcumuladorPSA() if acumulador is None else acumulador
+        for b in self.bloques(tam=tam):
+            aip, spf = b["AIP"].sum(axis=1), b["SPF"][:, -1]
+            if filtro is not None:
+                m = np.asarray(filtro(b), dtype=bool)
+                aip, spf = aip[m], spf[m]
+            if len(aip): acc.actualizar(AIP_total=aip, SPF_final=spf)
+        return acc
+
+    def inputs(self)->Optional[Inputs]:
+        return inputs_desde_dict(self.meta["inputs"]) if self.meta["inputs"] else None
+
+@instrumentar("psa_a_disco")
+def psa_a_disco(directorio:str, modelo, ins: Union[Inputs, InputsCompilados], nsims:int,
+                gamma_k_theta: Dict[str, tuple], dirichlet_alpha_actual, dirichlet_alpha_nuevo,
+                lognorm_rr=None, aplicar_rr_en="costos", tam_lote:int=50000, semilla=None,
+                n_workers:int=1, muestreo:str="mc", replicas:int=10, dtype="float64",
+                progreso: Optional[Progreso]=None)->AlmacenPSA:
+    # Mismos sorteos que psa_monte_carlo con los mismos argumentos (bloques y semillas idénticos).
+    # Con semilla=None se guarda la entropía usada, de modo que la corrida es reproducible.
+    if os.path.exists(os.path.join(directorio, "meta.json")):
+        raise FileExistsError(f"Ya existe un PSA en {directorio}")
+    os.makedirs(directorio, exist_ok=True)
+    c = _compilado(ins)
+    raiz = semilla if isinstance(semilla, np.random.SeedSequence) else np.random.SeedSequence(semilla)
+    config = dict(gamma_k_theta=gamma_k_theta, dirichlet_alpha_actual=dirichlet_alpha_actual,
+                  dirichlet_alpha_nuevo=dirichlet_alpha_nuevo, lognorm_rr=lognorm_rr, aplicar_rr_en=aplicar_rr_en)
+    meta = {"version": VERSION_ALMACEN, "completo": False, "creado": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "modelo": modelo, "nsims": int(nsims), "tam_lote": int(tam_lote), "muestreo": muestreo,
+            "replicas": int(replicas), "semilla": {"entropia": raiz.entropy, "spawn_key": list(raiz.spawn_key)},
+            "config": config, "estrategias": list(c.estrategias), "cohortes": list(c.cohortes),
+            "horizonte": c.horizonte, "periodos_por_anio": c.periodos_por_anio, "anios": c.anios,
+            "inputs": inputs_a_dict(ins) if isinstance(ins, Inputs) else None,
+            "variables": {}, "escritas": 0}
+    _escribir_meta(directorio, meta)
+    archivos: Dict[str, np.memmap] = {}
+    escritas = 0
+    bloques = _iterar_bloques_psa(c, nsims, config, raiz, tam_lote, n_workers, muestreo, replicas,
+                                  bloque=_psa_bloque_detalle)
+    try:
+        for datos in bloques:
+            n = len(datos["AIP"])
+            for k, v in datos.items():
+                if k not in archivos:
+                    forma = (int(nsims),) + tuple(np.shape(v)[1:])
+                    archivos[k] = np.lib.format.open_memmap(os.path.join(directorio, f"{k}.npy"), mode="w+",
+                                                            dtype=dtype, shape=forma)
+                    meta["variables"][k] = {"forma": list(forma), "dtype": str(np.dtype(dtype))}
+                archivos[k][escritas:escritas+n] = v
+            escritas += n
+            if progreso: progreso(escritas, nsims)
+    finally:
+        bloques.close()
+        for a in archivos.values(): a.flush()
+        archivos.clear()
+        meta["escritas"] = escritas
+        meta["completo"] = escritas == nsims
+        _escribir_meta(directorio, meta)
+    return AlmacenPSA(directorio)
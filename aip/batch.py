@@ -0,0 +1,165 @@
+from __future__ import annotations
+import argparse, csv, json, os, sys
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Iterator, Optional, Set
+import numpy as np
+from .core import compilar, ejecutar_modelo, inputs_a_dict, inputs_desde_dict
+from .sensitivity import _apply_change, psa_streaming
+
+# Ejecución por lotes sin Streamlit:
+#   python -m aip.batch escenarios.jsonl -o resultados.jsonl --base base.json --psa psa.json --workers 4
+# --base y --psa aceptan también una sesión guardada (.aip, ver aip.sesion).
+# Cada escenario es una línea JSON con "id", opcionalmente "modelo", "inputs" (caso completo) y/o
+# "cambios" ({campo: valor} con la sintaxis de la DSA, aplicados sobre "inputs" o sobre --base) y
+# "psa" (configuración propia). En CSV, cada fila tiene "id", opcionalmente "modelo", y una columna
+# por campo a cambiar sobre --base. Los resultados se escriben en JSON Lines a medida que terminan;
+# si la salida ya existe, se omiten los escenarios completados (reanudación) y se reintentan los que
+# fallaron, cuyo registro de error se descarta: queda un solo registro por id.
+
+MODELO_POR_DEFECTO = "Modelo 2"
+
+def leer_escenarios(ruta:str)->Iterator[dict]:
+    if ruta.lower().endswith(".csv"):
+        with open(ruta, newline="", encoding="utf-8") as f:
+            for n, fila in enumerate(csv.DictReader(f), start=1):
+                esc = {"id": fila.pop("id", None) or f"fila-{n}"}
+                modelo = fila.pop("modelo", None)
+                if modelo: esc["modelo"] = modelo
+                # los valores se convierten en evaluar_escenario: una celda inválida falla solo su fila
+                esc["cambios"] = {k: v for k,v in fila.items() if v not in (None, "")}
+                yield esc
+    else:
+        with open(ruta, encoding="utf-8") as f:
+            for n, linea in enumerate(f, start=1):
+                if not linea.strip(): continue
+                # una línea inválida falla solo su escenario (evaluar_escenario devuelve el error)
+                try:
+                    esc = json.loads(linea)
+                except json.JSONDecodeError as e:
+                    yield {"id": f"fila-{n}", "error_lectura": f"JSON inválido en la línea {n}: {e}"}
+                    continue
+                if not isinstance(esc, dict):
+                    yield {"id": f"fila-{n}", "error_lectura": f"La línea {n} no es un objeto JSON"}
+                    continue
+                esc.setdefault("id", f"fila-{n}")
+                yield esc
+
+def _completados(ruta_salida:str)->Set[str]:
+    # ids ya escritos sin error. Descarta una última línea truncada por una interrupción y los registros
+    # de error, que se reintentan (así un reintento no duplica el id en la salida). Se recorre línea a
+    # línea: en memoria queda solo el conjunto de ids, y la reescritura también es por líneas.
+    if not os.path.exists(ruta_salida): return set()
+    ids, reescribir = set(), False
+    with open(ruta_salida, "rb") as f:
+        for linea in f:
+            if not linea.endswith(b"\n"):
+                reescribir = True
+                break
+            if not linea.strip(): continue
+            r = json.loads(linea)
+            if "error" in r: reescribir = True
+            else: ids.add(str(r["id"]))
+    if reescribir:
+        tmp = f"{ruta_salida}.tmp"
+        with open(ruta_salida, "rb") as f, open(tmp, "wb") as out:
+            for linea in f:
+                if not linea.endswith(b"\n"): break
+                if linea.strip() and "error" not in json.loads(linea): out.write(linea)
+        os.replace(tmp, ruta_salida)
+    return ids
+
+def evaluar_escenario(esc: dict, base: Optional[dict]=None, psa: Optional[dict]=None,
+                      incluir_tabla:bool=True, psa_workers:int=1)->dict:
+    try:
+        if "error_lectura" in esc: raise ValueError(esc["error_lectura"])
+        datos = esc.get("inputs", base)
+        if datos is None: raise ValueError("El escenario no define 'inputs' y no se indicó --base")
+        ins = inputs_desde_dict(datos)
+        for campo, valor in (esc.get("cambios") or {}).items():
+            try:
+                valor = float(valor)
+            except (TypeError, ValueError):
+                raise ValueError(f"Valor no numérico para {campo}: {valor!r}") from None
+            _apply_change(ins, campo, valor)
+        modelo = esc.get("modelo", MODELO_POR_DEFECTO)
+        # se valida una vez; el modelo y el PSA reciben el caso compilado (ruta confiable)
+        ins.validate()
+        ins = compilar(ins)
+        res = ejecutar_modelo(modelo, ins, formato="arrays")
+        salida = {"id": str(esc["id"]), "modelo": modelo, "AIP_total": res["AIP_total"], "SPF_final": res["SPF_final"]}
+        if ins.tasa_descuento: salida["AIP_total_descontado"] = res["AIP_total_descontado"]
+        if incluir_tabla:
+            salida["tabla"] = {k: v.tolist() for k,v in res["tabla"].items()}
+        cfg = esc.get("psa", psa)
+        if cfg:
+            cfg = dict(cfg)
+            acc = psa_streaming(modelo, ins, int(cfg.pop("nsims")), cfg.pop("gamma_k_theta"),
+                                cfg.pop("dirichlet_alpha_actual"), cfg.pop("dirichlet_alpha_nuevo"),
+                                n_workers=psa_workers, **cfg)
+            salida["psa"] = acc.resumen().to_dict(orient="index")
+        return salida
+    except Exception as e:
+        return {"id": str(esc.get("id")), "error": f"{type(e).__name__}: {e}"}
+
+def _json_default(o):
+    if isinstance(o, np.generic): return o.item()
+    if isinstance(o, np.ndarray): return o.tolist()
+    raise TypeError(type(o).__name__)
+
+def ejecutar_lote(ruta_escenarios:str, ruta_salida:str, base: Optional[dict]=None, psa: Optional[dict]=None,
+                  workers:int=1, incluir_tabla:bool=True, psa_workers:int=1)->Dict[str, int]:
+    hechos = _completados(ruta_salida)
+    cuenta = {"ok": 0, "error": 0, "omitidos": 0}
+    def _pendientes():
+        for esc in leer_escenarios(ruta_escenarios):
+            if str(esc["id"]) in hechos:
+                cuenta["omitidos"] += 1
+                continue
+            yield esc
+    pendientes = _pendientes()
+    with open(ruta_salida, "a", encoding="utf-8") as out:
+        def _escribir(r: dict):
+            out.write(json.dumps(r, ensure_ascii=False, default=_json_default) + "\n")
+            out.flush()
+            cuenta["error" if "error" in r else "ok"] += 1
+        if workers <= 1:
+            for esc in pendientes:
+                _escribir(evaluar_escenario(esc, base, psa, incluir_tabla, psa_workers))
+            return cuenta
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            en_vuelo = set()
+            for esc in pendientes:
+                # se lee la entrada a medida que hay cupo: memoria acotada para archivos grandes
+                if len(en_vuelo) >= 2*workers:
+                    listos, en_vuelo = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                    for f in listos: _escribir(f.result())
+                en_vuelo.add(ex.submit(evaluar_escenario, esc, base, psa, incluir_tabla, psa_workers))
+            for f in wait(en_vuelo).done:
+                _escribir(f.result())
+    return cuenta
+
+def main(argv=None)->int:
+    ap = argparse.ArgumentParser(prog="python -m aip.batch", description="Evaluación por lotes de escenarios AIP")
+    ap.add_argument("escenarios", help="archivo .jsonl o .csv con un escenario por línea/fila")
+    ap.add_argument("-o", "--salida", required=True, help="archivo JSON Lines de resultados (se reanuda si existe)")
+    ap.add_argument("--base", help="JSON con el caso base (campos de Inputs) o sesión .aip, para escenarios con 'cambios' o CSV")
+    ap.add_argument("--psa", help="JSON con la configuración del PSA (nsims, gamma_k_theta, dirichlet_alpha_*, ...) o sesión .aip")
+    ap.add_argument("--workers", type=int, default=1, help="procesos para escenarios en paralelo (0 = todos los núcleos)")
+    ap.add_argument("--psa-workers", type=int, default=1, help="procesos por PSA dentro de cada escenario")
+    ap.add_argument("--sin-tabla", action="store_true", help="no incluir la tabla anual en la salida")
+    args = ap.parse_args(argv)
+    def _cargar(ruta, parte):
+        if not ruta: return None
+        if ruta.lower().endswith(".aip"):
+            from .sesion import cargar_sesion
+            s = cargar_sesion(ruta)
+            return inputs_a_dict(s.inputs) if parte == "base" else s.config.get("psa")
+        with open(ruta, encoding="utf-8") as f: return json.load(f)
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    cuenta = ejecutar_lote(args.escenarios, args.salida, _cargar(args.base, "base"), _cargar(args.psa, "psa"),
+                           workers, not args.sin_tabla, args.psa_workers)
+    print(f"ok={cuenta['ok']} error={cuenta['error']} omitidos={cuenta['omitidos']}", file=sys.stderr)
+    return 1 if cuenta["error"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+from __future__ import annotations
+import dataclasses, hashlib, inspect, json, os, pickle, threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+import numpy as np
+
+def _canonico(obj):
+    # Representación JSON estable: dataclasses por campos, claves ordenadas, números como float
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return {"__tipo__": type(obj).__name__,
+                **{f.name: _canonico(getattr(obj, f.name)) for f in dataclasses.fields(obj)}}
+    if isinstance(obj, dict):
+        return {str(k): _canonico(v) for k,v in sorted(obj.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(obj, (list, tuple)):
+        return [_canonico(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        return {"__shape__": list(obj.shape), "datos": _canonico(obj.ravel().tolist())}
+    if isinstance(obj, (bool, np.bool_)) or obj is None or isinstance(obj, str):
+        return obj if not isinstance(obj, np.bool_) else bool(obj)
+    if isinstance(obj, (int, float, np.integer, np.floating)):
+        return float(obj)
+    raise TypeError(f"No se puede generar clave para {type(obj).__name__}")
+
+def clave(*partes, **kw)->str:
+    texto = json.dumps(_canonico([list(partes), kw]), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+_SIN_SEMILLA = object()
+
+def _semilla(fn: Callable, args, kwargs):
+    # valor efectivo del argumento `semilla` de fn; _SIN_SEMILLA si fn no lo tiene
+    try:
+        ligados = inspect.signature(fn).bind(*args, **kwargs)
+    except (TypeError, ValueError):
+        return kwargs.get("semilla", _SIN_SEMILLA)    # firma no disponible o llamada inválida (fn la rechazará)
+    ligados.apply_defaults()
+    return ligados.arguments.get("semilla", kwargs.get("semilla", _SIN_SEMILLA))
+
+class CacheResultados:
+    # Caché LRU de resultados por clave de contenido, con tope de memoria y nivel en disco
+    # opcional. Los valores se guardan serializados: cada acierto devuelve una copia nueva.
+    # `version` entra en todas las claves: cambiarla invalida el nivel en disco tras cambios del modelo
+    def __init__(self, max_bytes:int=256*2**20, directorio: Optional[str]=None, version:str="1"):
+        self.max_bytes = int(max_bytes)
+        self.version = version
+        self.directorio = directorio
+        self._datos: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        if directorio: os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, k:str)->str:
+        return os.path.join(self.directorio, f"{k}.pkl")
+
+    def _guardar_memoria(self, k:str, datos: bytes)->None:
+        if k in self._datos:
+            self._bytes -= len(self._datos.pop(k))
+        if len(datos) > self.max_bytes: return
+        self._datos[k] = datos
+        self._bytes += len(datos)
+        while self._bytes > self.max_bytes:
+            _, viejo = self._datos.popitem(last=False)
+            self._bytes -= len(viejo)
+
+    def obtener(self, k:str)->Tuple[bool, Any]:
+        with self._lock:
+            datos = self._datos.get(k)
+            if datos is not None:
+                self._datos.move_to_end(k)
+            elif self.directorio and os.path.exists(self._ruta(k)):
+                with open(self._ruta(k), "rb") as f: datos = f.read()
+                self._guardar_memoria(k, datos)
+            if datos is None:
+                self.fallos += 1
+                return False, None
+            self.aciertos += 1
+        return True, pickle.loads(datos)
+
+    def guardar(self, k:str, valor)->None:
+        datos = pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._guardar_memoria(k, datos)
+            if self.directorio:
+                tmp = self._ruta(k) + f".{os.getpid()}.tmp"
+                with open(tmp, "wb") as f: f.write(datos)
+                os.replace(tmp, self._ruta(k))
+
+    def memo(self, fn: Callable, *args, **kwargs):
+        # Un PSA sin semilla no es reproducible: se calcula siempre, sin guardar. La semilla se resuelve
+        # con la firma de fn (posicional, por nombre u omitida con su valor por defecto).
+        if _semilla(fn, args, kwargs) is None:
+            return fn(*args, **kwargs)
+        # el número de workers no cambia el resultado del PSA (bloques con semilla propia) y el
+        # callback de avance tampoco
+        k = clave(self.version, f"{fn.__module__}.{fn.__qualname__}", *args,
+                  **{n:v for n,v in kwargs.items() if n not in ("n_workers", "progreso")})
+        hit, valor = self.obtener(k)
+        if hit: return valor
+        valor = fn(*args, **kwargs)
+        self.guardar(k, valor)
+        return valor
+
+    def limpiar(self)->None:
+        with self._lock:
+            self._datos.clear(); self._bytes = 0
+
+    @property
+    def bytes_en_memoria(self)->int:
+        return self._bytes
@@ -1,11 +1,12 @@
 
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import List, Dict, Literal, Optional
+from dataclasses import dataclass, asdict
+from typing import List, Dict, Literal, Optional, Tuple, Union
 import numpy as np
-import pandas as pd
+from .perf import instrumentar
 
 ModelType = Literal["Modelo 1","Modelo 2","Modelo 3","Modelo 4"]
+COMPONENTES_COSTO = ("costo_ts", "costo_procedimientos", "costo_eventos")
 
 @dataclass
 class Strategy:
@@ -43,62 +44,231 @@ class Inputs:
     saldo_inicial: float
     presupuesto_anual: List[float]
     otros_gastos_anuales: List[float]
+    # horizonte en años; las series por periodo tienen horizonte * periodos_por_anio valores
+    # (1 anual, 4 trimestral, 12 mensual). Tasa de descuento anual, 0 = sin descuento.
+    periodos_por_anio: int = 1
+    tasa_descuento: float = 0.0
 
-    def validate(self)->None:
-        T = self.horizonte
-        assert len(self.poblacion_objetivo)==T
-        assert len(self.cobertura_actual)==T and len(self.cobertura_nuevo)==T
-        assert len(self.presupuesto_anual)==T and len(self.otros_gastos_anuales)==T
-        for year in range(T):
-            sA = sum(self.shares_actual[e][year] for e in self.shares_actual)
-            sN = sum(self.shares_nuevo[e][year] for e in self.shares_nuevo)
-            if not np.isclose(sA,1.0, atol=1e-3): raise ValueError(f"shares_actual no suman 1 en año {year+1}")
-            if not np.isclose(sN,1.0, atol=1e-3): raise ValueError(f"shares_nuevo no suman 1 en año {year+1}")
+    @property
+    def n_periodos(self)->int:
+        return self.horizonte * self.periodos_por_anio
+
+    def errores(self)->List[str]:
+        # Todas las violaciones a la vez, con serie, estrategia y periodo (vacía si el caso es válido)
+        if int(self.periodos_por_anio) != self.periodos_por_anio or self.periodos_por_anio < 1:
+            return [f"periodos_por_anio debe ser un entero positivo ({self.periodos_por_anio})"]
+        T = self.n_periodos
+        unidad, periodo = ("años", "año") if self.periodos_por_anio == 1 else ("periodos", "periodo")
+        err = [] if self.tasa_descuento > -1 else [f"tasa_descuento debe ser mayor que -1 ({self.tasa_descuento})"]
+        err += [f"{campo}: {len(getattr(self, campo))} valores para un horizonte de {T} {unidad}"
+                for campo in ("poblacion_objetivo", "cobertura_actual", "cobertura_nuevo", "presupuesto_anual", "otros_gastos_anuales")
+               if len(getattr(self, campo)) != T]
+        nombres = {e.nombre for e in self.estrategias}
+        for serie in ("shares_actual", "shares_nuevo"):
+            shares = getattr(self, serie)
+            validas = []
+            for e, v in shares.items():
+                if e not in nombres: err.append(f"{serie}: estrategia desconocida '{e}'")
+                elif len(v) != T: err.append(f"{serie} '{e}': {len(v)} valores para un horizonte de {T} {unidad}")
+                else: validas.append(e)
+            m = np.array([shares[e] for e in validas], dtype=float).reshape(len(validas), T)
+            fuera = ~(np.isfinite(m) & (m >= 0) & (m <= 1))
+            err += [f"{serie} '{validas[i]}' {periodo} {t+1}: {m[i,t]:g} fuera de [0, 1]" for i,t in zip(*np.nonzero(fuera))]
+            suma = m.sum(axis=0)
+            err += [f"{serie} no suman 1 en {periodo} {t+1} (suma {suma[t]:.4f})"
+                    for t in np.flatnonzero(~np.isclose(suma, 1.0, atol=1e-3))]
         sw = sum(c.peso for c in self.cohortes)
-        if not np.isclose(sw,1.0, atol=1e-6): raise ValueError("La suma de pesos de cohortes debe ser 1.0")
-
-def _costo_promedio_por_escenario(ins: Inputs, shares: Dict[str,List[float]], cobertura: List[float]) -> np.ndarray:
-    T = ins.horizonte
-    estrategias_map = {e.nombre: e for e in ins.estrategias}
-    vals = []
-    for t in range(T):
-        total = 0.0
-        for coh in ins.cohortes:
-            costo_coh = 0.0
-            for estr, sh in shares.items():
-                e = estrategias_map[estr]
-                costo_coh += sh[t] * e.costo_paciente_para_cohorte(coh.nombre)
-            total += coh.peso * costo_coh
-        vals.append(total * cobertura[t])
-    return np.array(vals)
-
-def costos_agregados(modelo: ModelType, ins: Inputs):
-    ins.validate()
-    N = np.array(ins.poblacion_objetivo, dtype=float)
-    costo_pp_actual = _costo_promedio_por_escenario(ins, ins.shares_actual, ins.cobertura_actual)
-    costo_pp_nuevo  = _costo_promedio_por_escenario(ins, ins.shares_nuevo,  ins.cobertura_nuevo)
-    CA = (costo_pp_actual * N).tolist()
-    CN = (costo_pp_nuevo  * N).tolist()
-    return CA, CN, costo_pp_actual, costo_pp_nuevo
-
-def ejecutar_modelo(modelo: ModelType, ins: Inputs):
-    CA, CN, cpa, cpn = costos_agregados(modelo, ins)
-    AIP = (np.array(CN) - np.array(CA)).tolist()
-    SPF = []
-    sp = float(ins.saldo_inicial)
-    for t in range(ins.horizonte):
-        sp = sp + ins.presupuesto_anual[t] - ins.otros_gastos_anuales[t] - CN[t]
-        SPF.append(sp)
-    df = pd.DataFrame({
-        "Año": np.arange(1, ins.horizonte+1),
-        "N_t": ins.poblacion_objetivo,
-        "Cobertura_actual": ins.cobertura_actual,
-        "Cobertura_nuevo": ins.cobertura_nuevo,
+        if not np.isclose(sw,1.0, atol=1e-6): err.append(f"La suma de pesos de cohortes debe ser 1.0 (suma {sw:.6f})")
+        return err
+
+    @instrumentar("Inputs.validate")
+    def validate(self)->None:
+        err = self.errores()
+        if len(err) == 1: raise ValueError(err[0])
+        if err: raise ValueError(f"{len(err)} errores de validación:\n" + "\n".join(f"- {e}" for e in err))
+
+def inputs_a_dict(ins: Inputs)->dict:
+    return asdict(ins)
+
+def inputs_desde_dict(d: dict)->Inputs:
+    d = dict(d)
+    d["cohortes"] = [c if isinstance(c, Cohorte) else Cohorte(**c) for c in d["cohortes"]]
+    d["estrategias"] = [e if isinstance(e, Strategy) else Strategy(**{**e, "multiplicador_cohortes": dict(e["multiplicador_cohortes"]) if e.get("multiplicador_cohortes") else None})
+                        for e in d["estrategias"]]
+    for k in ("shares_actual", "shares_nuevo"):
+        d[k] = {e: [float(x) for x in v] for e,v in d[k].items()}
+    for k in ("poblacion_objetivo", "cobertura_actual", "cobertura_nuevo", "presupuesto_anual", "otros_gastos_anuales"):
+        d[k] = [float(x) for x in d[k]]
+    if "periodos_por_anio" in d: d["periodos_por_anio"] = int(d["periodos_por_anio"])
+    if "tasa_descuento" in d: d["tasa_descuento"] = float(d["tasa_descuento"])
+    return Inputs(**d)
+
+@dataclass(frozen=True, eq=False)
+class InputsCompilados:
+    # Forma inmutable en arreglos de Inputs (E estrategias, C cohortes, T periodos)
+    nombre_caso: str
+    estrategias: Tuple[str, ...]
+    cohortes: Tuple[str, ...]
+    componentes: np.ndarray      # (E, 3) costo_ts, costo_procedimientos, costo_eventos
+    multiplicador: np.ndarray    # (E, C)
+    costo: np.ndarray            # (E, C) costo por paciente por estrategia y cohorte
+    pesos: np.ndarray            # (C,)
+    shares_actual: np.ndarray    # (E, T)
+    shares_nuevo: np.ndarray     # (E, T)
+    cobertura_actual: np.ndarray # (T,)
+    cobertura_nuevo: np.ndarray  # (T,)
+    poblacion: np.ndarray        # (T,)
+    presupuesto: np.ndarray      # (T,)
+    otros_gastos: np.ndarray     # (T,)
+    saldo_inicial: float
+    periodos_por_anio: int = 1
+    tasa_descuento: float = 0.0
+
+    @property
+    def horizonte(self)->int:
+        # en periodos (= años si periodos_por_anio == 1)
+        return self.poblacion.shape[0]
+
+    @property
+    def anios(self)->int:
+        return self.horizonte // self.periodos_por_anio
+
+    @property
+    def descuento(self)->np.ndarray:
+        # factor por periodo, (1 + r)^(-k/p) con k = 0..T-1: el primer periodo no se descuenta
+        return (1.0 + self.tasa_descuento) ** (-np.arange(self.horizonte) / self.periodos_por_anio)
+
+    @property
+    def factor_cohortes(self)->np.ndarray:
+        # multiplicador promedio ponderado por cohorte, (E,)
+        return self.multiplicador @ self.pesos
+
+    @property
+    def costo_ponderado(self)->np.ndarray:
+        return self.costo @ self.pesos
+
+def _solo_lectura(a) -> np.ndarray:
+    a = np.array(a, dtype=float)
+    a.setflags(write=False)
+    return a
+
+def compilar(ins: Inputs) -> InputsCompilados:
+    nombres = [e.nombre for e in ins.estrategias]
+    idx = {n:i for i,n in enumerate(nombres)}
+    T = ins.n_periodos
+    def _matriz(shares: Dict[str,List[float]]):
+        m = np.zeros((len(nombres), T))
+        for estr, sh in shares.items():
+            if estr not in idx: raise ValueError(f"Estrategia desconocida en shares: {estr}")
+            m[idx[estr]] = np.asarray(sh, dtype=float)[:T]
+        return m
+    componentes = np.array([[getattr(e, c) for c in COMPONENTES_COSTO] for e in ins.estrategias], dtype=float).reshape(len(nombres), 3)
+    multiplicador = np.array([[float(e.multiplicador_cohortes[c.nombre]) if e.multiplicador_cohortes and c.nombre in e.multiplicador_cohortes else 1.0
+                               for c in ins.cohortes] for e in ins.estrategias], dtype=float).reshape(len(nombres), len(ins.cohortes))
+    return InputsCompilados(
+        nombre_caso=ins.nombre_caso,
+        estrategias=tuple(nombres),
+        cohortes=tuple(c.nombre for c in ins.cohortes),
+        componentes=_solo_lectura(componentes),
+        multiplicador=_solo_lectura(multiplicador),
+        costo=_solo_lectura(componentes.sum(axis=1)[:,None] * multiplicador),
+        pesos=_solo_lectura([c.peso for c in ins.cohortes]),
+        shares_actual=_solo_lectura(_matriz(ins.shares_actual)),
+        shares_nuevo=_solo_lectura(_matriz(ins.shares_nuevo)),
+        cobertura_actual=_solo_lectura(ins.cobertura_actual),
+        cobertura_nuevo=_solo_lectura(ins.cobertura_nuevo),
+        poblacion=_solo_lectura(ins.poblacion_objetivo),
+        presupuesto=_solo_lectura(ins.presupuesto_anual),
+        otros_gastos=_solo_lectura(ins.otros_gastos_anuales),
+        saldo_inicial=float(ins.saldo_inicial),
+        periodos_por_anio=int(ins.periodos_por_anio),
+        tasa_descuento=float(ins.tasa_descuento),
+    )
+
+def _costo_promedio(costo_ponderado: np.ndarray, shares: np.ndarray, cobertura: np.ndarray) -> np.ndarray:
+    # sum_e shares[e,t] * sum_c peso[c]*costo[e,c], admite dimensiones de lote al inicio
+    return np.einsum("...et,...e->...t", shares, costo_ponderado) * cobertura
+
+def costos_lote(c: InputsCompilados, componentes=None, shares_actual=None, shares_nuevo=None,
+                cobertura_actual=None, cobertura_nuevo=None, poblacion=None):
+    # Cada argumento reemplaza al de c y puede llevar dimensiones de lote (n, ...)
+    costo = c.costo_ponderado if componentes is None else np.asarray(componentes).sum(axis=-1) * c.factor_cohortes
+    cpa = _costo_promedio(costo, c.shares_actual if shares_actual is None else shares_actual,
+                          c.cobertura_actual if cobertura_actual is None else cobertura_actual)
+    cpn = _costo_promedio(costo, c.shares_nuevo if shares_nuevo is None else shares_nuevo,
+                          c.cobertura_nuevo if cobertura_nuevo is None else cobertura_nuevo)
+    N = c.poblacion if poblacion is None else poblacion
+    return cpa * N, cpn * N, cpa, cpn
+
+def resultados_lote(c: InputsCompilados, CA, CN, saldo_inicial=None, presupuesto=None, otros_gastos=None):
+    saldo = c.saldo_inicial if saldo_inicial is None else np.asarray(saldo_inicial)[...,None]
+    flujo = (c.presupuesto if presupuesto is None else presupuesto) - (c.otros_gastos if otros_gastos is None else otros_gastos)
+    AIP = CN - CA
+    SPF = saldo + np.cumsum(flujo - CN, axis=-1)
+    return AIP, SPF
+
+def _compilado(ins: Union[Inputs, InputsCompilados], validar:bool=True) -> InputsCompilados:
+    # InputsCompilados se considera confiable (validado al compilar o generado por un motor)
+    if isinstance(ins, InputsCompilados): return ins
+    if validar: ins.validate()
+    return compilar(ins)
+
+@instrumentar("costos_agregados")
+def costos_agregados(modelo: ModelType, ins: Union[Inputs, InputsCompilados], validar:bool=True):
+    c = _compilado(ins, validar)
+    CA, CN, costo_pp_actual, costo_pp_nuevo = costos_lote(c)
+    return CA.tolist(), CN.tolist(), costo_pp_actual, costo_pp_nuevo
+
+# Agregación de una tabla por periodo a años: flujos sumados, saldos al cierre del año y
+# coberturas / costos por paciente ponderados por la población de cada periodo.
+_SALDOS = ("SPF",)
+_POR_POBLACION = ("Cobertura_actual", "Cobertura_nuevo", "Costo pp (Actual)", "Costo pp (Nuevo)")
+
+def agregar_anual(tabla: Dict[str, np.ndarray], periodos_por_anio:int)->Dict[str, np.ndarray]:
+    p = periodos_por_anio
+    anual = lambda x: np.asarray(x, dtype=float).reshape(-1, p)
+    N = anual(tabla["N_t"])
+    N_anio = N.sum(axis=1)
+    res = {}
+    for k, v in tabla.items():
+        x = anual(v)
+        if k in _SALDOS: res[k] = x[:, -1]
+        elif k in _POR_POBLACION:
+            res[k] = np.divide((x * N).sum(axis=1), N_anio, out=x.mean(axis=1), where=N_anio > 0)
+        else: res[k] = x.sum(axis=1)
+    return res
+
+@instrumentar("ejecutar_modelo")
+def ejecutar_modelo(modelo: ModelType, ins: Union[Inputs, InputsCompilados], validar:bool=True,
+                    formato:str="pandas"):
+    # validar=False: ruta confiable para casos ya validados (p. ej. variantes de un caso base).
+    # formato="arrays": la tabla es un dict {columna: arreglo} y no se importa pandas.
+    if formato not in ("pandas", "arrays"): raise ValueError("formato debe ser 'pandas' o 'arrays'")
+    # Con periodos_por_anio > 1 la "tabla" es anual (la que usan la app y aip.report) y
+    # "tabla_periodos" trae el detalle por periodo; todos los periodos se calculan en un solo paso.
+    c = _compilado(ins, validar)
+    CA, CN, cpa, cpn = costos_lote(c)
+    AIP, SPF = resultados_lote(c, CA, CN)
+    AIP_desc = AIP * c.descuento
+    columnas = {
+        "N_t": c.poblacion,
+        "Cobertura_actual": c.cobertura_actual,
+        "Cobertura_nuevo": c.cobertura_nuevo,
         "Costo pp (Actual)": cpa,
         "Costo pp (Nuevo)": cpn,
         "Costo agregado (Actual)": CA,
         "Costo agregado (Nuevo)": CN,
         "Impacto Incremental (AIP)": AIP,
         "SPF": SPF
-    })
-    return {"tabla": df, "AIP_total": float(np.sum(AIP)), "SPF_final": float(SPF[-1])}
+    }
+    if c.tasa_descuento: columnas["AIP descontado"] = AIP_desc
+    p = c.periodos_por_anio
+    tablas = {"tabla": {"Año": np.arange(1, c.anios+1), **(columnas if p == 1 else agregar_anual(columnas, p))}}
+    if p > 1:
+        tablas["tabla_periodos"] = {"Periodo": np.arange(1, c.horizonte+1),
+                                    "Año": np.repeat(np.arange(1, c.anios+1), p), **columnas}
+    if formato == "pandas":
+        import pandas as pd
+        tablas = {k: pd.DataFrame(v) for k,v in tablas.items()}
+    return {**tablas, "AIP_total": float(np.sum(AIP)), "AIP_total_descontado": float(np.sum(AIP_desc)),
+            "SPF_final": float(SPF[-1])}
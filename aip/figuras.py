@@ -0,0 +1,60 @@
+from __future__ import annotations
+import hashlib, os, threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+from .perf import tramo
+
+class RenderizadorFiguras:
+    # Render diferido de figuras Plotly a PNG: nada se escribe al calcular; las imágenes se
+    # generan en segundo plano cuando un reporte las pide, y se guardan por un hash de los
+    # datos de la figura, de modo que exportar de nuevo solo re-renderiza lo que cambió.
+    def __init__(self, directorio:str="reports/figuras", workers:int=1, ancho:int=1000, alto:int=560):
+        self.directorio = directorio
+        self.ancho, self.alto = ancho, alto
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="aip-figuras")
+        self._lock = threading.Lock()
+        self._trabajos: Dict[str, Future] = {}
+
+    @staticmethod
+    def clave(fig)->str:
+        return hashlib.sha256(fig.to_json().encode("utf-8")).hexdigest()[:32]
+
+    def _ruta(self, k:str)->str:
+        return os.path.join(self.directorio, f"{k}.png")
+
+    def _render(self, fig, k:str)->str:
+        ruta = self._ruta(k)
+        if not os.path.exists(ruta):
+            os.makedirs(self.directorio, exist_ok=True)
+            tmp = f"{ruta}.{threading.get_ident()}.tmp"
+            with tramo("figuras.render", clave=k):
+                fig.write_image(tmp, format="png", width=self.ancho, height=self.alto)
+            os.replace(tmp, ruta)
+        return ruta
+
+    def enviar(self, fig)->Future:
+        k = self.clave(fig)
+        with self._lock:
+            f = self._trabajos.get(k)
+            if f is None or (f.done() and (f.exception() is not None or not os.path.exists(self._ruta(k)))):
+                f = self._pool.submit(self._render, fig, k)
+                self._trabajos[k] = f
+        return f
+
+    def rutas(self, figs: Dict[str, object], timeout: Optional[float]=None)->Dict[str, str]:
+        # acepta rutas ya existentes (str) o figuras; envía todas antes de esperar
+        trabajos = {n: (f if isinstance(f, str) else self.enviar(f)) for n,f in figs.items()}
+        return {n: (t if isinstance(t, str) else t.result(timeout)) for n,t in trabajos.items()}
+
+_por_defecto: Optional[RenderizadorFiguras] = None
+_lock_defecto = threading.Lock()
+
+def renderizador()->RenderizadorFiguras:
+    global _por_defecto
+    with _lock_defecto:
+        if _por_defecto is None:
+            _por_defecto = RenderizadorFiguras(os.environ.get("AIP_FIGURAS_DIR", "reports/figuras"))
+    return _por_defecto
+
+def renderizar_figuras(figs: Dict[str, object], timeout: Optional[float]=None)->Dict[str, str]:
+    return renderizador().rutas(figs, timeout)
@@ -0,0 +1,174 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Dict, Union
+import numpy as np
+from .core import Inputs, InputsCompilados, COMPONENTES_COSTO, _compilado, agregar_anual
+if TYPE_CHECKING:
+    import pandas as pd
+
+_ESCENARIOS = ("actual", "nuevo")
+
+class ModeloIncremental:
+    # Modelo que conserva los costos parciales por año y cohorte para recalcular solo lo que
+    # cambia: editar el año t recalcula ese año y el SPF desde t; editar el costo de una
+    # estrategia es una actualización de rango uno sobre todos los años.
+    def __init__(self, ins: Union[Inputs, InputsCompilados]):
+        self._cargar(_compilado(ins))
+
+    def _cargar(self, c: InputsCompilados)->None:
+        self.nombre_caso = c.nombre_caso
+        self.estrategias = c.estrategias
+        self.cohortes = c.cohortes
+        self.componentes = np.array(c.componentes)
+        self.multiplicador = np.array(c.multiplicador)
+        self.pesos = np.array(c.pesos)
+        self.costo = self.componentes.sum(axis=1)[:,None] * self.multiplicador      # (E, C)
+        self.shares = {"actual": np.array(c.shares_actual), "nuevo": np.array(c.shares_nuevo)}
+        self.cobertura = {"actual": np.array(c.cobertura_actual), "nuevo": np.array(c.cobertura_nuevo)}
+        self.poblacion = np.array(c.poblacion)
+        self.presupuesto = np.array(c.presupuesto)
+        self.otros_gastos = np.array(c.otros_gastos)
+        self.saldo_inicial = float(c.saldo_inicial)
+        self.periodos_por_anio, self.tasa_descuento, self.descuento = c.periodos_por_anio, c.tasa_descuento, c.descuento
+        # costo parcial por año y cohorte: sum_e shares[e,t] * costo[e,c] -> (T, C)
+        self.parcial = {esc: self.shares[esc].T @ self.costo for esc in _ESCENARIOS}
+        self.costo_pp = {esc: np.zeros(self.horizonte) for esc in _ESCENARIOS}
+        self.costo_agregado = {esc: np.zeros(self.horizonte) for esc in _ESCENARIOS}
+        self.SPF = np.zeros(self.horizonte)
+        self._recalcular_anios(slice(None))
+
+    @property
+    def horizonte(self)->int:
+        return self.poblacion.shape[0]
+
+    def _recalcular_anios(self, t)->None:
+        for esc in _ESCENARIOS:
+            self.costo_pp[esc][t] = (self.parcial[esc][t] @ self.pesos) * self.cobertura[esc][t]
+            self.costo_agregado[esc][t] = self.costo_pp[esc][t] * self.poblacion[t]
+        inicio = (t.start or 0) if isinstance(t, slice) else int(np.min(t))
+        self._recalcular_spf(inicio)
+
+    def _recalcular_spf(self, t:int)->None:
+        previo = self.saldo_inicial if t == 0 else self.SPF[t-1]
+        flujo = self.presupuesto[t:] - self.otros_gastos[t:] - self.costo_agregado["nuevo"][t:]
+        self.SPF[t:] = previo + np.cumsum(flujo)
+
+    def _estrategia(self, nombre:str)->int:
+        if nombre not in self.estrategias: raise ValueError(f"Estrategia desconocida: {nombre}")
+        return self.estrategias.index(nombre)
+
+    def _escenario(self, escenario:str)->str:
+        if escenario not in _ESCENARIOS: raise ValueError("Escenario debe ser 'actual' o 'nuevo'")
+        return escenario
+
+    # --- ediciones de un año ---
+    def fijar_share(self, escenario:str, estrategia:str, t:int, valor:float)->None:
+        self.fijar_shares_anio(escenario, t, {estrategia: valor})
+
+    def fijar_shares_anio(self, escenario:str, t:int, valores: Dict[str, float])->None:
+        esc = self._escenario(escenario)
+        for nombre, v in valores.items():
+            e = self._estrategia(nombre)
+            delta = float(v) - self.shares[esc][e, t]
+            self.shares[esc][e, t] = float(v)
+            self.parcial[esc][t] += delta * self.costo[e]
+        self._recalcular_anios(slice(t, t+1))
+
+    def fijar_cobertura(self, escenario:str, t:int, valor:float)->None:
+        self.cobertura[self._escenario(escenario)][t] = float(valor)
+        self._recalcular_anios(slice(t, t+1))
+
+    def fijar_poblacion(self, t:int, valor:float)->None:
+        self.poblacion[t] = float(valor)
+        self._recalcular_anios(slice(t, t+1))
+
+    def fijar_presupuesto(self, t:int, valor:float)->None:
+        self.presupuesto[t] = float(valor)
+        self._recalcular_spf(t)
+
+    def fijar_otros_gastos(self, t:int, valor:float)->None:
+        self.otros_gastos[t] = float(valor)
+        self._recalcular_spf(t)
+
+    def fijar_saldo_inicial(self, valor:float)->None:
+        self.SPF += float(valor) - self.saldo_inicial
+        self.saldo_inicial = float(valor)
+
+    # --- ediciones de una estrategia: rango uno sobre todos los años ---
+    def fijar_costo(self, estrategia:str, componente:str, valor:float)->None:
+        if componente not in COMPONENTES_COSTO: raise ValueError("Atributo no soportado")
+        e = self._estrategia(estrategia)
+        j = COMPONENTES_COSTO.index(componente)
+        delta = (float(valor) - self.componentes[e, j]) * self.multiplicador[e]     # (C,)
+        self.componentes[e, j] = float(valor)
+        self.costo[e] += delta
+        for esc in _ESCENARIOS:
+            self.parcial[esc] += np.outer(self.shares[esc][e], delta)
+        self._recalcular_anios(slice(None))
+
+    def sincronizar(self, ins: Union[Inputs, InputsCompilados])->None:
+        # Aplica solo las diferencias entre el estado actual y un nuevo caso; si cambian
+        # estrategias, cohortes, pesos, multiplicadores u horizonte, recompila todo.
+        c = _compilado(ins, validar=False)
+        if (c.estrategias != self.estrategias or c.cohortes != self.cohortes or c.horizonte != self.horizonte
+                or c.periodos_por_anio != self.periodos_por_anio or c.tasa_descuento != self.tasa_descuento
+                or not np.array_equal(c.pesos, self.pesos) or not np.array_equal(c.multiplicador, self.multiplicador)):
+            self._cargar(c)
+            return
+        self.nombre_caso = c.nombre_caso
+        for e, j in zip(*np.nonzero(c.componentes != self.componentes)):
+            self.fijar_costo(self.estrategias[e], COMPONENTES_COSTO[j], c.componentes[e, j])
+        anios = np.zeros(self.horizonte, dtype=bool)
+        for esc, sh, cob in (("actual", c.shares_actual, c.cobertura_actual), ("nuevo", c.shares_nuevo, c.cobertura_nuevo)):
+            cambio = np.any(sh != self.shares[esc], axis=0)
+            if cambio.any():
+                self.parcial[esc][cambio] += (sh[:, cambio] - self.shares[esc][:, cambio]).T @ self.costo
+                self.shares[esc][:, cambio] = sh[:, cambio]
+            cambio |= cob != self.cobertura[esc]
+            self.cobertura[esc][:] = cob
+            anios |= cambio
+        anios |= c.poblacion != self.poblacion
+        self.poblacion[:] = c.poblacion
+        flujo = (c.presupuesto != self.presupuesto) | (c.otros_gastos != self.otros_gastos)
+        self.presupuesto[:] = c.presupuesto; self.otros_gastos[:] = c.otros_gastos
+        if anios.any():
+            self._recalcular_anios(np.nonzero(anios)[0])
+        if flujo.any():
+            self._recalcular_spf(int(np.argmax(flujo)))
+        if c.saldo_inicial != self.saldo_inicial:
+            self.fijar_saldo_inicial(c.saldo_inicial)
+
+    # --- resultados ---
+    @property
+    def AIP(self)->np.ndarray:
+        return self.costo_agregado["nuevo"] - self.costo_agregado["actual"]
+
+    @property
+    def AIP_total(self)->float:
+        return float(self.AIP.sum())
+
+    @property
+    def SPF_final(self)->float:
+        return float(self.SPF[-1])
+
+    def tabla(self)->pd.DataFrame:
+        # anual, como ejecutar_modelo (los periodos se agregan con agregar_anual)
+        import pandas as pd
+        columnas = {
+            "N_t": self.poblacion.copy(),
+            "Cobertura_actual": self.cobertura["actual"].copy(),
+            "Cobertura_nuevo": self.cobertura["nuevo"].copy(),
+            "Costo pp (Actual)": self.costo_pp["actual"].copy(),
+            "Costo pp (Nuevo)": self.costo_pp["nuevo"].copy(),
+            "Costo agregado (Actual)": self.costo_agregado["actual"].copy(),
+            "Costo agregado (Nuevo)": self.costo_agregado["nuevo"].copy(),
+            "Impacto Incremental (AIP)": self.AIP,
+            "SPF": self.SPF.copy()
+        }
+        if self.tasa_descuento: columnas["AIP descontado"] = self.AIP * self.descuento
+        p = self.periodos_por_anio
+        return pd.DataFrame({"Año": np.arange(1, self.horizonte//p + 1),
+                             **(columnas if p == 1 else agregar_anual(columnas, p))})
+
+    def resultados(self)->dict:
+        return {"tabla": self.tabla(), "AIP_total": self.AIP_total,
+                "AIP_total_descontado": float((self.AIP * self.descuento).sum()), "SPF_final": self.SPF_final}
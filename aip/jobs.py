@@ -0,0 +1,109 @@
+from __future__ import annotations
+import copy, itertools, threading, time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+from .perf import contar, tramo
+
+class Cancelado(Exception):
+    pass
+
+class Trabajo:
+    # Estado de un análisis en segundo plano. El motor recibe progreso=trabajo.reportar: informa
+    # avance y resultado parcial, y es el punto donde se corta si el usuario cancela.
+    def __init__(self, id:str, descripcion:str, intervalo:float=0.5):
+        self.id = id
+        self.descripcion = descripcion
+        self.estado = "pendiente"      # pendiente | ejecutando | terminado | cancelado | error
+        self.hechas = 0
+        self.total: Optional[int] = None
+        self.parcial: Any = None
+        self.resultado: Any = None
+        self.error: Optional[str] = None
+        self.creado = time.time()
+        self.inicio: Optional[float] = None
+        self.fin: Optional[float] = None
+        self._cancelar = threading.Event()
+        self._intervalo = intervalo
+        self._ultima_copia = 0.0
+        self._futuro: Optional[Future] = None
+
+    @property
+    def activo(self)->bool:
+        return self.estado in ("pendiente", "ejecutando")
+
+    @property
+    def progreso(self)->Optional[float]:
+        return min(1.0, self.hechas / self.total) if self.total else None
+
+    @property
+    def segundos(self)->float:
+        return ((self.fin or time.time()) - self.inicio) if self.inicio else 0.0
+
+    def cancelar(self)->None:
+        self._cancelar.set()
+
+    def reportar(self, hechas:int, total: Optional[int]=None, parcial: Any=None)->None:
+        if self._cancelar.is_set(): raise Cancelado(self.id)
+        self.hechas, self.total = int(hechas), total
+        # el parcial se copia (el motor lo sigue modificando) a lo sumo cada `intervalo` segundos
+        ahora = time.monotonic()
+        if parcial is not None and (ahora - self._ultima_copia >= self._intervalo or (total and hechas >= total)):
+            self.parcial = copy.deepcopy(parcial)
+            self._ultima_copia = ahora
+
+    def esperar(self, timeout: Optional[float]=None)->"Trabajo":
+        if self._futuro is not None: self._futuro.result(timeout)
+        return self
+
+class EjecutorTrabajos:
+    # Pool de hilos compartido por todas las sesiones de la app: los análisis largos corren fuera
+    # del rerun de Streamlit, de modo que una sesión no bloquea a las demás. Conserva los últimos
+    # `max_historial` trabajos para consultar su estado por id.
+    def __init__(self, workers:int=2, max_historial:int=200):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="aip-trabajo")
+        self._trabajos: "OrderedDict[str, Trabajo]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.max_historial = max_historial
+
+    def enviar(self, fn: Callable, *args, descripcion:str="", **kwargs)->Trabajo:
+        # fn(*args, progreso=trabajo.reportar, **kwargs)
+        with self._lock:
+            t = Trabajo(str(next(self._ids)), descripcion or getattr(fn, "__name__", "trabajo"))
+            self._trabajos[t.id] = t
+            terminados = [k for k,v in self._trabajos.items() if not v.activo]
+            for k in terminados[:max(0, len(self._trabajos) - self.max_historial)]:
+                del self._trabajos[k]
+        t._futuro = self._pool.submit(self._ejecutar, t, fn, args, kwargs)
+        return t
+
+    def _ejecutar(self, t: Trabajo, fn: Callable, args, kwargs)->None:
+        if t._cancelar.is_set():
+            t.estado = "cancelado"
+            return
+        t.estado, t.inicio = "ejecutando", time.time()
+        try:
+            with tramo("trabajo", descripcion=t.descripcion):
+                t.resultado = fn(*args, progreso=t.reportar, **kwargs)
+            t.estado = "terminado"
+        except Cancelado:
+            t.estado = "cancelado"
+        except Exception as e:
+            t.error = f"{type(e).__name__}: {e}"
+            t.estado = "error"
+        finally:
+            t.fin = time.time()
+            contar(f"trabajos.{t.estado}")
+
+    def trabajo(self, id: Optional[str])->Optional[Trabajo]:
+        with self._lock:
+            return self._trabajos.get(id) if id is not None else None
+
+    def trabajos(self)->List[Trabajo]:
+        with self._lock:
+            return list(self._trabajos.values())
+
+    def cerrar(self)->None:
+        for t in self.trabajos(): t.cancelar()
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,118 @@
+from __future__ import annotations
+import atexit, functools, json, os, threading, time, tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+class Perfilador:
+    # Registro de tramos de tiempo (y memoria pico si está activado tracemalloc) y contadores.
+    # Se exporta como resumen por nombre o como traza JSON (formato Chrome/Perfetto).
+    def __init__(self, max_tramos:int=100_000):
+        self.tramos = deque(maxlen=max_tramos)
+        self.contadores: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._t0 = time.perf_counter()
+
+    @property
+    def memoria(self)->bool:
+        return tracemalloc.is_tracing()
+
+    def activar_memoria(self, activar:bool=True)->None:
+        if activar and not tracemalloc.is_tracing(): tracemalloc.start()
+        elif not activar and tracemalloc.is_tracing(): tracemalloc.stop()
+
+    @contextmanager
+    def tramo(self, nombre:str, **atributos):
+        pila = self._local.__dict__.setdefault("pila", [])
+        memoria = self.memoria
+        if memoria:
+            # el pico acumulado hasta aquí pertenece al tramo padre
+            if pila: pila[-1]["pico"] = max(pila[-1]["pico"], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        marco = {"pico": 0}
+        pila.append(marco)
+        inicio = time.perf_counter()
+        try:
+            yield atributos
+        finally:
+            dur = time.perf_counter() - inicio
+            pila.pop()
+            registro = {"nombre": nombre, "inicio": inicio - self._t0, "segundos": dur,
+                        "pid": os.getpid(), "tid": threading.get_ident(), "atributos": atributos}
+            if memoria and self.memoria:
+                pico = max(marco["pico"], tracemalloc.get_traced_memory()[1])
+                registro["pico_mb"] = pico / 2**20
+                if pila: pila[-1]["pico"] = max(pila[-1]["pico"], pico)
+            with self._lock:
+                self.tramos.append(registro)
+
+    def contar(self, nombre:str, valor:float=1)->None:
+        with self._lock:
+            self.contadores[nombre] = self.contadores.get(nombre, 0) + valor
+
+    def resumen(self)->Dict[str, dict]:
+        # por nombre de tramo: llamadas, tiempo total/medio/máximo, memoria pico y unidades/s
+        with self._lock:
+            tramos = list(self.tramos)
+        res: Dict[str, dict] = {}
+        for t in tramos:
+            r = res.setdefault(t["nombre"], {"llamadas": 0, "total_s": 0.0, "max_s": 0.0, "unidades": 0.0})
+            r["llamadas"] += 1; r["total_s"] += t["segundos"]; r["max_s"] = max(r["max_s"], t["segundos"])
+            r["unidades"] += float(t["atributos"].get("unidades", 0))
+            if "pico_mb" in t: r["pico_mb"] = max(r.get("pico_mb", 0.0), t["pico_mb"])
+        for r in res.values():
+            r["media_s"] = r["total_s"] / r["llamadas"]
+            r["unidades_por_s"] = r["unidades"] / r["total_s"] if r["unidades"] and r["total_s"] > 0 else None
+        return res
+
+    def traza(self)->dict:
+        with self._lock:
+            tramos = list(self.tramos)
+            contadores = dict(self.contadores)
+        eventos = [{"name": t["nombre"], "ph": "X", "ts": t["inicio"]*1e6, "dur": t["segundos"]*1e6,
+                    "pid": t["pid"], "tid": t["tid"],
+                    "args": {**{k: v if isinstance(v, (int, float, str, bool)) or v is None else str(v)
+                                for k,v in t["atributos"].items()},
+                             **({"pico_mb": t["pico_mb"]} if "pico_mb" in t else {})}}
+                   for t in tramos]
+        return {"traceEvents": eventos, "contadores": contadores, "resumen": self.resumen(),
+                "memoria_max_rss_mb": memoria_max_rss_mb()}
+
+    def exportar_traza(self, ruta:str)->None:
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump(self.traza(), f, ensure_ascii=False)
+
+    def limpiar(self)->None:
+        with self._lock:
+            self.tramos.clear(); self.contadores.clear()
+
+def memoria_max_rss_mb()->Optional[float]:
+    try:
+        import resource, sys
+    except ImportError:      # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10
+
+perfilador = Perfilador()
+
+def tramo(nombre:str, **atributos):
+    return perfilador.tramo(nombre, **atributos)
+
+def contar(nombre:str, valor:float=1)->None:
+    perfilador.contar(nombre, valor)
+
+def instrumentar(nombre: Optional[str]=None):
+    def decorador(fn):
+        etiqueta = nombre or f"{fn.__module__}.{fn.__qualname__}"
+        @functools.wraps(fn)
+        def envoltura(*args, **kwargs):
+            with perfilador.tramo(etiqueta):
+                return fn(*args, **kwargs)
+        return envoltura
+    return decorador
+
+# AIP_TRAZA=ruta.json guarda la traza al terminar el proceso (útil en corridas por lotes)
+if os.environ.get("AIP_TRAZA"):
+    atexit.register(lambda: perfilador.exportar_traza(os.environ["AIP_TRAZA"]))
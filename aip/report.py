@@ -1,13 +1,56 @@
 
 from __future__ import annotations
-from typing import Dict
+from typing import Dict, List, Optional
+from xml.sax.saxutils import escape
 import pandas as pd
-from docx import Document
-from docx.shared import Inches
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
+from pandas.api.types import is_bool_dtype, is_float_dtype, is_integer_dtype, is_numeric_dtype
+from .figuras import renderizar_figuras
+from .perf import instrumentar
 
-def export_docx(path:str, metadata:Dict, tabla:pd.DataFrame, figs:Dict[str,str]):
+def _formatear_columna(col: pd.Series, formato: Optional[str], decimales:int)->List[str]:
+    # Formato por columna completa (no celda a celda con iterrows, que además convierte
+    # las columnas enteras a float al mezclar tipos en la fila)
+    valores = col.tolist()
+    if formato is not None:
+        textos = [formato.format(v) for v in valores]
+    elif is_bool_dtype(col):
+        textos = [str(v) for v in valores]
+    elif is_integer_dtype(col):
+        textos = [f"{v:d}" for v in valores]
+    elif is_float_dtype(col):
+        textos = [f"{v:,.{decimales}f}" for v in valores]
+    else:
+        textos = [str(v) for v in valores]
+    if not (is_numeric_dtype(col) and formato is None):
+        textos = [escape(t) for t in textos]
+    return textos
+
+def _agregar_tabla(doc, tabla: pd.DataFrame, formatos: Optional[Dict[str,str]]=None, decimales:int=2):
+    # Encabezado con la API de python-docx; el cuerpo se arma como XML y se inserta de una vez
+    from docx.oxml import parse_xml
+    from docx.oxml.ns import nsdecls, qn
+    t = doc.add_table(rows=1, cols=len(tabla.columns))
+    hdr = t.rows[0].cells
+    for i,c in enumerate(tabla.columns): hdr[i].text = str(c)
+    anchos = [g.get(qn("w:w")) for g in t._tbl.tblGrid.findall(qn("w:gridCol"))]
+    columnas = [[f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{w}"/></w:tcPr><w:p><w:r><w:t xml:space="preserve">{x}</w:t></w:r></w:p></w:tc>'
+                 for x in _formatear_columna(tabla[c], (formatos or {}).get(c), decimales)]
+                for c, w in zip(tabla.columns, anchos)]
+    filas = "".join("<w:tr>" + "".join(celdas) + "</w:tr>" for celdas in zip(*columnas))
+    t._tbl.extend(list(parse_xml(f"<w:tbl {nsdecls('w')}>{filas}</w:tbl>")))
+    return t
+
+@instrumentar("export_docx")
+def export_docx(path:str, metadata:Dict, tabla:pd.DataFrame, figs:Dict[str,object],
+                formatos: Optional[Dict[str,str]]=None, decimales:int=2, max_filas: Optional[int]=None):
+    # formatos: {columna: "{:,.0f}"} para controlar el formato numérico por columna.
+    # max_filas: si la tabla es más larga, el cuerpo muestra las primeras filas y la tabla
+    # completa va en un anexo al final.
+    # figs: {título: ruta PNG o figura Plotly}; las figuras se renderizan aquí (en paralelo y
+    # con caché por contenido), no al calcular.
+    from docx import Document           # python-docx y reportlab se cargan al exportar
+    from docx.shared import Inches
+    figs = renderizar_figuras(figs)
     doc = Document()
     doc.add_heading(metadata.get("titulo","Informe AIP"), 0)
     doc.add_paragraph(metadata.get("resumen",""))
@@ -15,19 +58,23 @@ def export_docx(path:str, metadata:Dict, tabla:pd.DataFrame, figs:Dict[str,str])
     doc.add_paragraph(f"AIP acumulado: {metadata.get('AIP_total','')}")
     doc.add_paragraph(f"SPF final: {metadata.get('SPF_final','')}")
     doc.add_heading("Tabla principal", level=2)
-    t = doc.add_table(rows=1, cols=len(tabla.columns))
-    hdr = t.rows[0].cells
-    for i,c in enumerate(tabla.columns): hdr[i].text = str(c)
-    for _,row in tabla.iterrows():
-        cells = t.add_row().cells
-        for i,c in enumerate(tabla.columns):
-            cells[i].text = str(row[c])
+    anexo = max_filas is not None and len(tabla) > max_filas
+    _agregar_tabla(doc, tabla.head(max_filas) if anexo else tabla, formatos, decimales)
+    if anexo:
+        doc.add_paragraph(f"Se muestran las primeras {max_filas} de {len(tabla)} filas; la tabla completa está en el Anexo.")
     for k,fp in figs.items():
         doc.add_heading(k, level=2)
         doc.add_picture(fp, width=Inches(6))
+    if anexo:
+        doc.add_page_break()
+        doc.add_heading("Anexo: tabla completa", level=1)
+        _agregar_tabla(doc, tabla, formatos, decimales)
     doc.save(path)
 
+@instrumentar("export_pdf")
 def export_pdf(path:str, metadata:Dict):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
     c = canvas.Canvas(path, pagesize=A4)
     w,h = A4; y = h-72
     c.setFont("Helvetica-Bold", 14)
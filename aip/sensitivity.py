@@ -1,20 +1,104 @@
 
 from __future__ import annotations
-import numpy as np, pandas as pd
-from typing import Dict, Tuple
-from .core import ejecutar_modelo, Inputs
-
-def dsa_univariado(modelo, ins: Inputs, variaciones: Dict[str, Tuple[float,float]])->pd.DataFrame:
-    import copy
-    base = ejecutar_modelo(modelo, ins)["AIP_total"]
-    filas = []
-    for campo,(vmin,vmax) in variaciones.items():
-        ins_min = _apply_change(copy.deepcopy(ins), campo, vmin)
-        ins_max = _apply_change(copy.deepcopy(ins), campo, vmax)
-        aip_min = ejecutar_modelo(modelo, ins_min)["AIP_total"]
-        aip_max = ejecutar_modelo(modelo, ins_max)["AIP_total"]
-        filas.append({"Parámetro":campo,"Base":base,"AIP_min":aip_min,"AIP_max":aip_max,"Delta":abs(aip_max-aip_min)})
-    return pd.DataFrame(filas).sort_values("Delta", ascending=True)
+import numpy as np
+import os, warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, Tuple, Optional, Iterator, Sequence, Union
+from .acumulador import AcumuladorPSA
+from .muestreo import MUESTREOS, EspacioPSA, matriz_alphas, muestras_de_sorteos, uniformes
+from .perf import contar, instrumentar, tramo
+from .core import ejecutar_modelo, Inputs, InputsCompilados, COMPONENTES_COSTO, _compilado, costos_lote, resultados_lote
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Callback de avance de los motores largos: progreso(hechas, total, parcial=None). Puede lanzar
+# una excepción para cancelar (ver aip.jobs); los pools de procesos se cierran al propagarse.
+Progreso = Callable[..., None]
+
+# Campos de Inputs perturbables -> (arreglo en InputsCompilados, admite índice de año)
+_CAMPOS_INPUTS = {"saldo_inicial": ("saldo_inicial", False),
+                  "presupuesto_anual": ("presupuesto", True),
+                  "otros_gastos_anuales": ("otros_gastos", True),
+                  "cobertura_actual": ("cobertura_actual", True),
+                  "cobertura_nuevo": ("cobertura_nuevo", True),
+                  "poblacion_objetivo": ("poblacion", True)}
+
+def _resolver_campo(c: InputsCompilados, campo: str)->Tuple[str, tuple]:
+    # "estrategia:<nombre>:<componente>", "inputs:saldo_inicial", "inputs:<serie>:<periodo 0-based>"
+    # o "inputs:<serie>" (todos los periodos) -> (nombre del arreglo, índice dentro del arreglo)
+    parts = campo.split(":")
+    if parts[0]=="estrategia" and len(parts)==3:
+        if parts[1] not in c.estrategias: raise ValueError(f"Estrategia desconocida: {parts[1]}")
+        if parts[2] not in COMPONENTES_COSTO: raise ValueError("Atributo no soportado")
+        return "componentes", (c.estrategias.index(parts[1]), COMPONENTES_COSTO.index(parts[2]))
+    elif parts[0]=="inputs" and len(parts)>=2:
+        if parts[1] not in _CAMPOS_INPUTS: raise ValueError("Atributo no soportado")
+        arreglo, por_anio = _CAMPOS_INPUTS[parts[1]]
+        if not por_anio: return arreglo, ()
+        return arreglo, ((int(parts[2]),) if len(parts)>2 else (slice(None),))
+    raise ValueError("Campo no soportado")
+
+def _evaluar_variantes(c: InputsCompilados, n:int, asignaciones)->Tuple[np.ndarray, np.ndarray]:
+    # Evalúa n variantes del caso base en un solo lote. asignaciones: (campo, filas, valores),
+    # donde filas indexa las variantes y valores tiene la misma longitud que filas.
+    base = {"componentes": c.componentes, "saldo_inicial": np.float64(c.saldo_inicial),
+            **{a: getattr(c, a) for a,_ in _CAMPOS_INPUTS.values() if a != "saldo_inicial"}}
+    lote = {}
+    for campo, filas, valores in asignaciones:
+        arreglo, idx = _resolver_campo(c, campo)
+        if arreglo not in lote:
+            lote[arreglo] = np.repeat(np.asarray(base[arreglo])[None], n, axis=0)
+        v = np.asarray(valores, dtype=float).reshape(-1, *([1] if idx[-1:]==(slice(None),) else []))
+        lote[arreglo][(filas,)+idx] = v
+    CA, CN, _, _ = costos_lote(c, componentes=lote.get("componentes"),
+                               cobertura_actual=lote.get("cobertura_actual"),
+                               cobertura_nuevo=lote.get("cobertura_nuevo"),
+                               poblacion=lote.get("poblacion"))
+    AIP, SPF = resultados_lote(c, CA, CN, saldo_inicial=lote.get("saldo_inicial"),
+                               presupuesto=lote.get("presupuesto"), otros_gastos=lote.get("otros_gastos"))
+    return AIP.sum(axis=-1), SPF[..., -1]
+
+@instrumentar("dsa_univariado")
+def dsa_univariado(modelo, ins: Union[Inputs, InputsCompilados], variaciones: Dict[str, Tuple[float,float]])->pd.DataFrame:
+    # Todas las perturbaciones min/max se evalúan en un único lote contra el caso base
+    import pandas as pd
+    c = _compilado(ins)
+    base = ejecutar_modelo(modelo, c, formato="arrays")["AIP_total"]
+    campos = list(variaciones)
+    asignaciones = [(campo, np.array([2*j, 2*j+1]), np.array(variaciones[campo], dtype=float))
+                    for j,campo in enumerate(campos)]
+    with tramo("dsa.lote", unidades=2*len(campos)):
+        aip, _ = _evaluar_variantes(c, 2*len(campos), asignaciones)
+    aip_min, aip_max = aip[0::2], aip[1::2]
+    df = pd.DataFrame({"Parámetro": campos, "Base": base, "AIP_min": aip_min, "AIP_max": aip_max,
+                       "Delta": np.abs(aip_max - aip_min)})
+    return df.sort_values("Delta", ascending=True)
+
+@instrumentar("dsa_grilla")
+def dsa_grilla(modelo, ins: Union[Inputs, InputsCompilados], ejes: Dict[str, Sequence[float]], tam_lote:int=100000,
+               progreso: Optional[Progreso]=None)->pd.DataFrame:
+    # Sensibilidad de dos o más vías: evalúa el producto cartesiano de los valores de cada eje.
+    # Devuelve una fila por punto de la grilla con los valores de cada campo, AIP_total y SPF_final.
+    import pandas as pd
+    c = _compilado(ins)
+    campos = list(ejes)
+    mallas = np.meshgrid(*[np.asarray(ejes[k], dtype=float) for k in campos], indexing="ij")
+    puntos = np.stack([m.ravel() for m in mallas], axis=1) if campos else np.empty((1,0))
+    aip, spf = [], []
+    for inicio in range(0, len(puntos), tam_lote):
+        bloque = puntos[inicio:inicio+tam_lote]
+        filas = np.arange(len(bloque))
+        with tramo("dsa.lote", unidades=len(bloque)):
+            a, s_ = _evaluar_variantes(c, len(bloque), [(k, filas, bloque[:,j]) for j,k in enumerate(campos)])
+        aip.append(a); spf.append(s_)
+        if progreso: progreso(inicio + len(bloque), len(puntos))
+    df = pd.DataFrame(puntos, columns=campos)
+    df["AIP_total"] = np.concatenate(aip); df["SPF_final"] = np.concatenate(spf)
+    return df
+
+def tabla_calor(df_grilla: pd.DataFrame, fila:str, columna:str, valor:str="AIP_total")->pd.DataFrame:
+    # Tabla de doble entrada (mapa de calor) a partir de dsa_grilla; promedia otros ejes si los hay
+    return df_grilla.pivot_table(index=fila, columns=columna, values=valor, aggfunc="mean")
 
 def _apply_change(ins: Inputs, campo: str, valor: float)->Inputs:
     parts = campo.split(":")
@@ -27,53 +111,258 @@ def _apply_change(ins: Inputs, campo: str, valor: float)->Inputs:
         atributo = parts[1]
         if atributo in ["saldo_inicial"]:
             setattr(ins, atributo, float(valor))
-        elif atributo in ["presupuesto_anual","otros_gastos_anuales","cobertura_actual","cobertura_nuevo"]:
-            idx = int(parts[2]); getattr(ins, atributo)[idx] = float(valor)
+        elif atributo in ["presupuesto_anual","otros_gastos_anuales","cobertura_actual","cobertura_nuevo","poblacion_objetivo"]:
+            serie = getattr(ins, atributo)
+            if len(parts)>2: serie[int(parts[2])] = float(valor)
+            else: serie[:] = [float(valor)]*len(serie)
         else:
             raise ValueError("Atributo no soportado")
     else:
         raise ValueError("Campo no soportado")
     return ins
 
-def psa_monte_carlo(modelo, ins: Inputs, nsims:int,
+def _sortear_psa(c: InputsCompilados, n:int, gamma_k_theta: Dict[str, tuple],
+                 dirichlet_alpha_actual, dirichlet_alpha_nuevo,
+                 lognorm_rr=None, aplicar_rr_en="costos", rng: Optional[np.random.Generator]=None)->Dict[str, np.ndarray]:
+    # sorteos crudos (componentes antes del RR, shares y rr (n,)); el orden de los sorteos fija la reproducibilidad
+    rng = np.random.default_rng() if rng is None else rng
+    estrategias = list(c.estrategias)
+    # Gamma para costos: (n, estrategias, componentes)
+    comp = np.repeat(c.componentes[None], n, axis=0)
+    for key,(k,theta) in gamma_k_theta.items():
+        etq, nombre, campo = key.split(":")
+        if etq=="estrategia" and nombre in estrategias:
+            if campo not in COMPONENTES_COSTO: raise ValueError(f"Campo de costo no soportado: {campo}")
+            comp[:, estrategias.index(nombre), COMPONENTES_COSTO.index(campo)] = rng.gamma(shape=float(k), scale=float(theta), size=n)
+    # Dirichlet para shares por año vía Gamma normalizadas: (n, estrategias, años); muestras_de_sorteos
+    # las repite en los periodos de cada año
+    def _dirichlet(alphas):
+        a = matriz_alphas(c, alphas).T
+        g = rng.gamma(shape=a, size=(n,)+a.shape)
+        return g / g.sum(axis=1, keepdims=True)
+    sA = _dirichlet(dirichlet_alpha_actual)
+    sN = _dirichlet(dirichlet_alpha_nuevo)
+    # Lognormal RR
+    rr = np.ones(n)
+    if lognorm_rr:
+        mu, sigma = lognorm_rr.get(aplicar_rr_en, (0.0,0.0))
+        if sigma>0:
+            rr = rng.lognormal(mean=float(mu), sigma=float(sigma), size=n)
+    return {"componentes": comp, "shares_actual": sA, "shares_nuevo": sN, "rr": rr}
+
+def _muestrear_psa(c: InputsCompilados, n:int, gamma_k_theta: Dict[str, tuple],
+                   dirichlet_alpha_actual, dirichlet_alpha_nuevo,
+                   lognorm_rr=None, aplicar_rr_en="costos", rng: Optional[np.random.Generator]=None)->Dict[str, np.ndarray]:
+    return muestras_de_sorteos(c, _sortear_psa(c, n, gamma_k_theta, dirichlet_alpha_actual, dirichlet_alpha_nuevo,
+                                               lognorm_rr, aplicar_rr_en, rng), aplicar_rr_en)
+
+def _evaluar_psa(c: InputsCompilados, muestras: Dict[str, np.ndarray])->Tuple[np.ndarray, np.ndarray]:
+    CA, CN, _, _ = costos_lote(c, **muestras)
+    AIP, SPF = resultados_lote(c, CA, CN)
+    return AIP.sum(axis=1), SPF[:,-1]
+
+def _semilla_bloque(raiz: np.random.SeedSequence, i:int)->np.random.SeedSequence:
+    # equivalente a raiz.spawn(...)[i], sin necesitar conocer el número total de bloques
+    return np.random.SeedSequence(raiz.entropy, spawn_key=tuple(raiz.spawn_key)+(i,))
+
+def _sorteos_bloque(c: InputsCompilados, n:int, config:dict, semilla: np.random.SeedSequence, diseno=None):
+    # diseno = (muestreo, puntos de la réplica, inicio del bloque) para Sobol'/LHS; None = Monte Carlo
+    if diseno is None:
+        return _sortear_psa(c, n, rng=np.random.default_rng(semilla), **config)
+    muestreo, n_replica, inicio = diseno
+    espacio = EspacioPSA(c, **config)
+    return espacio.sortear(uniformes(muestreo, espacio.dimension, n_replica, inicio, n, semilla))
+
+def _muestras_bloque(c: InputsCompilados, n:int, config:dict, semilla: np.random.SeedSequence, diseno=None):
+    return muestras_de_sorteos(c, _sorteos_bloque(c, n, config, semilla, diseno), config.get("aplicar_rr_en", "costos"))
+
+def _psa_bloque(c: InputsCompilados, n:int, config:dict, semilla: np.random.SeedSequence, diseno=None):
+    return _evaluar_psa(c, _muestras_bloque(c, n, config, semilla, diseno))
+
+def _tamanos_replicas(nsims:int, replicas:int)->list:
+    R = max(1, min(int(replicas), nsims))
+    q, r = divmod(nsims, R)
+    return [q + (i < r) for i in range(R)]
+
+def _unidades_psa(nsims:int, tam_lote:int, muestreo:str, replicas:int)->list:
+    # (n, índice de semilla, diseño) de cada bloque. En Monte Carlo, un generador por bloque; en
+    # Sobol'/LHS, réplicas independientes (una semilla de aleatorización cada una) partidas en bloques.
+    if muestreo not in MUESTREOS: raise ValueError(f"Muestreo no soportado: {muestreo} (opciones: {', '.join(MUESTREOS)})")
+    if muestreo == "mc":
+        return [(min(tam_lote, nsims-i), j, None) for j,i in enumerate(range(0, nsims, tam_lote))]
+    tamanos = _tamanos_replicas(nsims, replicas)
+    if muestreo == "sobol" and any(n & (n-1) for n in tamanos):
+        warnings.warn("Sobol': el número de simulaciones por réplica debería ser potencia de 2", stacklevel=3)
+    return [(min(tam_lote, n_r-i), r, (muestreo, n_r, i))
+            for r, n_r in enumerate(tamanos) for i in range(0, n_r, tam_lote)]
+
+def _iterar_bloques_psa(c: InputsCompilados, nsims:int, config:dict, semilla=None,
+                        tam_lote:int=50000, n_workers:int=1, muestreo:str="mc",
+                        replicas:int=1, bloque=_psa_bloque)->Iterator[Tuple[np.ndarray, np.ndarray]]:
+    # Los bloques y sus generadores dependen solo de (nsims, tam_lote, semilla, muestreo, réplicas):
+    # el resultado es idéntico bit a bit para cualquier número de workers. Se entregan en orden.
+    raiz = semilla if isinstance(semilla, np.random.SeedSequence) else np.random.SeedSequence(semilla)
+    unidades = _unidades_psa(nsims, tam_lote, muestreo, replicas)
+    n_workers = int(n_workers) if n_workers else (os.cpu_count() or 1)
+    if n_workers <= 1 or len(unidades) <= 1:
+        for n, sem, diseno in unidades:
+            with tramo("psa.bloque", unidades=n):
+                res = bloque(c, n, config, _semilla_bloque(raiz, sem), diseno)
+            contar("psa.simulaciones", n)
+            yield res
+        return
+    with ProcessPoolExecutor(max_workers=min(n_workers, len(unidades))) as ex:
+        pendientes = {}
+        siguiente = 0
+        try:
+            for i in range(len(unidades)):
+                # ventana acotada de trabajos en vuelo para no acumular resultados en memoria
+                while siguiente < len(unidades) and siguiente < i + 2*n_workers:
+                    n, sem, diseno = unidades[siguiente]
+                    pendientes[siguiente] = ex.submit(bloque, c, n, config, _semilla_bloque(raiz, sem), diseno)
+                    siguiente += 1
+                with tramo("psa.bloque", unidades=unidades[i][0], workers=n_workers):
+                    res = pendientes.pop(i).result()
+                contar("psa.simulaciones", unidades[i][0])
+                yield res
+        finally:
+            for f in pendientes.values(): f.cancel()
+
+def _error_replicas(valores: Dict[str, np.ndarray], tamanos: Sequence[int])->Dict[str, Dict[str, float]]:
+    # error estándar de la media y de P2.5/P50/P97.5 entre réplicas independientes: sd / sqrt(R)
+    res = {}
+    for var, x in valores.items():
+        partes = [p for p in np.split(x, np.cumsum(tamanos)[:-1]) if p.size]
+        est = np.array([[p.mean(), *np.quantile(p, (0.025, 0.5, 0.975))] for p in partes])
+        ee = est.std(axis=0, ddof=1) / np.sqrt(len(est)) if len(est) > 1 else np.full(4, np.nan)
+        res[var] = dict(zip(("media", "2.5%", "50%", "97.5%"), ee.tolist()))
+    return res
+
+@instrumentar("psa_monte_carlo")
+def psa_monte_carlo(modelo, ins: Union[Inputs, InputsCompilados], nsims:int,
                     gamma_k_theta: Dict[str, tuple],
                     dirichlet_alpha_actual, dirichlet_alpha_nuevo,
-                    lognorm_rr=None, aplicar_rr_en="costos")->pd.DataFrame:
-    import copy
-    estrategias = [e.nombre for e in ins.estrategias]
-    T = ins.horizonte
-    resultados = []
-    for s in range(nsims):
-        draw = copy.deepcopy(ins)
-        # Gamma para costos
-        for e in draw.estrategias:
-            for key,(k,theta) in gamma_k_theta.items():
-                etq, nombre, campo = key.split(":")
-                if etq=="estrategia" and nombre==e.nombre:
-                    val = np.random.gamma(shape=float(k), scale=float(theta))
-                    setattr(e, campo, float(val))
-        # Dirichlet para shares por año
-        for t in range(T):
-            alphasA = [dirichlet_alpha_actual[t][e] for e in estrategias]
-            vecA = np.random.dirichlet(alpha=np.array(alphasA, dtype=float))
-            for i,estr in enumerate(estrategias):
-                draw.shares_actual[estr][t] = float(vecA[i])
-            alphasN = [dirichlet_alpha_nuevo[t][e] for e in estrategias]
-            vecN = np.random.dirichlet(alpha=np.array(alphasN, dtype=float))
-            for i,estr in enumerate(estrategias):
-                draw.shares_nuevo[estr][t] = float(vecN[i])
-        # Lognormal RR
-        if lognorm_rr:
-            mu, sigma = lognorm_rr.get(aplicar_rr_en, (0.0,0.0))
-            if sigma>0:
-                rr = float(np.random.lognormal(mean=float(mu), sigma=float(sigma)))
-                if aplicar_rr_en=="costos":
-                    for e in draw.estrategias:
-                        e.costo_ts *= rr
-                        e.costo_procedimientos *= rr
-                        e.costo_eventos *= rr
-                elif aplicar_rr_en=="poblacion":
-                    draw.poblacion_objetivo = [n*rr for n in draw.poblacion_objetivo]
-        res = ejecutar_modelo(modelo, draw)
-        resultados.append({"sim":s, "AIP_total": res["AIP_total"], "SPF_final": res["SPF_final"]})
-    return pd.DataFrame(resultados)
+                    lognorm_rr=None, aplicar_rr_en="costos", tam_lote:int=50000,
+                    semilla=None, n_workers:int=1, muestreo:str="mc", replicas:int=10,
+                    progreso: Optional[Progreso]=None)->pd.DataFrame:
+    # Todas las simulaciones se muestrean y evalúan como arreglos (nsims, ...), en bloques
+    # de tam_lote con un generador independiente por bloque derivado de la semilla.
+    # n_workers>1 reparte los bloques en un pool de procesos (0 = todos los núcleos).
+    # muestreo="sobol" (Sobol' con scrambling) o "lhs" (hipercubo latino) transforma uniformes
+    # por las CDF inversas de las mismas distribuciones, en `replicas` diseños aleatorizados
+    # independientes. df.attrs["error_estandar"] da el error de la media y los percentiles
+    # entre réplicas (en "mc", entre grupos consecutivos de simulaciones).
+    import pandas as pd
+    c = _compilado(ins)
+    config = dict(gamma_k_theta=gamma_k_theta, dirichlet_alpha_actual=dirichlet_alpha_actual,
+                  dirichlet_alpha_nuevo=dirichlet_alpha_nuevo, lognorm_rr=lognorm_rr, aplicar_rr_en=aplicar_rr_en)
+    aip, spf = [], []
+    bloques = _iterar_bloques_psa(c, nsims, config, semilla, tam_lote, n_workers, muestreo, replicas)
+    try:
+        for a, s in bloques:
+            aip.append(a); spf.append(s)
+            if progreso: progreso(sum(map(len, aip)), nsims)
+    finally:
+        bloques.close()
+    df = pd.DataFrame({"sim": np.arange(nsims),
+                       "AIP_total": np.concatenate(aip) if aip else np.array([], dtype=float),
+                       "SPF_final": np.concatenate(spf) if spf else np.array([], dtype=float)})
+    df.attrs["muestreo"] = muestreo
+    df.attrs["error_estandar"] = _error_replicas({"AIP_total": df["AIP_total"].values, "SPF_final": df["SPF_final"].values},
+                                                 _tamanos_replicas(nsims, replicas))
+    return df
+
+@instrumentar("psa_streaming")
+def psa_streaming(modelo, ins: Union[Inputs, InputsCompilados], nsims_max:int,
+                  gamma_k_theta: Dict[str, tuple],
+                  dirichlet_alpha_actual, dirichlet_alpha_nuevo,
+                  lognorm_rr=None, aplicar_rr_en="costos", tolerancia: Optional[float]=None,
+                  min_sims:int=1000, tam_lote:int=10000, semilla=None, n_workers:int=1,
+                  acumulador: Optional[AcumuladorPSA]=None, progreso: Optional[Progreso]=None)->AcumuladorPSA:
+    # Igual que psa_monte_carlo pero sin guardar las simulaciones: cada bloque alimenta un
+    # AcumuladorPSA. Con tolerancia, se detiene cuando el error estándar Monte Carlo de la
+    # media y de los percentiles de AIP_total y SPF_final queda por debajo de ella.
+    c = _compilado(ins)
+    config = dict(gamma_k_theta=gamma_k_theta, dirichlet_alpha_actual=dirichlet_alpha_actual,
+                  dirichlet_alpha_nuevo=dirichlet_alpha_nuevo, lognorm_rr=lognorm_rr, aplicar_rr_en=aplicar_rr_en)
+    acc = AcumuladorPSA() if acumulador is None else acumulador
+    bloques = _iterar_bloques_psa(c, nsims_max, config, semilla, tam_lote, n_workers)
+    try:
+        for a, s in bloques:
+            acc.actualizar(AIP_total=a, SPF_final=s)
+            if progreso: progreso(acc.n, nsims_max, acc)
+            if tolerancia is not None and acc.n >= min_sims and acc.convergido(tolerancia):
+                break
+    finally:
+        bloques.close()
+    return acc
+
+def _psa_bloque_escenarios(cs: Tuple[InputsCompilados, ...], n:int, configs: Tuple[dict, ...],
+                           semilla: np.random.SeedSequence, diseno=None):
+    # Números aleatorios comunes: una sola matriz de uniformes por bloque, transformada con las
+    # distribuciones de cada escenario. Devuelve (AIP_total, SPF_final) de forma (n, escenarios).
+    espacios = [EspacioPSA(c, **cfg) for c, cfg in zip(cs, configs)]
+    D = espacios[0].dimension
+    if diseno is None:
+        U = np.random.default_rng(semilla).random((n, D))
+    else:
+        muestreo, n_replica, inicio = diseno
+        U = uniformes(muestreo, D, n_replica, inicio, n, semilla)
+    res = [_evaluar_psa(c, e.transformar(U)) for c, e in zip(cs, espacios)]
+    return np.stack([a for a,_ in res], axis=1), np.stack([s for _,s in res], axis=1)
+
+@instrumentar("psa_escenarios")
+def psa_escenarios(modelo, escenarios: Dict[str, Union[Inputs, InputsCompilados]], nsims:int,
+                   gamma_k_theta: Dict[str, tuple], dirichlet_alpha_actual=None, dirichlet_alpha_nuevo=None,
+                   lognorm_rr=None, aplicar_rr_en="costos", referencia: Optional[str]=None,
+                   tam_lote:int=50000, semilla=None, n_workers:int=1, muestreo:str="mc", replicas:int=10,
+                   progreso: Optional[Progreso]=None)->Dict[str, pd.DataFrame]:
+    # PSA de varios escenarios (variantes de shares, cobertura, población, presupuesto...) con
+    # números aleatorios comunes: todos se evalúan contra los mismos sorteos en una sola pasada,
+    # de modo que las diferencias entre escenarios no cargan el ruido de muestreo compartido.
+    # dirichlet_alpha_*: lista por año común a todos, {escenario: lista} o None (shares fijas).
+    # Los escenarios deben tener las mismas estrategias y horizonte. Devuelve:
+    #   "AIP_total", "SPF_final": simulaciones x escenarios
+    #   "resumen": media y percentiles por escenario y probabilidad de tener el menor AIP
+    #   "diferencias": AIP de cada escenario menos el de la referencia (el primero por defecto),
+    #                  pareadas por simulación; ee_sin_crn es el error que tendrían con sorteos independientes
+    import pandas as pd
+    if not escenarios: raise ValueError("Se requiere al menos un escenario")
+    nombres = list(escenarios)
+    referencia = nombres[0] if referencia is None else referencia
+    if referencia not in escenarios: raise ValueError(f"Escenario de referencia desconocido: {referencia}")
+    cs = tuple(_compilado(escenarios[k]) for k in nombres)
+    for k, c in zip(nombres[1:], cs[1:]):
+        if (c.estrategias != cs[0].estrategias or c.horizonte != cs[0].horizonte
+                or c.periodos_por_anio != cs[0].periodos_por_anio):
+            raise ValueError(f"El escenario '{k}' no tiene las mismas estrategias y horizonte que '{nombres[0]}'")
+    def _por_escenario(alphas, k):
+        return alphas.get(k) if isinstance(alphas, dict) else alphas
+    configs = tuple(dict(gamma_k_theta=gamma_k_theta, dirichlet_alpha_actual=_por_escenario(dirichlet_alpha_actual, k),
+                         dirichlet_alpha_nuevo=_por_escenario(dirichlet_alpha_nuevo, k),
+                         lognorm_rr=lognorm_rr, aplicar_rr_en=aplicar_rr_en) for k in nombres)
+    factores = {tuple(EspacioPSA(c, **cfg).nombres) for c, cfg in zip(cs, configs)}
+    if len(factores) > 1: raise ValueError("Los escenarios deben tener los mismos parámetros inciertos")
+    aip, spf = [], []
+    bloques = _iterar_bloques_psa(cs, nsims, configs, semilla, tam_lote, n_workers, muestreo, replicas,
+                                  bloque=_psa_bloque_escenarios)
+    try:
+        for a, s in bloques:
+            aip.append(a); spf.append(s)
+            if progreso: progreso(sum(map(len, aip)), nsims)
+    finally:
+        bloques.close()
+    AIP = np.concatenate(aip) if aip else np.empty((0, len(nombres)))
+    SPF = np.concatenate(spf) if spf else np.empty((0, len(nombres)))
+    menor = np.bincount(np.argmin(AIP, axis=1), minlength=len(nombres)) / max(len(AIP), 1)
+    resumen = pd.DataFrame({"media": AIP.mean(axis=0), "2.5%": np.quantile(AIP, 0.025, axis=0),
+                            "50%": np.quantile(AIP, 0.5, axis=0), "97.5%": np.quantile(AIP, 0.975, axis=0),
+                            "SPF_final medio": SPF.mean(axis=0), "P(menor AIP)": menor}, index=nombres)
+    r = nombres.index(referencia)
+    d = AIP - AIP[:, [r]]
+    diferencias = pd.DataFrame({"media": d.mean(axis=0), "ee": d.std(axis=0, ddof=1) / np.sqrt(len(d)),
+                                "ee_sin_crn": np.sqrt((AIP.var(axis=0, ddof=1) + AIP[:, r].var(ddof=1)) / len(d)),
+                                "2.5%": np.quantile(d, 0.025, axis=0), "97.5%": np.quantile(d, 0.975, axis=0),
+                                "P(menor que referencia)": (d < 0).mean(axis=0)}, index=nombres).drop(index=referencia)
+    return {"AIP_total": pd.DataFrame(AIP, columns=nombres), "SPF_final": pd.DataFrame(SPF, columns=nombres),
+            "resumen": resumen, "diferencias": diferencias}
@@ -0,0 +1,166 @@
+from __future__ import annotations
+import io, json, os, zipfile
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Dict, Union
+import numpy as np
+from .acumulador import AcumuladorPSA
+from .core import COMPONENTES_COSTO, Cohorte, Inputs, Strategy
+from .perf import instrumentar
+
+# Sesión de análisis (caso, configuración de DSA/PSA y resultados) en un archivo binario versionado
+# (.aip): un .npz con una entrada "meta" (JSON utf-8: versión, campos escalares, nombres y estructura)
+# y una entrada por arreglo numérico (costos, multiplicadores, series por periodo, tablas, histogramas).
+# Se lee con allow_pickle=False: abrir un archivo compartido no ejecuta código.
+# En config/resultados se admiten dict (claves str), list, tuple, escalares, arreglos numéricos,
+# DataFrames y AcumuladorPSA.
+
+FORMATO_SESION = "aip-sesion"
+VERSION_SESION = 1
+
+@dataclass
+class Sesion:
+    inputs: Inputs
+    modelo: str = "Modelo 2"
+    config: Dict[str, Any] = field(default_factory=dict)      # p. ej. {"dsa": variaciones, "psa": {...}}
+    resultados: Dict[str, Any] = field(default_factory=dict)
+
+class _Codificador:
+    def __init__(self):
+        self.arreglos: Dict[str, np.ndarray] = {}
+
+    def arreglo(self, a, nombre: str=None)->dict:
+        a = np.asarray(a)
+        if a.dtype.kind not in "biuf": raise TypeError(f"Arreglo no numérico ({a.dtype})")
+        nombre = nombre or f"a{len(self.arreglos)}"
+        self.arreglos[nombre] = a
+        return {"__arreglo__": nombre}
+
+    def __call__(self, o):
+        if o is None or isinstance(o, (bool, int, float, str)): return o
+        if isinstance(o, np.generic): return o.item()
+        if isinstance(o, np.ndarray): return self.arreglo(o)
+        if isinstance(o, list): return [self(x) for x in o]
+        if isinstance(o, tuple): return {"__tupla__": [self(x) for x in o]}
+        if isinstance(o, dict):
+            if not all(isinstance(k, str) for k in o): raise TypeError("Las claves de un dict deben ser str")
+            return {k: self(v) for k,v in o.items()}
+        if isinstance(o, AcumuladorPSA): return {"__acumulador__": self(o.estado())}
+        if type(o).__name__ == "DataFrame" and type(o).__module__.startswith("pandas"):
+            # columnas numéricas como arreglos, el resto como listas JSON
+            datos = [self.arreglo(o[c].to_numpy()) if o[c].dtype.kind in "biuf" else self(o[c].tolist())
+                     for c in o.columns]
+            indice = None if o.index.equals(_rango(len(o))) else self(o.index.tolist())
+            return {"__tabla__": {"columnas": self(o.columns.tolist()), "indice": indice, "datos": datos,
+                                  "attrs": self(dict(o.attrs))}}
+        raise TypeError(f"Tipo no serializable en la sesión: {type(o).__name__}")
+
+def _rango(n:int):
+    import pandas as pd
+    return pd.RangeIndex(n)
+
+def _decodificar(o, arreglos: Dict[str, np.ndarray]):
+    if isinstance(o, list): return [_decodificar(x, arreglos) for x in o]
+    if not isinstance(o, dict): return o
+    if len(o) == 1:
+        (k, v), = o.items()
+        if k == "__arreglo__": return arreglos[v]
+        if k == "__tupla__": return tuple(_decodificar(x, arreglos) for x in v)
+        if k == "__acumulador__": return AcumuladorPSA.desde_estado(_decodificar(v, arreglos))
+        if k == "__tabla__":
+            import pandas as pd
+            columnas = _decodificar(v["columnas"], arreglos)
+            df = pd.DataFrame(dict(zip(range(len(columnas)), (_decodificar(d, arreglos) for d in v["datos"]))),
+                              index=_decodificar(v["indice"], arreglos))
+            df.columns = columnas
+            df.attrs.update(_decodificar(v["attrs"], arreglos))
+            return df
+    return {k: _decodificar(x, arreglos) for k,x in o.items()}
+
+_SERIES = ("poblacion_objetivo", "cobertura_actual", "cobertura_nuevo", "presupuesto_anual", "otros_gastos_anuales")
+
+def _codificar_inputs(ins: Inputs, cod: _Codificador)->dict:
+    # escalares y nombres en el JSON; costos, multiplicadores, pesos y series como arreglos "caso.*"
+    cohortes = [c.nombre for c in ins.cohortes]
+    multiplicador = np.full((len(ins.estrategias), len(cohortes)), np.nan)
+    extra = {}
+    for i, e in enumerate(ins.estrategias):
+        for coh, m in (e.multiplicador_cohortes or {}).items():
+            if coh in cohortes: multiplicador[i, cohortes.index(coh)] = m
+            else: extra.setdefault(e.nombre, {})[coh] = float(m)
+    caso = {"nombre_caso": ins.nombre_caso, "horizonte": int(ins.horizonte),
+            "periodos_por_anio": int(ins.periodos_por_anio), "tasa_descuento": float(ins.tasa_descuento),
+            "saldo_inicial": float(ins.saldo_inicial), "cohortes": cohortes,
+            "estrategias": [e.nombre for e in ins.estrategias],
+            "sin_multiplicador": [e.nombre for e in ins.estrategias if not e.multiplicador_cohortes],
+            "multiplicador_extra": extra}
+    cod.arreglo(np.array([[getattr(e, c) for c in COMPONENTES_COSTO] for e in ins.estrategias], dtype=float)
+                .reshape(-1, 3), "caso.componentes")
+    cod.arreglo(multiplicador, "caso.multiplicador")
+    cod.arreglo(np.array([c.peso for c in ins.cohortes], dtype=float), "caso.pesos")
+    for s in _SERIES: cod.arreglo(np.array(getattr(ins, s), dtype=float), f"caso.{s}")
+    for s in ("shares_actual", "shares_nuevo"):
+        shares = getattr(ins, s)
+        if len({len(v) for v in shares.values()}) > 1:
+            raise ValueError(f"{s} tiene series de distinta longitud: valide el caso antes de guardarlo")
+        caso[s] = list(shares)
+        cod.arreglo(np.array(list(shares.values()), dtype=float).reshape(len(shares), -1), f"caso.{s}")
+    return caso
+
+def _decodificar_inputs(caso: dict, arreglos: Dict[str, np.ndarray])->Inputs:
+    cohortes = caso["cohortes"]
+    componentes, multiplicador = arreglos["caso.componentes"], arreglos["caso.multiplicador"]
+    estrategias = []
+    for i, nombre in enumerate(caso["estrategias"]):
+        mult = None
+        if nombre not in caso["sin_multiplicador"]:
+            mult = {c: float(m) for c, m in zip(cohortes, multiplicador[i]) if not np.isnan(m)}
+            mult.update(caso["multiplicador_extra"].get(nombre, {}))
+        estrategias.append(Strategy(nombre, *(float(x) for x in componentes[i]), mult))
+    return Inputs(
+        nombre_caso=caso["nombre_caso"],
+        horizonte=caso["horizonte"],
+        cohortes=[Cohorte(c, float(p)) for c, p in zip(cohortes, arreglos["caso.pesos"])],
+        estrategias=estrategias,
+        saldo_inicial=caso["saldo_inicial"],
+        periodos_por_anio=caso["periodos_por_anio"],
+        tasa_descuento=caso["tasa_descuento"],
+        **{s: arreglos[f"caso.{s}"].tolist() for s in _SERIES},
+        **{s: dict(zip(caso[s], arreglos[f"caso.{s}"].tolist())) for s in ("shares_actual", "shares_nuevo")},
+    )
+
+@instrumentar("guardar_sesion")
+def guardar_sesion(destino: Union[str, BinaryIO], sesion: Sesion, comprimir:bool=True)->None:
+    cod = _Codificador()
+    meta = {"formato": FORMATO_SESION, "version": VERSION_SESION, "modelo": sesion.modelo,
+            "caso": _codificar_inputs(sesion.inputs, cod), "config": cod(sesion.config),
+            "resultados": cod(sesion.resultados)}
+    entradas = {"meta": np.frombuffer(json.dumps(meta, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+                                      dtype=np.uint8), **cod.arreglos}
+    escribir = np.savez_compressed if comprimir else np.savez
+    if not isinstance(destino, (str, os.PathLike)):
+        escribir(destino, **entradas)
+        return
+    tmp = f"{destino}.tmp"
+    with open(tmp, "wb") as f: escribir(f, **entradas)
+    os.replace(tmp, destino)
+
+@instrumentar("cargar_sesion")
+def cargar_sesion(origen: Union[str, bytes, BinaryIO])->Sesion:
+    if isinstance(origen, (bytes, bytearray)): origen = io.BytesIO(origen)
+    try:
+        with np.load(origen, allow_pickle=False) as z:
+            if "meta" not in z.files: raise ValueError("falta la entrada meta")
+            meta = json.loads(z["meta"].tobytes().decode("utf-8"))
+            arreglos = {k: z[k] for k in z.files if k != "meta"}
+    except (OSError, ValueError, zipfile.BadZipFile, UnicodeDecodeError) as e:
+        raise ValueError(f"No es un archivo de sesión AIP válido ({e})") from None
+    if meta.get("formato") != FORMATO_SESION: raise ValueError("No es un archivo de sesión AIP")
+    if meta.get("version", 0) > VERSION_SESION:
+        raise ValueError(f"La sesión es de una versión más nueva ({meta['version']}); actualice la aplicación")
+    return Sesion(inputs=_decodificar_inputs(meta["caso"], arreglos), modelo=meta["modelo"],
+                  config=_decodificar(meta["config"], arreglos), resultados=_decodificar(meta["resultados"], arreglos))
+
+def sesion_a_bytes(sesion: Sesion, comprimir:bool=True)->bytes:
+    buf = io.BytesIO()
+    guardar_sesion(buf, sesion, comprimir)
+    return buf.getvalue()
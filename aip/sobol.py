@@ -0,0 +1,85 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Union
+import numpy as np
+from .core import Inputs, InputsCompilados, _compilado, costos_lote, resultados_lote
+from .muestreo import EspacioPSA
+from .perf import instrumentar, tramo
+if TYPE_CHECKING:
+    import pandas as pd
+
+def _filas(A: np.ndarray, B: np.ndarray, factores, inicio:int, fin:int)->np.ndarray:
+    # Filas [inicio, fin) del diseño de Saltelli apilado [A; B; AB_1; ...; AB_d] sin materializarlo:
+    # cada AB_i es A con las columnas del factor i tomadas de B.
+    n = len(A)
+    partes = []
+    for j in range(inicio // n, (fin - 1) // n + 1):
+        a, b = max(inicio, j*n) - j*n, min(fin, (j+1)*n) - j*n
+        if j == 1:
+            partes.append(B[a:b])
+            continue
+        bloque = A[a:b].copy()
+        if j > 1:
+            cols = factores[j-2][1]
+            bloque[:, cols] = B[a:b, cols]
+        partes.append(bloque)
+    return partes[0] if len(partes) == 1 else np.concatenate(partes)
+
+def _evaluar(espacio: EspacioPSA, A: np.ndarray, B: np.ndarray, salida:str, tam_lote:int,
+            progreso: Optional[Callable[..., None]]=None)->np.ndarray:
+    # evalúa las (d+2)*n corridas armando cada bloque de tam_lote filas a partir de A y B
+    total = (len(espacio.factores) + 2) * len(A)
+    res = []
+    for inicio in range(0, total, tam_lote):
+        fin = min(inicio + tam_lote, total)
+        with tramo("sobol.lote", unidades=fin-inicio):
+            U = _filas(A, B, espacio.factores, inicio, fin)
+            CA, CN, _, _ = costos_lote(espacio.c, **espacio.transformar(U))
+            AIP, SPF = resultados_lote(espacio.c, CA, CN)
+        res.append(AIP.sum(axis=1) if salida == "AIP_total" else SPF[:, -1])
+        if progreso: progreso(fin, total)
+    return np.concatenate(res)
+
+def _estimadores(fA: np.ndarray, fB: np.ndarray, fAB: np.ndarray):
+    # fA, fB: (..., N); fAB: (d, ..., N). Saltelli (2010) para S1 y Jansen (1999) para ST.
+    V = np.var(np.concatenate([fA, fB], axis=-1), axis=-1)
+    S1 = np.mean(fB * (fAB - fA), axis=-1) / V
+    ST = 0.5 * np.mean((fA - fAB)**2, axis=-1) / V
+    return S1, ST
+
+@instrumentar("sobol_indices")
+def sobol_indices(modelo, ins: Union[Inputs, InputsCompilados], n:int, gamma_k_theta: Dict[str, tuple],
+                  dirichlet_alpha_actual=None, dirichlet_alpha_nuevo=None,
+                  lognorm_rr=None, aplicar_rr_en="costos", salida:str="AIP_total",
+                  agrupar_dirichlet:str="escenario", n_bootstrap:int=200, nivel:float=0.95,
+                  semilla=None, tam_lote:int=20000,
+                  progreso: Optional[Callable[..., None]]=None)->pd.DataFrame:
+    # Índices de Sobol de primer orden (S1) y total (ST) de AIP_total (o SPF_final) respecto de
+    # los factores del PSA. Muestreo de Saltelli: matrices A y B (n x D, Sobol' aleatorizado) y
+    # una matriz AB_i por factor; las n*(d+2) corridas se evalúan en bloques de tam_lote filas que
+    # se arman sobre la marcha a partir de A y B (la memoria no crece con d). IC por bootstrap de percentiles.
+    import pandas as pd
+    from scipy.stats import qmc
+    if salida not in ("AIP_total", "SPF_final"): raise ValueError("salida debe ser 'AIP_total' o 'SPF_final'")
+    espacio = EspacioPSA(_compilado(ins), gamma_k_theta, dirichlet_alpha_actual, dirichlet_alpha_nuevo,
+                         lognorm_rr, aplicar_rr_en, agrupar_dirichlet)
+    D, d = espacio.dimension, len(espacio.factores)
+    if d == 0: raise ValueError("No hay parámetros inciertos para analizar")
+    rng = np.random.default_rng(semilla)
+    AB2 = qmc.Sobol(2*D, scramble=True, seed=rng).random(n)
+    A, B = AB2[:, :D], AB2[:, D:]
+    f = _evaluar(espacio, A, B, salida, tam_lote, progreso)
+    fA, fB, fAB = f[:n], f[n:2*n], f[2*n:].reshape(d, n)
+    S1, ST = _estimadores(fA, fB, fAB)
+    # bootstrap: mismas filas remuestreadas para fA, fB y cada fAB_i. Un remuestreo por vez y reducido a
+    # (S1, ST) antes del siguiente: la memoria es O(d·n), como fAB, y no O(d·n_bootstrap·n)
+    S1b, STb = np.empty((d, n_bootstrap)), np.empty((d, n_bootstrap))
+    for b in range(n_bootstrap):
+        idx = rng.integers(0, n, size=n)
+        S1b[:, b], STb[:, b] = _estimadores(fA[idx], fB[idx], fAB[:, idx])
+    a = (1 - nivel) / 2
+    df = pd.DataFrame({
+        "Factor": espacio.nombres,
+        "S1": S1, "S1_inf": np.quantile(S1b, a, axis=1), "S1_sup": np.quantile(S1b, 1-a, axis=1),
+        "ST": ST, "ST_inf": np.quantile(STb, a, axis=1), "ST_sup": np.quantile(STb, 1-a, axis=1),
+    })
+    return df.sort_values("ST", ascending=False, ignore_index=True)
@@ -1,12 +1,78 @@
 
-import streamlit as st, pandas as pd, numpy as np, plotly.express as px
-from aip.core import Inputs, Strategy, Cohorte, ejecutar_modelo
-from aip.sensitivity import dsa_univariado, psa_monte_carlo
-from aip.report import export_docx, export_pdf
+import copy, json, os
+import streamlit as st, pandas as pd, numpy as np
+from aip.cache import CacheResultados
+from aip.incremental import ModeloIncremental
+from aip.jobs import EjecutorTrabajos
+from aip.perf import perfilador, memoria_max_rss_mb
+from aip.core import Inputs, Strategy, Cohorte, compilar, ejecutar_modelo
+from aip.acumulador import AcumuladorPSA
+from aip.sesion import Sesion, cargar_sesion, sesion_a_bytes
+from aip.sensitivity import dsa_univariado, dsa_grilla, tabla_calor, psa_escenarios, psa_monte_carlo, psa_streaming
+
+def px():
+    # plotly.express, el informe (python-docx/reportlab) y Sobol (scipy) se importan al primer uso
+    import plotly.express
+    return plotly.express
 
 st.set_page_config(page_title="AIP-MINSA v2.2", page_icon="💸", layout="wide")
 st.title("AIP – Metodología MINSA (v2.2: formularios + validadores + PSA + subgrupos)")
 
+# Caché de resultados compartida entre reruns y sesiones (tope en MB y directorio opcional por entorno)
+@st.cache_resource
+def cache_resultados():
+    return CacheResultados(max_bytes=int(float(os.environ.get("AIP_CACHE_MB", "256"))*2**20),
+                           directorio=os.environ.get("AIP_CACHE_DIR") or None)
+cache = cache_resultados()
+
+# Análisis largos (PSA, grilla, Sobol) en un pool de hilos compartido por todas las sesiones:
+# la sesión guarda el id del trabajo y un fragmento muestra el avance sin bloquear los reruns.
+@st.cache_resource
+def ejecutor_trabajos():
+    return EjecutorTrabajos(workers=int(os.environ.get("AIP_TRABAJOS", "4")))
+ejecutor = ejecutor_trabajos()
+
+def enviar_trabajo(nombre, fn, *args, cachear=True, **kwargs):
+    # copia: el trabajo no debe ver ediciones posteriores de los objetos de la sesión
+    args, kwargs = copy.deepcopy(args), copy.deepcopy(kwargs)
+    if cachear:
+        t = ejecutor.enviar(cache.memo, fn, *args, descripcion=nombre, **kwargs)
+    else:
+        t = ejecutor.enviar(fn, *args, descripcion=nombre, **kwargs)
+    st.session_state.setdefault("trabajos", {})[nombre] = t.id
+
+def panel_trabajo(nombre, mostrar_resultado, mostrar_parcial=None):
+    t = ejecutor.trabajo(st.session_state.get("trabajos", {}).get(nombre))
+    if t is None:
+        cargado = st.session_state.get("resultados_cargados", {}).get(nombre)
+        if cargado is not None:
+            st.caption(f"{nombre}: resultado de la sesión abierta")
+            mostrar_resultado(cargado)
+        return
+    sondeando = t.activo
+    @st.fragment(run_every=1.0 if sondeando else None)
+    def _panel():
+        if t.activo:
+            c1, c2 = st.columns([5, 1])
+            texto = "En cola..." if t.estado == "pendiente" else f"{t.hechas:,} de {t.total or 0:,} ({t.segundos:.0f} s)"
+            c1.progress(t.progreso or 0.0, text=texto)
+            if c2.button("Cancelar", key=f"cancelar_{nombre}"): t.cancelar()
+            if mostrar_parcial and t.parcial is not None: mostrar_parcial(t.parcial)
+        elif sondeando:
+            st.rerun()      # rerun completo: deja de sondear y muestra el resultado
+        elif t.estado == "terminado":
+            mostrar_resultado(t.resultado)
+        elif t.estado == "cancelado":
+            st.warning(f"{nombre}: cancelado tras {t.hechas:,} de {t.total or 0:,}.")
+        else:
+            st.error(f"{nombre}: {t.error}")
+    _panel()
+
+def con_defecto(key, valor):
+    # widgets cuyo valor puede venir de una sesión abierta: el defecto va a session_state y no a value=
+    st.session_state.setdefault(key, valor)
+    return key
+
 # --- Helpers visuales y normalización de shares ---
 def _badge(text, bg="#fee2e2", fg="#b91c1c"):
     return f'<span style="display:inline-block;padding:2px 8px;border-radius:6px;background:{bg};color:{fg};font-weight:600;font-size:12px;border:1px solid rgba(0,0,0,0.05);">{text}</span>'
@@ -14,18 +80,54 @@ def _badge(text, bg="#fee2e2", fg="#b91c1c"):
 def badge_ok(text): return _badge(text, bg="#dcfce7", fg="#166534")
 def badge_err(text): return _badge(text, bg="#fee2e2", fg="#b91c1c")
 
-def normalize_shares(shares_dict, year_index, estrategia_objetivo):
-    estrs = list(shares_dict.keys())
-    if estrategia_objetivo not in estrs:
-        estrategia_objetivo = estrs[-1]
-    total = sum(shares_dict[e][year_index] for e in estrs)
-    delta = 1.0 - total
-    shares_dict[estrategia_objetivo][year_index] = max(0.0, min(1.0, shares_dict[estrategia_objetivo][year_index] + delta))
-    # normalización suave si quedara fuera por redondeos
-    s = sum(shares_dict[e][year_index] for e in estrs)
-    if s > 0:
-        for e in estrs:
-            shares_dict[e][year_index] = shares_dict[e][year_index] / s
+def normalize_shares(S, objetivo):
+    # S: (años, estrategias). Vuelca el faltante/sobrante de cada año en la columna `objetivo` y
+    # renormaliza los años que aún no suman 1 (p. ej. si el objetivo quedó recortado en 0).
+    S = np.clip(np.array(S, dtype=float), 0.0, 1.0)
+    S[:, objetivo] = np.clip(S[:, objetivo] + 1.0 - S.sum(axis=1), 0.0, 1.0)
+    s = S.sum(axis=1, keepdims=True)
+    return np.divide(S, s, out=S, where=s > 0)
+
+# --- Grillas editables (periodos x columnas) ---
+# grilla_<nombre>: tabla base que recibe st.data_editor; valores_<nombre>: última versión editada, que leen
+# armar_inputs y las demás secciones. Reemplazar la base (autocompletar, ejemplo, cambio de horizonte o de
+# estrategias) incrementa la versión de la clave del editor para descartar sus ediciones pendientes.
+def _periodos(T, p=1):
+    if p == 1: return [f"Año {t+1}" for t in range(T)]
+    letra = {4: "T", 12: "M"}.get(p, "P")
+    return [f"Año {t//p+1} · {letra}{t%p+1}" for t in range(T)]
+
+def fijar_grilla(nombre, df, p=None):
+    if p is not None: st.session_state[f"periodos_{nombre}"] = p
+    st.session_state[f"grilla_{nombre}"] = df
+    st.session_state[f"valores_{nombre}"] = df
+    st.session_state[f"ver_{nombre}"] = st.session_state.get(f"ver_{nombre}", 0) + 1
+
+def valores_grilla(nombre):
+    return st.session_state[f"valores_{nombre}"]
+
+def ajustar_grilla(nombre, anios, p, columnas, defecto, defectos=None, flujos=False):
+    # Conserva los valores al cambiar horizonte, estrategias o periodos por año. Al cambiar la
+    # resolución se pasa por años: los flujos (población, montos) se reparten y las fracciones se repiten.
+    indice = _periodos(anios*p, p)
+    previo = st.session_state.get(f"valores_{nombre}")
+    if previo is not None and list(previo.index) == indice and list(previo.columns) == columnas: return
+    nueva = pd.DataFrame({c: (defectos or {}).get(c, defecto) for c in columnas}, index=indice, dtype=float)
+    if previo is not None:
+        p0 = st.session_state.get(f"periodos_{nombre}", 1)
+        if p0 != p:
+            x = previo.to_numpy().reshape(-1, p0, previo.shape[1])
+            anual = x.sum(axis=1) / p if flujos else x.mean(axis=1)
+            previo = pd.DataFrame(np.repeat(anual, p, axis=0), index=_periodos(len(anual)*p, p), columns=previo.columns)
+        nueva.update(previo)
+    fijar_grilla(nombre, nueva, p)
+
+def editar_grilla(nombre, column_config):
+    df = st.data_editor(st.session_state[f"grilla_{nombre}"], column_config=column_config,
+                        key=f"editor_{nombre}_{st.session_state[f'ver_{nombre}']}", use_container_width=True)
+    df = df.fillna(0.0)     # celdas borradas
+    st.session_state[f"valores_{nombre}"] = df
+    return df
 
 # Estado inicial
 if "estrategias" not in st.session_state:
@@ -34,8 +136,8 @@ if "cohortes" not in st.session_state:
     st.session_state.cohortes = [Cohorte("General", 1.0)]
 if "tabla" not in st.session_state:
     st.session_state.tabla = None
-if "fig_paths" not in st.session_state:
-    st.session_state.fig_paths = {}
+if "figuras" not in st.session_state:
+    st.session_state.figuras = {}   # figuras Plotly para el informe; se renderizan a PNG al exportar
 
 # ---- Ejemplo precargado (Modelo 2, 3 estrategias, 2 cohortes) ----
 st.sidebar.divider()
@@ -49,46 +151,28 @@ if st.sidebar.button("📦 Cargar ejemplo (coexistencia, 3 estrategias, 2 cohort
         Strategy("Comparador B", 900.0, 130.0, 35.0, {"Adultos (18-64)": 1.0, "Adultos mayores (65+)": 1.1}),
         Strategy("Intervención", 1100.0, 140.0, 40.0, {"Adultos (18-64)": 1.0, "Adultos mayores (65+)": 1.05}),
     ]
-    for k,v in {"N_1":5000.0,"N_2":5200.0,"N_3":5400.0,"N_4":5600.0,"N_5":5800.0}.items(): st.session_state[k]=v
-    for k in ["covA_","covN_"]:
-        for t in range(1,6): st.session_state[f"{k}{t}"]=1.0
-    for t in range(1,6):
-        st.session_state[f"pres_{t}"]=0.0
-        st.session_state[f"gasto_{t}"]=0.0
+    t = np.arange(5)
+    fijar_grilla("General", pd.DataFrame({"Población": 5000.0 + 200.0*t, "Ingreso presupuestal": 0.0, "Otros gastos": 0.0},
+                                         index=_periodos(5)), p=1)
+    fijar_grilla("Actual", pd.DataFrame({"Cobertura": 1.0, "Comparador A": np.maximum(0.0, 0.6 - 0.1*t),
+                                        "Comparador B": 0.3, "Intervención": np.minimum(1.0, 0.1 + 0.1*t)}, index=_periodos(5)), p=1)
+    fijar_grilla("Nuevo", pd.DataFrame({"Cobertura": 1.0, "Comparador A": np.maximum(0.0, 0.3 - 0.05*t),
+                                       "Comparador B": np.maximum(0.0, 0.2 - 0.02*t),
+                                       "Intervención": np.minimum(1.0, 0.5 + 0.07*t)}, index=_periodos(5)), p=1)
     st.session_state["modelo_sel"]="Modelo 2"
-    for t in range(5):
-        st.session_state[f"A_{t}_Comparador A"]=max(0.0, 0.6 - 0.1*t)
-        st.session_state[f"A_{t}_Comparador B"]=0.3
-        st.session_state[f"A_{t}_Intervención"]=min(1.0, 0.1 + 0.1*t)
-        st.session_state[f"N_{t}_Comparador A"]=max(0.0, 0.3 - 0.05*t)
-        st.session_state[f"N_{t}_Comparador B"]=max(0.0, 0.2 - 0.02*t)
-        st.session_state[f"N_{t}_Intervención"]=min(1.0, 0.5 + 0.07*t)
     st.success("Ejemplo cargado. Revisa cada sección y pulsa 'Calcular AIP'.")
 # ---- fin ejemplo ----
 
 with st.sidebar:
     st.header("Parámetros generales")
-    nombre_caso = st.text_input("Nombre del caso", value="Caso AIP v2.2")
-    horizonte = st.slider("Horizonte (años)", 1, 5, 5)
-    N_t = []
-    st.markdown("**Población objetivo (N_t)**")
-    for t in range(horizonte):
-        key=f"N_{t+1}"
-        N_t.append(st.number_input(f"N_{t+1}", min_value=0.0, value=float(st.session_state.get(key,0.0)), step=100.0, key=key))
-    st.markdown("**Cobertura** (fracción atendida)")
-    cobertura_actual = []
-    cobertura_nuevo = []
-    for t in range(horizonte):
-        keyA=f"covA_{t+1}"; keyN=f"covN_{t+1}"
-        cobertura_actual.append(st.number_input(f"Cobertura actual año {t+1}", min_value=0.0, max_value=1.0, value=float(st.session_state.get(keyA,1.0)), step=0.05, key=keyA))
-        cobertura_nuevo.append(st.number_input(f"Cobertura nuevo año {t+1}", min_value=0.0, max_value=1.0, value=float(st.session_state.get(keyN,1.0)), step=0.05, key=keyN))
-    st.markdown("**Presupuesto**")
-    saldo0 = st.number_input("Saldo inicial", value=0.0, step=1000.0)
-    presu = []; otros = []
-    for t in range(horizonte):
-        pres_key=f"pres_{t+1}"; gas_key=f"gasto_{t+1}"
-        presu.append(st.number_input(f"Ingreso presupuestal año {t+1}", value=float(st.session_state.get(pres_key,0.0)), step=1000.0, key=pres_key))
-        otros.append(st.number_input(f"Otros gastos año {t+1}", value=float(st.session_state.get(gas_key,0.0)), step=1000.0, key=gas_key))
+    nombre_caso = st.text_input("Nombre del caso", key=con_defecto("nombre_caso", "Caso AIP v2.2"))
+    horizonte = st.slider("Horizonte (años)", 1, 30, key=con_defecto("horizonte", 5))
+    periodos = st.selectbox("Periodos por año", [1, 4, 12], format_func={1:"Anual", 4:"Trimestral", 12:"Mensual"}.get,
+                            key=con_defecto("periodos", 1))
+    tasa_desc = st.number_input("Tasa de descuento anual", min_value=0.0, max_value=1.0, step=0.005, format="%.3f",
+                                key=con_defecto("tasa_desc", 0.0))
+    saldo0 = st.number_input("Saldo inicial", step=1000.0, key=con_defecto("saldo0", 0.0))
+    st.caption("Población, cobertura, presupuesto y participaciones por periodo: sección 2.")
     options = ["Modelo 1","Modelo 2","Modelo 3","Modelo 4"]
     _default = st.session_state.get("modelo_sel", "Modelo 2")
     if _default not in options: _default = "Modelo 2"
@@ -99,196 +183,310 @@ n_coh = st.number_input("Número de cohortes", min_value=1, max_value=10, value=
 cohortes = []
 for i in range(n_coh):
     c1, c2 = st.columns([2,1])
-    nombre = c1.text_input(f"Nombre cohorte {i+1}", value=st.session_state.cohortes[i].nombre if i<len(st.session_state.cohortes) else f"Cohorte {i+1}", key=f"coh_nom_{i}")
-    peso   = c2.number_input(f"Peso cohorte {i+1}", min_value=0.0, max_value=1.0, value=st.session_state.cohortes[i].peso if i<len(st.session_state.cohortes) else 0.0, step=0.05, key=f"coh_peso_{i}")
+    nombre = c1.text_input(f"Nombre cohorte {i+1}", key=con_defecto(f"coh_nom_{i}", st.session_state.cohortes[i].nombre if i<len(st.session_state.cohortes) else f"Cohorte {i+1}"))
+    peso   = c2.number_input(f"Peso cohorte {i+1}", min_value=0.0, max_value=1.0, step=0.05, key=con_defecto(f"coh_peso_{i}", st.session_state.cohortes[i].peso if i<len(st.session_state.cohortes) else 0.0))
     cohortes.append(Cohorte(nombre, float(peso)))
 st.session_state.cohortes = cohortes
 st.caption("La suma de pesos debe ser 1.0")
 
-# --- Sección de shares con badges y autocompletar ---
-st.subheader("2) Participaciones de mercado por año")
 estrategias = st.session_state.estrategias
-shares_actual = {e.nombre:[0.0]*len(N_t) for e in estrategias}
-shares_nuevo  = {e.nombre:[0.0]*len(N_t) for e in estrategias}
-tolerancia = 1e-3
-any_invalid = False
-
-for t in range(len(N_t)):
-    st.markdown(f"**Año {t+1}**")
-    cols = st.columns(len(estrategias))
-    sumaA = 0.0; sumaN = 0.0
-    for i,e in enumerate(estrategias):
-        with cols[i]:
-            keyA=f"A_{t}_{e.nombre}"; keyN=f"N_{t}_{e.nombre}"
-            shares_actual[e.nombre][t] = st.number_input(
-                f"{e.nombre} (actual)", min_value=0.0, max_value=1.0,
-                value=float(st.session_state.get(keyA,0.0)), step=0.05, key=keyA
-            )
-            shares_nuevo[e.nombre][t]  = st.number_input(
-                f"{e.nombre} (nuevo)",  min_value=0.0, max_value=1.0,
-                value=float(st.session_state.get(keyN,0.0)), step=0.05, key=keyN
-            )
-            sumaA += shares_actual[e.nombre][t]
-            sumaN += shares_nuevo[e.nombre][t]
-
-    colA, colB, colC, colD = st.columns([1.2,1.2,1,1])
-    with colA:
-        if np.isclose(sumaA, 1.0, atol=tolerancia):
-            st.markdown(badge_ok(f"Actual: suma {sumaA:.2f} ✓"), unsafe_allow_html=True)
-        else:
-            any_invalid = True
-            st.markdown(badge_err(f"Actual: suma {sumaA:.2f} → falta {1.00 - sumaA:+.2f}"), unsafe_allow_html=True)
-    with colB:
-        if np.isclose(sumaN, 1.0, atol=tolerancia):
-            st.markdown(badge_ok(f"Nuevo: suma {sumaN:.2f} ✓"), unsafe_allow_html=True)
-        else:
-            any_invalid = True
-            st.markdown(badge_err(f"Nuevo: suma {sumaN:.2f} → falta {1.00 - sumaN:+.2f}"), unsafe_allow_html=True)
-
-    with colC:
-        objetivoA = st.selectbox(f"Ajustar en (actual) Año {t+1}", [e.nombre for e in estrategias], key=f"ajA_{t}")
-    with colD:
-        objN = st.selectbox(f"Ajustar en (nuevo) Año {t+1}", [e.nombre for e in estrategias], key=f"ajN_{t}")
-
-    c1, c2 = st.columns(2)
-    with c1:
-        if st.button(f"Autocompletar Actual Año {t+1}", key=f"autoA_{t}"):
-            normalize_shares(shares_actual, t, objetivoA)
-            for e in estrategias:
-                st.session_state[f"A_{t}_{e.nombre}"] = shares_actual[e.nombre][t]
-            st.experimental_rerun()
-    with c2:
-        if st.button(f"Autocompletar Nuevo Año {t+1}", key=f"autoN_{t}"):
-            normalize_shares(shares_nuevo, t, objN)
-            for e in estrategias:
-                st.session_state[f"N_{t}_{e.nombre}"] = shares_nuevo[e.nombre][t]
-            st.experimental_rerun()
-
-st.session_state.shares_actual = shares_actual
-st.session_state.shares_nuevo  = shares_nuevo
-
-st.subheader("3) Ejecutar modelo")
-if any_invalid:
-    st.error("Hay años en los que las participaciones de mercado **no suman 1.00**. Usa *Autocompletar* o ajusta manualmente (badges en rojo).")
-else:
-    if st.button("Calcular AIP"):
-        ins = Inputs(
-            nombre_caso=nombre_caso,
-            horizonte=len(N_t),
-            poblacion_objetivo=N_t,
-            cohortes=cohortes,
-            estrategias=estrategias,
-            shares_actual=shares_actual,
-            shares_nuevo=shares_nuevo,
-            cobertura_actual=cobertura_actual,
-            cobertura_nuevo=cobertura_nuevo,
-            saldo_inicial=saldo0,
-            presupuesto_anual=presu,
-            otros_gastos_anuales=otros
-        )
+nombres_estr = [e.nombre for e in estrategias]
+ajustar_grilla("General", horizonte, periodos, ["Población", "Ingreso presupuestal", "Otros gastos"], 0.0, flujos=True)
+for esc in ("Actual", "Nuevo"):
+    ajustar_grilla(esc, horizonte, periodos, ["Cobertura"] + nombres_estr, 0.0, {"Cobertura": 1.0})
+
+def armar_inputs():
+    # lee los valores vigentes de las grillas (también desde reruns de fragmento o de otras secciones)
+    g, A, N = (valores_grilla(k) for k in ("General", "Actual", "Nuevo"))
+    return Inputs(
+        nombre_caso=nombre_caso,
+        horizonte=len(g) // periodos,
+        poblacion_objetivo=g["Población"].tolist(),
+        cohortes=cohortes,
+        estrategias=estrategias,
+        shares_actual={e: A[e].tolist() for e in nombres_estr},
+        shares_nuevo={e: N[e].tolist() for e in nombres_estr},
+        cobertura_actual=A["Cobertura"].tolist(),
+        cobertura_nuevo=N["Cobertura"].tolist(),
+        saldo_inicial=saldo0,
+        presupuesto_anual=g["Ingreso presupuestal"].tolist(),
+        otros_gastos_anuales=g["Otros gastos"].tolist(),
+        periodos_por_anio=periodos,
+        tasa_descuento=tasa_desc
+    )
+
+# Secciones 2 y 3 en un fragmento: editar una celda vuelve a ejecutar solo el editor, los validadores y la
+# vista previa del modelo, no el resto de la página.
+@st.fragment
+def editor_y_modelo():
+    st.subheader("2) Población, cobertura y participaciones de mercado por periodo")
+    tolerancia = 1e-3
+    any_invalid = False
+    col_share = st.column_config.NumberColumn(min_value=0.0, max_value=1.0, step=0.01, format="%.2f")
+    col_monto = st.column_config.NumberColumn(min_value=0.0, step=100.0, format="%.0f")
+    tab_g, tab_a, tab_n = st.tabs(["Población y presupuesto", "Escenario actual", "Escenario nuevo"])
+    with tab_g:
+        if periodos > 1: st.caption("Población, ingresos y gastos de cada periodo (no anualizados).")
+        editar_grilla("General", {"Población": col_monto, "Ingreso presupuestal": st.column_config.NumberColumn(step=1000.0, format="%.0f"),
+                                  "Otros gastos": st.column_config.NumberColumn(step=1000.0, format="%.0f")})
+    for esc, tab in (("Actual", tab_a), ("Nuevo", tab_n)):
+        with tab:
+            df = editar_grilla(esc, {c: col_share for c in ["Cobertura"] + nombres_estr})
+            # validación de todos los años a la vez
+            sumas = df[nombres_estr].to_numpy().sum(axis=1)
+            malos = np.flatnonzero(~np.isclose(sumas, 1.0, atol=tolerancia))
+            if len(malos) == 0:
+                st.markdown(badge_ok(f"{esc}: las participaciones suman 1.00 en todos los años ✓"), unsafe_allow_html=True)
+            else:
+                any_invalid = True
+                st.markdown(" ".join(badge_err(f"{df.index[t]}: suma {sumas[t]:.2f} → falta {1.00 - sumas[t]:+.2f}") for t in malos),
+                            unsafe_allow_html=True)
+            c1, c2 = st.columns([2, 1])
+            objetivo = c1.selectbox(f"Ajustar en ({esc.lower()})", nombres_estr, index=len(nombres_estr)-1, key=f"aj_{esc}")
+            if c2.button(f"Autocompletar {esc.lower()} (todos los años)", key=f"auto_{esc}", disabled=len(malos) == 0):
+                S = normalize_shares(df[nombres_estr].to_numpy(), nombres_estr.index(objetivo))
+                fijar_grilla(esc, df.assign(**dict(zip(nombres_estr, S.T))))
+                st.rerun(scope="fragment")
+
+    st.subheader("3) Ejecutar modelo")
+    # Vista previa en vivo: el modelo incremental solo recalcula los años/estrategias editados
+    if not any_invalid:
         try:
-            res = ejecutar_modelo(modelo, ins)
-            st.session_state.tabla = res["tabla"]
-            st.success(f"AIP acumulado: S/ {res['AIP_total']:.0f} | SPF final: S/ {res['SPF_final']:.0f}")
-            st.dataframe(res["tabla"], use_container_width=True)
-            df = res["tabla"]
-            fig1 = px.line(df, x="Año", y=["Costo agregado (Actual)","Costo agregado (Nuevo)"], title="Costos agregados por escenario", markers=True)
-            st.plotly_chart(fig1, use_container_width=True)
-            fig2 = px.bar(df, x="Año", y="Impacto Incremental (AIP)", title="Impacto Presupuestal Incremental")
-            st.plotly_chart(fig2, use_container_width=True)
-            fig3 = px.line(df, x="Año", y="SPF", title="Saldo Presupuestal Final (SPF)", markers=True)
-            st.plotly_chart(fig3, use_container_width=True)
-            import os
-            os.makedirs("reports", exist_ok=True)
-            fig_paths = {}
-            for name,fig in {"Costos":fig1,"AIP":fig2,"SPF":fig3}.items():
-                p = f"reports/{name}.png"
-                fig.write_image(p, format="png")
-                fig_paths[name]=p
-            st.session_state.fig_paths = fig_paths
-        except Exception as e:
-            st.error(str(e))
+            ins_vivo = armar_inputs()
+            ins_vivo.validate()
+            ins_vivo = compilar(ins_vivo)
+            if st.session_state.get("modelo_inc") is None:
+                st.session_state.modelo_inc = ModeloIncremental(ins_vivo)
+            else:
+                st.session_state.modelo_inc.sincronizar(ins_vivo)
+            m_inc = st.session_state.modelo_inc
+            v1, v2 = st.columns(2)
+            v1.metric("AIP acumulado (vista previa)", f"S/ {m_inc.AIP_total:,.0f}")
+            v2.metric("SPF final (vista previa)", f"S/ {m_inc.SPF_final:,.0f}")
+        except ValueError as e:
+            st.caption(f"Vista previa no disponible: {e}")
+    if any_invalid:
+        st.error("Hay años en los que las participaciones de mercado **no suman 1.00**. Usa *Autocompletar* o ajusta manualmente (badges en rojo).")
+    else:
+        if st.button("Calcular AIP"):
+            ins = armar_inputs()
+            try:
+                res = cache.memo(ejecutar_modelo, modelo, ins)
+                st.session_state.tabla = res["tabla"]
+                desc = f" | AIP descontado: S/ {res['AIP_total_descontado']:.0f}" if tasa_desc else ""
+                st.success(f"AIP acumulado: S/ {res['AIP_total']:.0f}{desc} | SPF final: S/ {res['SPF_final']:.0f}")
+                st.dataframe(res["tabla"], use_container_width=True)
+                if "tabla_periodos" in res:
+                    with st.expander("Detalle por periodo"):
+                        st.dataframe(res["tabla_periodos"], use_container_width=True)
+                df = res["tabla"]
+                fig1 = px().line(df, x="Año", y=["Costo agregado (Actual)","Costo agregado (Nuevo)"], title="Costos agregados por escenario", markers=True)
+                st.plotly_chart(fig1, use_container_width=True)
+                fig2 = px().bar(df, x="Año", y="Impacto Incremental (AIP)", title="Impacto Presupuestal Incremental")
+                st.plotly_chart(fig2, use_container_width=True)
+                fig3 = px().line(df, x="Año", y="SPF", title="Saldo Presupuestal Final (SPF)", markers=True)
+                st.plotly_chart(fig3, use_container_width=True)
+                st.session_state.figuras.update({"Costos":fig1,"AIP":fig2,"SPF":fig3})
+            except Exception as e:
+                st.error(str(e))
+editor_y_modelo()
 
 st.subheader("4) Sensibilidad determinística (DSA)")
 with st.expander("Configurar y ejecutar"):
     variaciones = {}
     for e in estrategias:
-        vmin = st.number_input(f"{e.nombre}: costo_ts min", value=0.9*e.costo_ts if e.costo_ts>0 else 0.0, step=10.0, key=f"dsa_min_{e.nombre}")
-        vmax = st.number_input(f"{e.nombre}: costo_ts max", value=1.1*e.costo_ts if e.costo_ts>0 else 0.0, step=10.0, key=f"dsa_max_{e.nombre}")
+        vmin = st.number_input(f"{e.nombre}: costo_ts min", step=10.0, key=con_defecto(f"dsa_min_{e.nombre}", 0.9*e.costo_ts if e.costo_ts>0 else 0.0))
+        vmax = st.number_input(f"{e.nombre}: costo_ts max", step=10.0, key=con_defecto(f"dsa_max_{e.nombre}", 1.1*e.costo_ts if e.costo_ts>0 else 0.0))
         variaciones[f"estrategia:{e.nombre}:costo_ts"] = (float(vmin), float(vmax))
     if st.button("Ejecutar DSA"):
-        ins = Inputs(
-            nombre_caso=nombre_caso,
-            horizonte=len(N_t),
-            poblacion_objetivo=N_t,
-            cohortes=cohortes,
-            estrategias=estrategias,
-            shares_actual=shares_actual,
-            shares_nuevo=shares_nuevo,
-            cobertura_actual=cobertura_actual,
-            cobertura_nuevo=cobertura_nuevo,
-            saldo_inicial=saldo0,
-            presupuesto_anual=presu,
-            otros_gastos_anuales=otros
-        )
-        df_dsa = dsa_univariado(modelo, ins, variaciones)
+        ins = armar_inputs()
+        df_dsa = cache.memo(dsa_univariado, modelo, ins, variaciones)
         st.dataframe(df_dsa, use_container_width=True)
-        figt = px.bar(df_dsa, x="Delta", y="Parámetro", orientation="h", title="Diagrama Tornado (AIP total)")
+        figt = px().bar(df_dsa, x="Delta", y="Parámetro", orientation="h", title="Diagrama Tornado (AIP total)")
         st.plotly_chart(figt, use_container_width=True)
+        st.session_state.figuras["Tornado (DSA)"] = figt
+
+    st.markdown("**Sensibilidad de dos vías (grilla)**")
+    campos_grilla = [f"estrategia:{e.nombre}:{c}" for e in estrategias for c in ("costo_ts","costo_procedimientos","costo_eventos")]
+    campos_grilla += ["inputs:cobertura_actual","inputs:cobertura_nuevo","inputs:poblacion_objetivo","inputs:saldo_inicial"]
+    g1, g2 = st.columns(2)
+    campo_f = g1.selectbox("Parámetro (filas)", campos_grilla, key="grid_f")
+    f_min = g1.number_input("Mínimo (filas)", value=0.0, key="grid_f_min")
+    f_max = g1.number_input("Máximo (filas)", value=1.0, key="grid_f_max")
+    campo_c = g2.selectbox("Parámetro (columnas)", campos_grilla, index=min(1, len(campos_grilla)-1), key="grid_c")
+    c_min = g2.number_input("Mínimo (columnas)", value=0.0, key="grid_c_min")
+    c_max = g2.number_input("Máximo (columnas)", value=1.0, key="grid_c_max")
+    n_puntos = st.slider("Puntos por eje", 2, 100, 50, key="grid_n")
+    if st.button("Ejecutar grilla"):
+        if campo_f == campo_c:
+            st.error("Elige dos parámetros distintos.")
+        else:
+            enviar_trabajo("Grilla DSA", dsa_grilla, modelo, armar_inputs(),
+                           {campo_f: np.linspace(f_min, f_max, n_puntos), campo_c: np.linspace(c_min, c_max, n_puntos)},
+                           tam_lote=2000)
+    def mostrar_grilla(df_g):
+        fila, columna = df_g.columns[:2]
+        calor = tabla_calor(df_g, fila, columna)
+        figc = px().imshow(calor, labels={"x":columna, "y":fila, "color":"AIP total"},
+                           aspect="auto", origin="lower", title="AIP total (grilla de dos vías)")
+        st.plotly_chart(figc, use_container_width=True)
+        st.session_state.figuras["Grilla de dos vías (DSA)"] = figc
+        st.dataframe(calor, use_container_width=True)
+    panel_trabajo("Grilla DSA", mostrar_grilla)
 
 st.subheader("5) Sensibilidad probabilística (PSA)")
 with st.expander("Configurar y ejecutar PSA"):
-    nsims = st.number_input("Número de simulaciones", min_value=100, max_value=20000, value=2000, step=100)
+    muestreo = st.selectbox("Muestreo", ["mc", "sobol", "lhs"],
+                            format_func={"mc":"Monte Carlo", "sobol":"Sobol' aleatorizado (QMC)", "lhs":"Hipercubo latino"}.get)
+    nsims = st.number_input("Número máximo de simulaciones" if muestreo=="mc" else "Número de simulaciones",
+                            min_value=100, max_value=1_000_000, value=2000 if muestreo=="mc" else 4096, step=100)
+    if muestreo == "mc":
+        detener = st.checkbox("Detener al converger (error estándar Monte Carlo de media y percentiles)")
+        tolerancia = st.number_input("Tolerancia (S/)", min_value=0.0, value=1000.0, step=100.0) if detener else None
+    else:
+        detener, tolerancia = False, None
+        replicas = st.number_input("Réplicas aleatorizadas (para el error estándar)", min_value=2, max_value=64, value=8, step=1)
+        if muestreo == "sobol" and (int(nsims)//int(replicas)) & (int(nsims)//int(replicas) - 1):
+            st.caption("Sugerencia: use simulaciones por réplica potencia de 2 (p. ej. 8 × 512 = 4096).")
+    c_sem, c_wrk = st.columns(2)
+    semilla = c_sem.number_input("Semilla", min_value=0, step=1, key=con_defecto("psa_semilla", 12345))
+    n_workers = c_wrk.number_input("Procesos (workers, 0 = todos los núcleos)", min_value=0, max_value=64, value=1, step=1)
     st.markdown("**Gamma (k, θ) para costos por paciente**")
     gamma_params = {}
     for e in estrategias:
-        k = st.number_input(f"{e.nombre} k", value=50.0, step=1.0, key=f"gk_{e.nombre}")
-        th_cts = st.number_input(f"{e.nombre} θ costo_ts", value=(e.costo_ts/50.0 if e.costo_ts>0 else 1.0), step=1.0, key=f"gth_cts_{e.nombre}")
-        th_cpr = st.number_input(f"{e.nombre} θ costo_proc", value=(e.costo_procedimientos/50.0 if e.costo_procedimientos>0 else 1.0), step=1.0, key=f"gth_cpr_{e.nombre}")
-        th_cea = st.number_input(f"{e.nombre} θ costo_EA", value=(e.costo_eventos/50.0 if e.costo_eventos>0 else 1.0), step=1.0, key=f"gth_cea_{e.nombre}")
+        k = st.number_input(f"{e.nombre} k", step=1.0, key=con_defecto(f"gk_{e.nombre}", 50.0))
+        th_cts = st.number_input(f"{e.nombre} θ costo_ts", step=1.0, key=con_defecto(f"gth_cts_{e.nombre}", e.costo_ts/50.0 if e.costo_ts>0 else 1.0))
+        th_cpr = st.number_input(f"{e.nombre} θ costo_proc", step=1.0, key=con_defecto(f"gth_cpr_{e.nombre}", e.costo_procedimientos/50.0 if e.costo_procedimientos>0 else 1.0))
+        th_cea = st.number_input(f"{e.nombre} θ costo_EA", step=1.0, key=con_defecto(f"gth_cea_{e.nombre}", e.costo_eventos/50.0 if e.costo_eventos>0 else 1.0))
         gamma_params[f"estrategia:{e.nombre}:costo_ts"] = (float(k), float(th_cts))
         gamma_params[f"estrategia:{e.nombre}:costo_procedimientos"] = (float(k), float(th_cpr))
         gamma_params[f"estrategia:{e.nombre}:costo_eventos"] = (float(k), float(th_cea))
-    st.markdown("**Dirichlet (α) por año y escenario para shares**")
-    dirA = []; dirN = []
-    for t in range(len(N_t)):
-        with st.expander(f"Alphas año {t+1}"):
-            rowA = {}; rowN = {}
-            for e in estrategias:
-                rowA[e.nombre] = st.number_input(f"α Actual {e.nombre} año {t+1}", value=10.0, step=1.0, key=f"alphaA_{t}_{e.nombre}")
-                rowN[e.nombre] = st.number_input(f"α Nuevo {e.nombre} año {t+1}", value=10.0, step=1.0, key=f"alphaN_{t}_{e.nombre}")
-            dirA.append(rowA); dirN.append(rowN)
-    use_rr = st.checkbox("Incluir RR lognormal (aplicar sobre costos o población)")
-    rr_target = st.selectbox("Aplicar RR a:", ["costos","poblacion"]) if use_rr else "costos"
-    mu = st.number_input("mu (log)", value=0.0) if use_rr else 0.0
-    sigma = st.number_input("sigma (log)", value=0.1) if use_rr else 0.0
+    st.markdown("**Dirichlet (α) por año y escenario para shares** (las shares se sortean una vez por año)")
+    alfas = {}
+    for esc, tab in zip(("Actual", "Nuevo"), st.tabs(["α actual", "α nuevo"])):
+        ajustar_grilla(f"alfa_{esc}", horizonte, 1, nombres_estr, 10.0)
+        with tab:
+            alfa = editar_grilla(f"alfa_{esc}", {e: st.column_config.NumberColumn(min_value=1e-3, step=1.0) for e in nombres_estr})
+        alfas[esc] = alfa.clip(lower=1e-3).to_dict("records")
+    dirA, dirN = alfas["Actual"], alfas["Nuevo"]
+    use_rr = st.checkbox("Incluir RR lognormal (aplicar sobre costos o población)", key=con_defecto("use_rr", False))
+    rr_target = st.selectbox("Aplicar RR a:", ["costos","poblacion"], key=con_defecto("rr_target", "costos")) if use_rr else "costos"
+    mu = st.number_input("mu (log)", key=con_defecto("rr_mu", 0.0)) if use_rr else 0.0
+    sigma = st.number_input("sigma (log)", key=con_defecto("rr_sigma", 0.1)) if use_rr else 0.0
+    a_disco = st.checkbox("Guardar sorteos y resultados por año en disco (sin detención por convergencia)")
     if st.button("Ejecutar PSA"):
-        ins = Inputs(
-            nombre_caso=nombre_caso,
-            horizonte=len(N_t),
-            poblacion_objetivo=N_t,
-            cohortes=cohortes,
-            estrategias=estrategias,
-            shares_actual=shares_actual,
-            shares_nuevo=shares_nuevo,
-            cobertura_actual=cobertura_actual,
-            cobertura_nuevo=cobertura_nuevo,
-            saldo_inicial=saldo0,
-            presupuesto_anual=presu,
-            otros_gastos_anuales=otros
-        )
-        df_psa = psa_monte_carlo(modelo, ins, int(nsims), gamma_params, dirA, dirN,
-                                 lognorm_rr={"costos":(mu,sigma),"poblacion":(mu,sigma)} if use_rr else None,
-                                 aplicar_rr_en=rr_target)
-        desc = df_psa.describe(percentiles=[0.025,0.5,0.975]).T
+        ins = armar_inputs()
+        rr_cfg = {"costos":(mu,sigma),"poblacion":(mu,sigma)} if use_rr else None
+        if a_disco:
+            from aip.almacen import psa_a_disco
+            directorio = os.path.join(os.environ.get("AIP_PSA_DIR", os.path.join("reports", "psa")),
+                                      pd.Timestamp.now().strftime("%Y%m%d-%H%M%S"))
+            enviar_trabajo("PSA", psa_a_disco, directorio, modelo, ins, int(nsims), gamma_params, dirA, dirN,
+                           lognorm_rr=rr_cfg, aplicar_rr_en=rr_target, semilla=int(semilla),
+                           n_workers=int(n_workers), muestreo=muestreo,
+                           replicas=int(replicas) if muestreo != "mc" else 10, cachear=False)
+        elif muestreo == "mc":
+            enviar_trabajo("PSA", psa_streaming, modelo, ins, int(nsims), gamma_params, dirA, dirN,
+                           lognorm_rr=rr_cfg, aplicar_rr_en=rr_target, tolerancia=tolerancia,
+                           semilla=int(semilla), n_workers=int(n_workers))
+        else:
+            enviar_trabajo("PSA", psa_monte_carlo, modelo, ins, int(nsims), gamma_params, dirA, dirN,
+                           lognorm_rr=rr_cfg, aplicar_rr_en=rr_target, semilla=int(semilla),
+                           n_workers=int(n_workers), muestreo=muestreo, replicas=int(replicas))
+    def mostrar_psa(res, final=True):
+        if isinstance(res, AcumuladorPSA):
+            acc = res
+        elif hasattr(res, "resumir"):
+            st.caption(f"Sorteos y resultados por año guardados en {res.directorio} "
+                       f"(reabrir con aip.almacen.AlmacenPSA)")
+            acc = res.resumir()
+        else:
+            acc = AcumuladorPSA()
+            acc.actualizar(AIP_total=res["AIP_total"].values, SPF_final=res["SPF_final"].values)
+            st.write(f"Error estándar entre réplicas ({res.attrs['muestreo']})")
+            st.dataframe(pd.DataFrame(res.attrs["error_estandar"]).T, use_container_width=True)
+        st.caption(f"Simulaciones {'ejecutadas' if final else 'hasta ahora'}: {acc.n:,}")
+        desc = acc.resumen()
         st.dataframe(desc, use_container_width=True)
-        figh = px.histogram(df_psa, x="AIP_total", nbins=50, title="Distribución AIP_total (PSA)", histnorm="probability")
+        bordes, prob = acc.histograma("AIP_total", 50)
+        figh = px().bar(x=(bordes[:-1]+bordes[1:])/2, y=prob, labels={"x":"AIP_total","y":"probability"},
+                        title="Distribución AIP_total (PSA)")
+        figh.update_traces(width=float(bordes[1]-bordes[0]))
         st.plotly_chart(figh, use_container_width=True)
-        q = df_psa["AIP_total"].quantile([0.025,0.5,0.975]).to_frame().T
-        st.write("Percentiles AIP_total (P2.5, P50, P97.5)")
-        st.dataframe(q, use_container_width=True)
+        if final:
+            st.session_state.figuras["Distribución AIP_total (PSA)"] = figh
+            q = desc.loc[["AIP_total"], ["2.5%","50%","97.5%"]]
+            st.write("Percentiles AIP_total (P2.5, P50, P97.5)")
+            st.dataframe(q, use_container_width=True)
+    panel_trabajo("PSA", mostrar_psa, lambda acc: mostrar_psa(acc, final=False))
+
+    st.markdown("**Comparación de escenarios (números aleatorios comunes)**")
+    st.caption("Guarda variantes del caso (shares, cobertura, población, presupuesto) y compáralas contra los mismos "
+               "sorteos: las diferencias pareadas necesitan muchas menos simulaciones que PSA separados.")
+    escenarios = st.session_state.setdefault("escenarios", {})
+    e1, e2, e3 = st.columns([3, 1, 1])
+    nombre_esc = e1.text_input("Nombre del escenario", value=f"Escenario {len(escenarios)+1}")
+    if e2.button("Guardar caso actual"):
+        escenarios[nombre_esc] = copy.deepcopy(armar_inputs())
+    if e3.button("Borrar escenarios"):
+        escenarios.clear()
+    if escenarios:
+        st.write("Escenarios guardados: " + ", ".join(escenarios))
+        conc = st.number_input("Concentración Dirichlet (α = concentración × share del escenario)", min_value=1.0, value=20.0, step=1.0)
+        ref = st.selectbox("Escenario de referencia", list(escenarios))
+    if st.button("Comparar escenarios", disabled=len(escenarios) < 2):
+        def _alphas_anio(x, serie):
+            # α por año: concentración × share media de los periodos del año
+            p = x.periodos_por_anio
+            return [{e: max(conc*float(np.mean(v[t*p:(t+1)*p])), 1e-3) for e,v in getattr(x, serie).items()}
+                    for t in range(x.horizonte)]
+        alphas = {serie: {k: _alphas_anio(x, serie) for k,x in escenarios.items()} for serie in ("shares_actual", "shares_nuevo")}
+        enviar_trabajo("Comparación", psa_escenarios, modelo, dict(escenarios), int(nsims), gamma_params,
+                       alphas["shares_actual"], alphas["shares_nuevo"],
+                       lognorm_rr={"costos":(mu,sigma),"poblacion":(mu,sigma)} if use_rr else None,
+                       aplicar_rr_en=rr_target, referencia=ref, semilla=int(semilla), n_workers=int(n_workers),
+                       muestreo=muestreo, replicas=int(replicas) if muestreo != "mc" else 10)
+    def mostrar_comparacion(r):
+        st.dataframe(r["resumen"], use_container_width=True)
+        st.write("Diferencias pareadas de AIP_total contra la referencia")
+        st.dataframe(r["diferencias"], use_container_width=True)
+        figp = px().bar(r["resumen"].reset_index(names="Escenario"), x="Escenario", y="P(menor AIP)",
+                        title="Probabilidad de tener el menor AIP (PSA pareado)")
+        st.plotly_chart(figp, use_container_width=True)
+        st.session_state.figuras["Comparación de escenarios (PSA)"] = figp
+    panel_trabajo("Comparación", mostrar_comparacion)
 
-st.subheader("6) Exportar informe (DOCX/PDF)")
+st.subheader("6) Sensibilidad global (índices de Sobol)")
+with st.expander("Configurar y ejecutar Sobol"):
+    st.caption("Usa las distribuciones Gamma, Dirichlet y RR configuradas en la sección PSA. "
+               "Evalúa N·(d+2) corridas del modelo, con d = número de factores.")
+    s1, s2, s3 = st.columns(3)
+    n_sobol = s1.select_slider("N (muestras base)", options=[256, 512, 1024, 2048, 4096, 8192, 16384], value=2048)
+    agrupar = s2.selectbox("Factores Dirichlet", ["escenario", "anio"],
+                           format_func=lambda x: "uno por escenario" if x=="escenario" else "uno por escenario y año")
+    salida_sobol = s3.selectbox("Resultado", ["AIP_total", "SPF_final"])
+    if st.button("Calcular índices de Sobol"):
+        from aip.sobol import sobol_indices
+        enviar_trabajo("Sobol", sobol_indices, modelo, armar_inputs(), int(n_sobol), gamma_params, dirA, dirN,
+                       lognorm_rr={"costos":(mu,sigma),"poblacion":(mu,sigma)} if use_rr else None,
+                       aplicar_rr_en=rr_target, salida=salida_sobol, agrupar_dirichlet=agrupar,
+                       semilla=int(semilla), tam_lote=5000)
+    def mostrar_sobol(df_sobol):
+        st.dataframe(df_sobol, use_container_width=True)
+        largo = df_sobol.melt(id_vars="Factor", value_vars=["ST","S1"], var_name="Índice", value_name="Valor")
+        for ind in ("ST","S1"):
+            m = largo["Índice"]==ind
+            largo.loc[m, "error_sup"] = (df_sobol[f"{ind}_sup"] - df_sobol[ind]).values
+            largo.loc[m, "error_inf"] = (df_sobol[ind] - df_sobol[f"{ind}_inf"]).values
+        fig_sobol = px().bar(largo, x="Valor", y="Factor", color="Índice", barmode="group", orientation="h",
+                             error_x="error_sup", error_x_minus="error_inf",
+                             category_orders={"Factor": df_sobol["Factor"].tolist()},
+                             title="Índices de Sobol")
+        st.plotly_chart(fig_sobol, use_container_width=True)
+        st.session_state.figuras["Índices de Sobol"] = fig_sobol
+    panel_trabajo("Sobol", mostrar_sobol)
+
+st.subheader("7) Exportar informe (DOCX/PDF)")
 titulo = st.text_input("Título del informe", value="Informe AIP – Metodología MINSA")
 resumen = st.text_area("Resumen ejecutivo", value="Resumen breve del caso, supuestos, horizonte, resultados y conclusiones.")
 colA, colB = st.columns(2)
@@ -301,7 +499,10 @@ with colA:
             meta["AIP_total"] = f"S/ {float(df['Impacto Incremental (AIP)'].sum()):,.0f}"
             meta["SPF_final"] = f"S/ {float(df['SPF'].iloc[-1]):,.0f}"
             fp = "reports/informe_aip.docx"
-            export_docx(fp, meta, df, st.session_state.fig_paths)
+            os.makedirs("reports", exist_ok=True)
+            with st.spinner("Generando figuras e informe..."):
+                from aip.report import export_docx
+                export_docx(fp, meta, df, st.session_state.figuras)
             with open(fp, "rb") as f:
                 st.download_button("Descargar DOCX", f, file_name="informe_aip.docx")
 with colB:
@@ -313,6 +514,94 @@ with colB:
             meta["AIP_total"] = f"S/ {float(df['Impacto Incremental (AIP)'].sum()):,.0f}"
             meta["SPF_final"] = f"S/ {float(df['SPF'].iloc[-1]):,.0f}"
             fp = "reports/informe_aip.pdf"
+            os.makedirs("reports", exist_ok=True)
+            from aip.report import export_pdf
             export_pdf(fp, meta)
             with open(fp, "rb") as f:
                 st.download_button("Descargar PDF", f, file_name="informe_aip.pdf")
+
+st.subheader("8) Guardar / abrir sesión")
+# Archivo .aip (aip.sesion): caso, configuración de DSA/PSA, semilla y resultados; también sirve como
+# --base / --psa de python -m aip.batch.
+def abrir_sesion(datos):
+    # callback: corre antes del rerun, de modo que los widgets toman los valores de la sesión
+    try:
+        s = cargar_sesion(datos)
+    except ValueError as e:
+        st.session_state["error_sesion"] = str(e)
+        return
+    ins, cfg = s.inputs, s.config.get("psa", {})
+    p = ins.periodos_por_anio
+    idx = _periodos(ins.n_periodos, p)
+    st.session_state.update(cohortes=ins.cohortes, estrategias=ins.estrategias, nombre_caso=ins.nombre_caso,
+                            horizonte=ins.horizonte, periodos=p, tasa_desc=ins.tasa_descuento,
+                            saldo0=ins.saldo_inicial, modelo_sel=s.modelo, modelo_inc=None, trabajos={})
+    for i, c in enumerate(ins.cohortes):
+        st.session_state[f"coh_nom_{i}"], st.session_state[f"coh_peso_{i}"] = c.nombre, c.peso
+    fijar_grilla("General", pd.DataFrame({"Población": ins.poblacion_objetivo, "Ingreso presupuestal": ins.presupuesto_anual,
+                                         "Otros gastos": ins.otros_gastos_anuales}, index=idx), p)
+    for esc, shares, cob in (("Actual", ins.shares_actual, ins.cobertura_actual), ("Nuevo", ins.shares_nuevo, ins.cobertura_nuevo)):
+        fijar_grilla(esc, pd.DataFrame({"Cobertura": cob, **{e.nombre: shares.get(e.nombre, [0.0]*len(idx))
+                                                             for e in ins.estrategias}}, index=idx), p)
+    for esc, alfas in (("Actual", cfg.get("dirichlet_alpha_actual")), ("Nuevo", cfg.get("dirichlet_alpha_nuevo"))):
+        if alfas: fijar_grilla(f"alfa_{esc}", pd.DataFrame(alfas, index=_periodos(ins.horizonte), dtype=float), 1)
+    prefijos = {"costo_ts": "gth_cts_", "costo_procedimientos": "gth_cpr_", "costo_eventos": "gth_cea_"}
+    for campo, (k, theta) in cfg.get("gamma_k_theta", {}).items():
+        _, e, comp = campo.split(":")
+        st.session_state[f"gk_{e}"], st.session_state[prefijos[comp] + e] = float(k), float(theta)
+    if "semilla" in cfg: st.session_state["psa_semilla"] = int(cfg["semilla"])
+    rr = cfg.get("lognorm_rr")
+    st.session_state["use_rr"] = bool(rr)
+    if rr:
+        mu_rr, sigma_rr = next(iter(rr.values()))
+        st.session_state.update(rr_mu=float(mu_rr), rr_sigma=float(sigma_rr), rr_target=cfg.get("aplicar_rr_en", "costos"))
+    for campo, (vmin, vmax) in s.config.get("dsa", {}).items():
+        if campo.endswith(":costo_ts"):
+            e = campo.split(":")[1]
+            st.session_state[f"dsa_min_{e}"], st.session_state[f"dsa_max_{e}"] = float(vmin), float(vmax)
+    st.session_state.tabla = s.resultados.get("tabla")
+    st.session_state["resultados_cargados"] = {k: v for k,v in s.resultados.items() if k != "tabla"}
+    st.session_state.pop("sesion_bytes", None)
+
+s1, s2 = st.columns(2)
+with s1:
+    if st.button("Preparar archivo de sesión"):
+        resultados = {} if st.session_state.tabla is None else {"tabla": st.session_state.tabla}
+        for nombre_t, id_t in st.session_state.get("trabajos", {}).items():
+            t = ejecutor.trabajo(id_t)
+            if t is not None and t.estado == "terminado":
+                # un PSA en disco se guarda por su resumen; los sorteos quedan en su directorio
+                resultados[nombre_t] = t.resultado.resumir() if hasattr(t.resultado, "resumir") else t.resultado
+        for k, v in st.session_state.get("resultados_cargados", {}).items(): resultados.setdefault(k, v)
+        config = {"dsa": variaciones,
+                  "psa": {"nsims": int(nsims), "gamma_k_theta": gamma_params, "dirichlet_alpha_actual": dirA,
+                          "dirichlet_alpha_nuevo": dirN, "lognorm_rr": {"costos":(mu,sigma),"poblacion":(mu,sigma)} if use_rr else None,
+                          "aplicar_rr_en": rr_target, "semilla": int(semilla)}}
+        try:
+            st.session_state["sesion_bytes"] = sesion_a_bytes(Sesion(armar_inputs(), modelo, config, resultados))
+        except (TypeError, ValueError) as e:
+            st.error(f"No se pudo guardar la sesión: {e}")
+    if st.session_state.get("sesion_bytes"):
+        st.download_button(f"Descargar sesión ({len(st.session_state.sesion_bytes)/1024:,.0f} KB)",
+                           st.session_state.sesion_bytes, file_name=f"{nombre_caso}.aip", mime="application/octet-stream")
+with s2:
+    archivo = st.file_uploader("Abrir sesión (.aip)", type=["aip"])
+    st.button("Abrir", disabled=archivo is None, on_click=abrir_sesion,
+              args=(archivo.getvalue() if archivo is not None else b"",))
+    if "error_sesion" in st.session_state:
+        st.error(st.session_state.pop("error_sesion"))
+
+with st.expander("Diagnóstico de rendimiento"):
+    medir_mem = st.checkbox("Medir memoria pico por tramo (tracemalloc; agrega sobrecarga)", value=perfilador.memoria, key="diag_mem")
+    perfilador.activar_memoria(medir_mem)
+    resumen_perf = perfilador.resumen()
+    if resumen_perf:
+        st.dataframe(pd.DataFrame.from_dict(resumen_perf, orient="index").sort_values("total_s", ascending=False),
+                     use_container_width=True)
+    else:
+        st.caption("Sin mediciones todavía.")
+    d1, d2 = st.columns(2)
+    d1.write({"contadores": perfilador.contadores, "memoria_max_rss_mb": memoria_max_rss_mb()})
+    d2.download_button("Descargar traza JSON", json.dumps(perfilador.traza(), default=str), file_name="traza_aip.json")
+    if d2.button("Limpiar mediciones"):
+        perfilador.limpiar()
@@ -0,0 +1,67 @@
+from __future__ import annotations
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from aip.core import Inputs, Strategy, Cohorte
+
+# Escalas de referencia: (horizonte, estrategias, cohortes, simulaciones PSA, filas de reporte, parámetros DSA)
+ESCALAS: Dict[str, dict] = {
+    "chico":    dict(horizonte=5,  estrategias=3,   cohortes=2,  nsims=10_000,    filas_reporte=100,    parametros_dsa=10),
+    "mediano":  dict(horizonte=20, estrategias=20,  cohortes=10, nsims=100_000,   filas_reporte=2_000,  parametros_dsa=100),
+    "grande":   dict(horizonte=50, estrategias=200, cohortes=50, nsims=100_000,   filas_reporte=10_000, parametros_dsa=600),
+    "nacional": dict(horizonte=30, estrategias=10,  cohortes=5,  nsims=1_000_000, filas_reporte=10_000, parametros_dsa=100),
+}
+
+def generar_inputs(horizonte:int, estrategias:int, cohortes:int, semilla:int=0)->Inputs:
+    rng = np.random.default_rng(semilla)
+    coh = [Cohorte(f"Cohorte {j+1}", float(p)) for j,p in enumerate(rng.dirichlet(np.ones(cohortes)))]
+    coh[-1].peso = 1.0 - sum(c.peso for c in coh[:-1])
+    estr = [Strategy(f"Estrategia {i+1}", *map(float, rng.uniform([500, 50, 0], [2000, 300, 100])),
+                     {c.nombre: float(m) for c,m in zip(coh, rng.uniform(0.8, 1.3, cohortes))})
+            for i in range(estrategias)]
+    def _shares():
+        m = rng.dirichlet(np.ones(estrategias), size=horizonte)      # (T, E)
+        return {e.nombre: m[:, i].tolist() for i,e in enumerate(estr)}
+    N = (5000.0 * 1.03**np.arange(horizonte)).tolist()
+    return Inputs(
+        nombre_caso=f"Sintético T={horizonte} E={estrategias} C={cohortes}",
+        horizonte=horizonte,
+        poblacion_objetivo=N,
+        cohortes=coh,
+        estrategias=estr,
+        shares_actual=_shares(),
+        shares_nuevo=_shares(),
+        cobertura_actual=rng.uniform(0.7, 1.0, horizonte).tolist(),
+        cobertura_nuevo=rng.uniform(0.7, 1.0, horizonte).tolist(),
+        saldo_inicial=1e6,
+        presupuesto_anual=[5e6]*horizonte,
+        otros_gastos_anuales=[1e6]*horizonte,
+    )
+
+def generar_config_psa(ins: Inputs, k:float=50.0, concentracion:float=20.0)->Tuple[dict, list, list, dict]:
+    gamma = {f"estrategia:{e.nombre}:{c}": (k, max(getattr(e, c), 1.0)/k)
+             for e in ins.estrategias for c in ("costo_ts","costo_procedimientos","costo_eventos")}
+    def _alphas(shares):
+        return [{e: max(concentracion*shares[e][t], 0.1) for e in shares} for t in range(ins.horizonte)]
+    return gamma, _alphas(ins.shares_actual), _alphas(ins.shares_nuevo), {"costos": (0.0, 0.1)}
+
+def generar_variaciones(ins: Inputs, n:int)->Dict[str, Tuple[float,float]]:
+    campos: List[Tuple[str,float]] = []
+    for e in ins.estrategias:
+        for c in ("costo_ts","costo_procedimientos","costo_eventos"):
+            campos.append((f"estrategia:{e.nombre}:{c}", getattr(e, c)))
+    for serie in ("cobertura_actual","cobertura_nuevo","presupuesto_anual","otros_gastos_anuales"):
+        for t,v in enumerate(getattr(ins, serie)):
+            campos.append((f"inputs:{serie}:{t}", v))
+    return {k: (0.8*v, 1.2*v) for k,v in campos[:n]}
+
+def generar_tabla(filas:int, semilla:int=0)->pd.DataFrame:
+    rng = np.random.default_rng(semilla)
+    return pd.DataFrame({
+        "Año": np.arange(1, filas+1),
+        "N_t": rng.uniform(1e3, 1e4, filas),
+        "Costo agregado (Actual)": rng.uniform(1e6, 1e7, filas),
+        "Costo agregado (Nuevo)": rng.uniform(1e6, 1e7, filas),
+        "Impacto Incremental (AIP)": rng.normal(0, 1e6, filas),
+        "SPF": rng.normal(0, 1e7, filas),
+    })
@@ -0,0 +1,118 @@
+from __future__ import annotations
+import argparse, datetime, json, os, platform, subprocess, sys, tempfile, time, tracemalloc
+from typing import Callable, Dict, List
+import numpy as np
+import pandas as pd
+from aip.core import ejecutar_modelo, costos_agregados
+from aip.sensitivity import dsa_univariado, psa_monte_carlo
+from aip.report import export_docx, export_pdf
+from .escenarios import ESCALAS, generar_inputs, generar_config_psa, generar_variaciones, generar_tabla
+
+CASOS = ("costos_agregados", "ejecutar_modelo", "dsa_univariado", "psa_monte_carlo", "export_docx", "export_pdf")
+
+def _medir(fn: Callable[[], object], repeticiones:int=1, memoria:bool=True)->Dict[str, float]:
+    # una corrida de calentamiento sin cronometrar (importaciones diferidas, tablas, cachés de numpy) y
+    # luego el mejor de n repeticiones sin trazar. La memoria pico se mide con tracemalloc en el
+    # calentamiento, sin correr de nuevo el caso; memoria=False lo omite.
+    if memoria: tracemalloc.start()
+    try:
+        fn()
+        pico = tracemalloc.get_traced_memory()[1] / 2**20 if memoria else None
+    finally:
+        if memoria: tracemalloc.stop()
+    tiempos = []
+    for _ in range(max(1, repeticiones)):
+        t0 = time.perf_counter(); fn(); tiempos.append(time.perf_counter() - t0)
+    return {"segundos": min(tiempos), "pico_mb": pico}
+
+def _tam_lote_psa(ins, presupuesto_mb:float=256.0)->int:
+    # limita cada bloque del PSA a ~presupuesto_mb para las escalas con muchas estrategias y años
+    bytes_por_sim = 8 * len(ins.estrategias) * ins.horizonte * 4
+    return int(max(1, min(50_000, presupuesto_mb*2**20 // bytes_por_sim)))
+
+def ejecutar_escala(nombre:str, casos=CASOS, repeticiones:int=3, memoria:bool=True)->List[dict]:
+    p = ESCALAS[nombre]
+    ins = generar_inputs(p["horizonte"], p["estrategias"], p["cohortes"])
+    celdas = p["horizonte"] * p["estrategias"] * p["cohortes"]
+    resultados = []
+    def _registrar(caso, fn, unidades, unidad):
+        m = _medir(fn, repeticiones, memoria)
+        resultados.append({"caso": caso, "escala": nombre, **m,
+                           "rendimiento": unidades / m["segundos"] if m["segundos"] > 0 else float("inf"),
+                           "unidad": unidad, "parametros": p})
+        mb = "-" if m["pico_mb"] is None else f"{m['pico_mb']:.1f}"
+        print(f"  {caso:<18} {nombre:<9} {m['segundos']:>10.4f} s {mb:>10} MB "
+              f"{resultados[-1]['rendimiento']:>14,.0f} {unidad}", flush=True)
+    if "costos_agregados" in casos:
+        _registrar("costos_agregados", lambda: costos_agregados("Modelo 1", ins), celdas, "celdas/s")
+    if "ejecutar_modelo" in casos:
+        _registrar("ejecutar_modelo", lambda: ejecutar_modelo("Modelo 1", ins), celdas, "celdas/s")
+    if "dsa_univariado" in casos:
+        variaciones = generar_variaciones(ins, p["parametros_dsa"])
+        _registrar("dsa_univariado", lambda: dsa_univariado("Modelo 1", ins, variaciones), 2*len(variaciones), "variantes/s")
+    if "psa_monte_carlo" in casos:
+        gamma, dirA, dirN, rr = generar_config_psa(ins)
+        tam = _tam_lote_psa(ins)
+        _registrar("psa_monte_carlo", lambda: psa_monte_carlo("Modelo 1", ins, p["nsims"], gamma, dirA, dirN, rr,
+                                                            tam_lote=tam, semilla=0), p["nsims"], "sims/s")
+    if "export_docx" in casos or "export_pdf" in casos:
+        tabla = generar_tabla(p["filas_reporte"])
+        meta = {"titulo": "Benchmark", "resumen": "Informe sintético", "AIP_total": "0", "SPF_final": "0"}
+        with tempfile.TemporaryDirectory() as tmp:
+            if "export_docx" in casos:
+                _registrar("export_docx", lambda: export_docx(os.path.join(tmp, "b.docx"), meta, tabla, {}),
+                           p["filas_reporte"], "filas/s")
+            if "export_pdf" in casos:
+                _registrar("export_pdf", lambda: export_pdf(os.path.join(tmp, "b.pdf"), meta), 1, "informes/s")
+    return resultados
+
+def _metadatos()->dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"fecha": datetime.datetime.now().isoformat(timespec="seconds"), "commit": commit,
+            "python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+            "plataforma": platform.platform(), "cpus": os.cpu_count()}
+
+def comparar(actual: List[dict], base: List[dict], umbral:float)->List[dict]:
+    previos = {(r["caso"], r["escala"]): r for r in base}
+    regresiones = []
+    print(f"\n{'caso':<18} {'escala':<9} {'base s':>10} {'actual s':>10} {'razón':>7}")
+    for r in actual:
+        b = previos.get((r["caso"], r["escala"]))
+        if b is None: continue
+        razon = r["segundos"] / b["segundos"] if b["segundos"] > 0 else float("inf")
+        marca = "  REGRESIÓN" if razon > umbral else ""
+        print(f"{r['caso']:<18} {r['escala']:<9} {b['segundos']:>10.4f} {r['segundos']:>10.4f} {razon:>7.2f}{marca}")
+        if marca: regresiones.append({**r, "razon": razon})
+    return regresiones
+
+def main(argv=None)->int:
+    ap = argparse.ArgumentParser(description="Benchmarks de aip (core, sensibilidad y reportes)")
+    ap.add_argument("--escalas", default="chico,mediano", help=f"lista separada por comas: {','.join(ESCALAS)}")
+    ap.add_argument("--casos", default=",".join(CASOS), help="lista separada por comas de casos a medir")
+    ap.add_argument("--repeticiones", type=int, default=3, help="corridas cronometradas por caso (tras un calentamiento)")
+    ap.add_argument("--sin-memoria", action="store_true", help="no medir la memoria pico con tracemalloc")
+    ap.add_argument("--salida", help="archivo JSON donde guardar los resultados (línea base)")
+    ap.add_argument("--base", help="JSON de una corrida previa para comparar")
+    ap.add_argument("--umbral", type=float, default=1.25, help="razón de tiempo a partir de la cual se marca regresión")
+    args = ap.parse_args(argv)
+    casos = tuple(c for c in args.casos.split(",") if c)
+    resultados = []
+    for escala in [e for e in args.escalas.split(",") if e]:
+        if escala not in ESCALAS: ap.error(f"escala desconocida: {escala}")
+        print(f"[{escala}] {ESCALAS[escala]}", flush=True)
+        resultados += ejecutar_escala(escala, casos, args.repeticiones, not args.sin_memoria)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump({"meta": _metadatos(), "resultados": resultados}, f, indent=2, ensure_ascii=False)
+    if args.base:
+        with open(args.base, encoding="utf-8") as f:
+            base = json.load(f)["resultados"]
+        if comparar(resultados, base, args.umbral): return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
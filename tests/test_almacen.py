@@ -0,0 +1,65 @@
+import json
+import numpy as np
+import pytest
+from aip.almacen import AlmacenPSA, psa_a_disco
+from aip.sensitivity import psa_monte_carlo, psa_streaming
+from test_sensitivity import _ins, _config, _mensual
+
+def test_psa_a_disco_y_relectura_mmap(tmp_path):
+    ins = _ins(); gamma, dirA, dirN = _config(ins)
+    rr = {"costos": (0.0, 0.1)}
+    alm = psa_a_disco(str(tmp_path / "psa"), "Modelo 1", ins, 2500, gamma, dirA, dirN, rr, tam_lote=1000, semilla=9)
+    alm = AlmacenPSA(str(tmp_path / "psa"))
+    assert alm.n == 2500 and alm.variables["AIP"] == (2500, 3) and alm.variables["componentes"] == (2500, 2, 3)
+    assert isinstance(alm["AIP"], np.memmap) and alm.meta["semilla"]["entropia"] == 9
+    # mismos sorteos que psa_monte_carlo y mismo resumen que psa_streaming
+    df = psa_monte_carlo("Modelo 1", ins, 2500, gamma, dirA, dirN, rr, tam_lote=1000, semilla=9)
+    assert np.array_equal(np.asarray(alm["AIP"]).sum(axis=1), df["AIP_total"].values)
+    acc = psa_streaming("Modelo 1", ins, 2500, gamma, dirA, dirN, rr, tam_lote=1000, semilla=9)
+    assert alm.resumir().resumen().equals(acc.resumen())
+    assert np.allclose(alm["AIP"], alm["CN"] - alm["CA"])
+    assert np.allclose(np.asarray(alm["shares_nuevo"]).sum(axis=1), 1.0)
+    # sorteos crudos: RR (n,) aparte y costos antes del RR; sin poblacion si el RR va a costos
+    assert alm.variables["rr"] == (2500,) and "poblacion" not in alm.variables
+    k, theta = gamma["estrategia:Comp:costo_ts"]
+    assert abs(np.mean(alm["componentes"][:, 0, 0]) - k*theta) < 0.05*k*theta
+    assert abs(np.std(np.log(alm["rr"])) - 0.1) < 0.01
+    # resumen condicional por un parámetro muestreado
+    corte = np.median(alm["componentes"][:, 1, 0])
+    sub = alm.resumir(filtro=lambda b: b["componentes"][:, 1, 0] > corte, tam=300)
+    assert sub.n == 1250
+    assert alm.inputs().shares_nuevo == ins.shares_nuevo
+    with pytest.raises(FileExistsError):
+        psa_a_disco(str(tmp_path / "psa"), "Modelo 1", ins, 10, gamma, dirA, dirN)
+
+def test_almacen_rr_en_poblacion(tmp_path):
+    ins = _ins(); gamma, dirA, dirN = _config(ins)
+    rr = {"poblacion": (0.0, 0.2)}
+    alm = psa_a_disco(str(tmp_path / "psa"), "Modelo 1", ins, 600, gamma, dirA, dirN, rr, "poblacion",
+                      tam_lote=250, muestreo="lhs", replicas=3, semilla=2)
+    assert alm.variables["poblacion"] == (600, 3)
+    assert np.allclose(alm["poblacion"], np.asarray(alm["rr"])[:, None] * np.array(ins.poblacion_objetivo))
+    df = psa_monte_carlo("Modelo 1", ins, 600, gamma, dirA, dirN, rr, "poblacion", tam_lote=250,
+                         muestreo="lhs", replicas=3, semilla=2)
+    assert np.array_equal(np.asarray(alm["AIP"]).sum(axis=1), df["AIP_total"].values)
+
+def test_almacen_mensual_guarda_shares_por_anio(tmp_path):
+    ins = _ins(); gamma, dirA, dirN = _config(ins)
+    men = _mensual(ins)
+    alm = psa_a_disco(str(tmp_path / "psa"), "Modelo 1", men, 1000, gamma, dirA, dirN, tam_lote=300, semilla=6)
+    assert alm.variables["shares_actual"] == (1000, 2, 3) and alm.variables["AIP"] == (1000, 36)
+    assert alm.meta["periodos_por_anio"] == 12 and alm.meta["anios"] == 3
+    df = psa_monte_carlo("Modelo 1", men, 1000, gamma, dirA, dirN, tam_lote=300, semilla=6)
+    assert np.array_equal(np.asarray(alm["AIP"]).sum(axis=1), df["AIP_total"].values)
+
+def test_almacen_incompleto_no_se_abre(tmp_path):
+    ins = _ins(); gamma, dirA, dirN = _config(ins)
+    def cortar(hechas, total, parcial=None):
+        if hechas >= 200: raise KeyboardInterrupt
+    with pytest.raises(KeyboardInterrupt):
+        psa_a_disco(str(tmp_path / "psa"), "Modelo 1", ins, 1000, gamma, dirA, dirN, tam_lote=100, progreso=cortar)
+    with open(tmp_path / "psa" / "meta.json", encoding="utf-8") as f:
+        meta = json.load(f)
+    assert meta["escritas"] == 200 and not meta["completo"] and meta["semilla"]["entropia"] > 0
+    with pytest.raises(ValueError, match="no terminó"):
+        AlmacenPSA(str(tmp_path / "psa"))
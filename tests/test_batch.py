@@ -0,0 +1,75 @@
+import csv, json
+from aip.batch import ejecutar_lote, main
+from aip.core import inputs_a_dict, ejecutar_modelo
+from test_sensitivity import _ins, _config
+
+def _leer(ruta):
+    with open(ruta, encoding="utf-8") as f:
+        return [json.loads(l) for l in f if l.strip()]
+
+def test_lote_jsonl_paralelo_y_reanudacion(tmp_path):
+    ins = _ins(); base = inputs_a_dict(ins)
+    gamma, dirA, dirN = _config(ins)
+    escenarios = tmp_path / "esc.jsonl"
+    with open(escenarios, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"id": "base", "inputs": base}) + "\n")
+        f.write(json.dumps({"id": "caro", "cambios": {"estrategia:Interv:costo_ts": 2000}}) + "\n")
+        f.write(json.dumps({"id": "psa", "psa": {"nsims": 2000, "gamma_k_theta": gamma, "dirichlet_alpha_actual": dirA,
+                                                   "dirichlet_alpha_nuevo": dirN, "semilla": 1}}) + "\n")
+        f.write(json.dumps({"id": "malo", "cambios": {"inputs:no_existe": 1}}) + "\n")
+    salida = tmp_path / "res.jsonl"
+    cuenta = ejecutar_lote(str(escenarios), str(salida), base=base, workers=2)
+    assert cuenta == {"ok": 3, "error": 1, "omitidos": 0}
+    res = {r["id"]: r for r in _leer(salida)}
+    assert res["base"]["AIP_total"] == ejecutar_modelo("Modelo 2", ins)["AIP_total"]
+    assert res["caro"]["AIP_total"] > res["base"]["AIP_total"]
+    assert res["psa"]["psa"]["AIP_total"]["count"] == 2000
+    assert "error" in res["malo"]
+    # interrupción: queda una línea truncada al final; al reanudar solo se repiten los pendientes
+    lineas = salida.read_text(encoding="utf-8").splitlines()
+    ok = [l for l in lineas if '"error"' not in l]
+    salida.write_text(ok[0] + "\n" + ok[1][:20], encoding="utf-8")
+    cuenta = ejecutar_lote(str(escenarios), str(salida), base=base, workers=1, incluir_tabla=False)
+    assert cuenta == {"ok": 2, "error": 1, "omitidos": 1}
+    assert sorted(r["id"] for r in _leer(salida) if "error" not in r) == ["base", "caro", "psa"]
+
+def test_lote_csv_desde_linea_de_comandos(tmp_path):
+    base = tmp_path / "base.json"
+    base.write_text(json.dumps(inputs_a_dict(_ins())), encoding="utf-8")
+    escenarios = tmp_path / "esc.csv"
+    with open(escenarios, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["id", "modelo", "inputs:cobertura_nuevo", "estrategia:Comp:costo_ts"])
+        w.writerow(["r1", "Modelo 1", 0.5, 700]); w.writerow(["r2", "", 1.0, ""])
+    salida = tmp_path / "res.jsonl"
+    assert main([str(escenarios), "-o", str(salida), "--base", str(base), "--sin-tabla"]) == 0
+    res = {r["id"]: r for r in _leer(salida)}
+    assert res["r1"]["modelo"] == "Modelo 1" and res["r2"]["modelo"] == "Modelo 2"
+    assert "tabla" not in res["r1"]
+
+def test_lote_csv_celda_invalida_y_reintento(tmp_path):
+    escenarios = tmp_path / "esc.csv"
+    with open(escenarios, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["id", "estrategia:Comp:costo_ts"])
+        w.writerow(["r1", 700]); w.writerow(["r2", "setecientos"]); w.writerow(["r3", 800])
+    salida = tmp_path / "res.jsonl"
+    base = inputs_a_dict(_ins())
+    assert ejecutar_lote(str(escenarios), str(salida), base=base) == {"ok": 2, "error": 1, "omitidos": 0}
+    res = {r["id"]: r for r in _leer(salida)}
+    assert "setecientos" in res["r2"]["error"] and res["r3"]["AIP_total"] != res["r1"]["AIP_total"]
+    # al reanudar se reintenta solo el fallido y su error anterior no queda duplicado
+    assert ejecutar_lote(str(escenarios), str(salida), base=base) == {"ok": 0, "error": 1, "omitidos": 2}
+    assert sorted(r["id"] for r in _leer(salida)) == ["r1", "r2", "r3"]
+    # JSON Lines: una línea mal formada falla solo su escenario; los siguientes se evalúan
+    escenarios = tmp_path / "esc.jsonl"
+    escenarios.write_text('{"id": "a", "cambios": {"estrategia:Comp:costo_ts": 700}}\n{"id": "b", "cambios": \n'
+                          '[1, 2]\n{"id": "c", "cambios": {"estrategia:Comp:costo_ts": "x"}}\n{"id": "d"}\n',
+                          encoding="utf-8")
+    salida = tmp_path / "res2.jsonl"
+    assert ejecutar_lote(str(escenarios), str(salida), base=base) == {"ok": 2, "error": 3, "omitidos": 0}
+    res = {r["id"]: r for r in _leer(salida)}
+    assert "JSON inválido en la línea 2" in res["fila-2"]["error"] and "no es un objeto" in res["fila-3"]["error"]
+    assert "error" in res["c"] and "AIP_total" in res["a"] and "AIP_total" in res["d"]
+    assert ejecutar_lote(str(escenarios), str(salida), base=base) == {"ok": 0, "error": 3, "omitidos": 2}
+    assert sorted(r["id"] for r in _leer(salida)) == ["a", "c", "d", "fila-2", "fila-3"]
@@ -0,0 +1,42 @@
+import copy
+from aip.cache import CacheResultados, clave
+from aip.core import ejecutar_modelo
+from test_sensitivity import _ins
+
+def test_clave_canonica():
+    ins = _ins()
+    assert clave("Modelo 1", ins) == clave("Modelo 1", copy.deepcopy(ins))
+    otro = copy.deepcopy(ins); otro.shares_nuevo["Comp"][2] = 0.25
+    assert clave("Modelo 1", ins) != clave("Modelo 1", otro)
+    assert clave("Modelo 1", ins) != clave("Modelo 2", ins)
+    assert clave({"b":1, "a":2}, n=3) == clave({"a":2.0, "b":1.0}, n=3.0)
+
+def test_memo_lru_y_disco(tmp_path):
+    llamadas = []
+    def f(x, semilla=0):
+        llamadas.append(x)
+        return [x]*1000
+    cache = CacheResultados(max_bytes=5000, directorio=str(tmp_path))
+    assert cache.memo(f, 1, semilla=1) == [1]*1000
+    r = cache.memo(f, 1, semilla=1); r.append(0)       # la copia devuelta no altera la caché
+    assert cache.memo(f, 1, semilla=1) == [1]*1000 and llamadas == [1]
+    cache.memo(f, 2, semilla=1); cache.memo(f, 3, semilla=1)
+    assert cache.bytes_en_memoria <= 5000
+    cache.memo(f, 4, semilla=None); cache.memo(f, 4, semilla=None)
+    assert llamadas == [1, 2, 3, 4, 4]
+    # sin semilla explícita vale el defecto de la firma: None no se guarda, un entero sí
+    def g(x, semilla=None):
+        llamadas.append(x)
+        return x
+    cache.memo(g, 5); cache.memo(g, 5); cache.memo(g, 6, 7); cache.memo(g, 6, 7)
+    assert llamadas == [1, 2, 3, 4, 4, 5, 5, 6]
+    del llamadas[5:]
+    nueva = CacheResultados(directorio=str(tmp_path))
+    assert nueva.memo(f, 1, semilla=1) == [1]*1000 and llamadas == [1, 2, 3, 4, 4]
+
+def test_memo_ejecutar_modelo():
+    cache = CacheResultados()
+    ins = _ins()
+    r1 = cache.memo(ejecutar_modelo, "Modelo 1", ins)
+    r2 = cache.memo(ejecutar_modelo, "Modelo 1", ins)
+    assert r1["tabla"].equals(r2["tabla"]) and cache.aciertos == 1
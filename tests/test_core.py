@@ -17,3 +17,96 @@ def test_end2end_min():
     res = ejecutar_modelo("Modelo 1", ins)
     assert res["tabla"]["Costo agregado (Actual)"][0] == 900*100
     assert res["tabla"]["Costo agregado (Nuevo)"][0] == 1100*100
+
+def test_compilado_equivale_a_inputs():
+    import pytest
+    from aip.core import compilar
+    ins = Inputs(
+        nombre_caso="t",
+        horizonte=2,
+        poblacion_objetivo=[100,200],
+        cohortes=[Cohorte("A",0.5), Cohorte("B",0.5)],
+        estrategias=[Strategy("Comp",800,100,0,{"B":2.0}), Strategy("Interv",1000,100,0), Strategy("Otra",1,1,1)],
+        shares_actual={"Comp":[1.0,0.5],"Interv":[0.0,0.5]},
+        shares_nuevo={"Comp":[0.0,0.0],"Interv":[1.0,1.0]},
+        cobertura_actual=[1.0,1.0],
+        cobertura_nuevo=[1.0,0.5],
+        saldo_inicial=10.0,
+        presupuesto_anual=[1e5,1e5],
+        otros_gastos_anuales=[0.0,0.0]
+    )
+    c = compilar(ins)
+    assert c.costo.shape == (3,2) and c.shares_actual.shape == (3,2)
+    assert c.costo[0].tolist() == [900.0, 1800.0]
+    assert c.shares_actual[2].tolist() == [0.0, 0.0]
+    with pytest.raises(ValueError):
+        c.poblacion[0] = 1.0
+    r1, r2 = ejecutar_modelo("Modelo 1", ins), ejecutar_modelo("Modelo 1", c)
+    assert r1["tabla"].equals(r2["tabla"])
+    assert r1["tabla"]["Costo agregado (Actual)"].tolist() == [1350*100, (0.5*1350+0.5*1100)*200]
+    assert r1["SPF_final"] == 10.0 + 2e5 - 1100*100 - 1100*0.5*200
+
+def test_validacion_reporta_todos_los_errores():
+    import pytest
+    ins = Inputs(
+        nombre_caso="t",
+        horizonte=3,
+        poblacion_objetivo=[100,100,100],
+        cohortes=[Cohorte("A",0.5), Cohorte("B",0.4)],
+        estrategias=[Strategy("Comp",800), Strategy("Interv",1000)],
+        shares_actual={"Comp":[1.0,0.7,1.2],"Interv":[0.0,0.2,-0.2]},
+        shares_nuevo={"Comp":[0.0,0.0],"Interv":[1.0,1.0,1.0],"Otra":[0,0,0]},
+        cobertura_actual=[1.0,1.0],
+        cobertura_nuevo=[1.0,1.0,1.0],
+        saldo_inicial=0.0,
+        presupuesto_anual=[0.0,0.0,0.0],
+        otros_gastos_anuales=[0.0,0.0,0.0]
+    )
+    err = ins.errores()
+    assert err == ["cobertura_actual: 2 valores para un horizonte de 3 años",
+                   "shares_actual 'Comp' año 3: 1.2 fuera de [0, 1]",
+                   "shares_actual 'Interv' año 3: -0.2 fuera de [0, 1]",
+                   "shares_actual no suman 1 en año 2 (suma 0.9000)",
+                   "shares_nuevo 'Comp': 2 valores para un horizonte de 3 años",
+                   "shares_nuevo: estrategia desconocida 'Otra'",
+                   "La suma de pesos de cohortes debe ser 1.0 (suma 0.900000)"]
+    with pytest.raises(ValueError, match="7 errores de validación"):
+        ins.validate()
+
+def test_ruta_confiable_omite_validacion():
+    import pytest
+    from aip.perf import perfilador
+    ins = Inputs("t", 1, [100], [Cohorte("A",1.0)], [Strategy("Comp",800), Strategy("Interv",1000)],
+                 {"Comp":[0.5],"Interv":[0.4]}, {"Interv":[1.0]}, [1.0], [1.0], 0.0, [0.0], [0.0])
+    with pytest.raises(ValueError, match="no suman 1 en año 1"):
+        ejecutar_modelo("Modelo 1", ins)
+    perfilador.limpiar()
+    res = ejecutar_modelo("Modelo 1", ins, validar=False)
+    assert res["tabla"]["Costo agregado (Actual)"][0] == (0.5*800+0.4*1000)*100
+    assert "Inputs.validate" not in perfilador.resumen()
+
+def test_periodos_mensuales_agregan_a_anual_y_descuento():
+    import numpy as np
+    from aip.incremental import ModeloIncremental
+    def caso(p, anios=30, tasa=0.0):
+        T = anios * p
+        rng = np.random.default_rng(0)
+        sh = np.repeat(rng.uniform(0.2, 0.8, anios), p)
+        return Inputs("t", anios, (np.repeat(1200.0*1.02**np.arange(anios), p) / p).tolist(),
+                      [Cohorte("A",1.0)], [Strategy("Comp",800,100,0), Strategy("Interv",1000,100,0)],
+                      {"Comp":sh.tolist(),"Interv":(1-sh).tolist()}, {"Comp":[0.2]*T,"Interv":[0.8]*T},
+                      [0.9]*T, [1.0]*T, 5e4, [1e6/p]*T, [1e4/p]*T, periodos_por_anio=p, tasa_descuento=tasa)
+    anual, mensual = ejecutar_modelo("Modelo 1", caso(1)), ejecutar_modelo("Modelo 1", caso(12))
+    assert len(mensual["tabla_periodos"]) == 360 and "tabla_periodos" not in anual
+    assert list(mensual["tabla"].columns) == list(anual["tabla"].columns)
+    assert np.allclose(mensual["tabla"].values, anual["tabla"].values)
+    assert np.isclose(mensual["SPF_final"], anual["SPF_final"]) and mensual["AIP_total_descontado"] == mensual["AIP_total"]
+    # descuento anual: (1+r)^(-k/p), el primer periodo sin descontar
+    r = ejecutar_modelo("Modelo 1", caso(4, anios=2, tasa=0.05))
+    aip = r["tabla_periodos"]["Impacto Incremental (AIP)"].values
+    assert np.isclose(r["AIP_total_descontado"], (aip / 1.05**(np.arange(8)/4)).sum())
+    assert np.allclose(r["tabla"]["AIP descontado"], r["tabla_periodos"].groupby("Año")["AIP descontado"].sum())
+    assert np.allclose(ModeloIncremental(caso(4, anios=2, tasa=0.05)).tabla().values, r["tabla"].values)
+    ins = caso(12, anios=1); ins.poblacion_objetivo.pop(); ins.shares_actual["Comp"][4] = 0.0
+    assert ins.errores() == ["poblacion_objetivo: 11 valores para un horizonte de 12 periodos",
+                             "shares_actual no suman 1 en periodo 5 (suma %.4f)" % ins.shares_actual["Interv"][4]]
@@ -0,0 +1,27 @@
+import json, os, subprocess, sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PESADOS = ("pandas", "scipy", "docx", "reportlab", "plotly", "matplotlib")
+
+def _importar(codigo: str)->dict:
+    # proceso nuevo: sys.modules limpio y tiempo de importación en frío
+    script = ("import sys, time, json\n"
+              "t = time.perf_counter()\n"
+              f"{codigo}\n"
+              "s = time.perf_counter() - t\n"
+              f"print(json.dumps({{'segundos': s, 'cargados': [m for m in {PESADOS!r} if m in sys.modules]}}))")
+    r = subprocess.run([sys.executable, "-c", script], cwd=RAIZ, capture_output=True, text=True, check=True)
+    return json.loads(r.stdout.strip().splitlines()[-1])
+
+def test_presupuesto_de_importacion_del_nucleo():
+    r = _importar("import aip.core, aip.sensitivity, aip.sobol, aip.incremental, aip.cache, aip.batch, aip.figuras, aip.perf")
+    assert r["cargados"] == []
+    assert r["segundos"] < 2.0
+
+def test_nucleo_sin_pandas():
+    r = _importar("from aip.core import ejecutar_modelo, Inputs, Strategy, Cohorte\n"
+                  "ins = Inputs('t', 1, [100], [Cohorte('A', 1.0)], [Strategy('Comp', 800), Strategy('Interv', 1000)],\n"
+                  "             {'Comp': [1.0]}, {'Interv': [1.0]}, [1.0], [1.0], 0.0, [0.0], [0.0])\n"
+                  "res = ejecutar_modelo('Modelo 1', ins, formato='arrays')\n"
+                  "assert res['tabla']['Costo agregado (Nuevo)'].tolist() == [100000.0] and res['AIP_total'] == 20000.0")
+    assert r["cargados"] == []
@@ -0,0 +1,37 @@
+import copy
+import numpy as np
+from aip.core import ejecutar_modelo
+from aip.incremental import ModeloIncremental
+from test_sensitivity import _ins
+
+def _igual(m, ins):
+    r = ejecutar_modelo("Modelo 1", ins)
+    assert np.allclose(m.tabla().values, r["tabla"].values)
+    assert np.isclose(m.AIP_total, r["AIP_total"]) and np.isclose(m.SPF_final, r["SPF_final"])
+
+def test_ediciones_incrementales_coinciden_con_recalculo_completo():
+    ins = _ins()
+    m = ModeloIncremental(ins)
+    _igual(m, ins)
+    m.fijar_shares_anio("nuevo", 1, {"Comp": 0.5, "Interv": 0.5})
+    ins.shares_nuevo["Comp"][1] = 0.5; ins.shares_nuevo["Interv"][1] = 0.5
+    m.fijar_cobertura("actual", 2, 0.7); ins.cobertura_actual[2] = 0.7
+    m.fijar_poblacion(0, 150); ins.poblacion_objetivo[0] = 150
+    m.fijar_presupuesto(1, 1e5); ins.presupuesto_anual[1] = 1e5
+    m.fijar_saldo_inicial(-500); ins.saldo_inicial = -500
+    m.fijar_costo("Comp", "costo_procedimientos", 250); ins.estrategias[0].costo_procedimientos = 250
+    _igual(m, ins)
+
+def test_sincronizar_aplica_solo_diferencias():
+    ins = _ins()
+    m = ModeloIncremental(ins)
+    otro = copy.deepcopy(ins)
+    otro.shares_actual["Comp"][2] = 0.5; otro.shares_actual["Interv"][2] = 0.5
+    otro.estrategias[1].costo_ts = 1500
+    otro.otros_gastos_anuales[1] = 0.0
+    otro.cobertura_nuevo[0] = 0.5
+    m.sincronizar(otro)
+    _igual(m, otro)
+    otro.cohortes[0].peso, otro.cohortes[1].peso = 0.5, 0.5
+    m.sincronizar(otro)
+    _igual(m, otro)
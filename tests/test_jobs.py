@@ -0,0 +1,28 @@
+import time
+from aip.jobs import EjecutorTrabajos
+from aip.sensitivity import psa_streaming
+from test_sensitivity import _ins, _config
+
+def test_trabajo_psa_con_avance_y_parcial():
+    ins = _ins(); gamma, dirA, dirN = _config(ins)
+    ej = EjecutorTrabajos(workers=2)
+    t = ej.enviar(psa_streaming, "Modelo 1", ins, 5000, gamma, dirA, dirN, tam_lote=1000, semilla=4, descripcion="PSA")
+    t.esperar(30)
+    directo = psa_streaming("Modelo 1", ins, 5000, gamma, dirA, dirN, tam_lote=1000, semilla=4)
+    assert t.estado == "terminado" and t.progreso == 1.0 and ej.trabajo(t.id) is t
+    assert t.resultado.resumen().equals(directo.resumen())
+    assert t.parcial.n == 5000 and t.parcial is not t.resultado
+    ej.cerrar()
+
+def test_trabajo_cancelado_y_con_error():
+    ins = _ins(); gamma, dirA, dirN = _config(ins)
+    ej = EjecutorTrabajos(workers=2)
+    t = ej.enviar(psa_streaming, "Modelo 1", ins, 10**8, gamma, dirA, dirN, tam_lote=1000, semilla=1)
+    while t.hechas == 0 and t.activo: time.sleep(0.01)
+    t.cancelar()
+    t.esperar(30)
+    assert t.estado == "cancelado" and 0 < t.hechas < 10**8
+    malo = ej.enviar(psa_streaming, "Modelo 1", ins, 100, {"estrategia:Comp:costo_x": (1.0, 1.0)}, dirA, dirN)
+    malo.esperar(30)
+    assert malo.estado == "error" and "costo_x" in malo.error
+    ej.cerrar()
@@ -0,0 +1,33 @@
+import json
+from aip.perf import Perfilador, perfilador
+from aip.core import ejecutar_modelo
+from aip.sensitivity import psa_monte_carlo
+from test_sensitivity import _ins, _config
+
+def test_tramos_anidados_y_traza(tmp_path):
+    p = Perfilador()
+    p.activar_memoria()
+    try:
+        with p.tramo("externo"):
+            with p.tramo("interno", unidades=1000):
+                x = bytearray(5*2**20)
+            del x
+    finally:
+        p.activar_memoria(False)
+    r = p.resumen()
+    assert r["interno"]["llamadas"] == 1 and r["interno"]["unidades_por_s"] > 0
+    assert r["externo"]["pico_mb"] >= r["interno"]["pico_mb"] >= 5
+    ruta = tmp_path / "traza.json"
+    p.exportar_traza(str(ruta))
+    eventos = json.loads(ruta.read_text())["traceEvents"]
+    assert [e["name"] for e in eventos] == ["interno", "externo"]
+
+def test_instrumentacion_del_modelo_y_psa():
+    perfilador.limpiar()
+    ins = _ins(); gamma, dirA, dirN = _config(ins)
+    ejecutar_modelo("Modelo 1", ins)
+    psa_monte_carlo("Modelo 1", ins, 3000, gamma, dirA, dirN, tam_lote=1000, semilla=1)
+    r = perfilador.resumen()
+    assert {"Inputs.validate", "ejecutar_modelo", "psa_monte_carlo", "psa.bloque"} <= set(r)
+    assert r["psa.bloque"]["llamadas"] == 3 and r["psa.bloque"]["unidades"] == 3000
+    assert perfilador.contadores["psa.simulaciones"] == 3000
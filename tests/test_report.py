@@ -0,0 +1,54 @@
+import time
+import numpy as np, pandas as pd
+from docx import Document
+from aip.report import export_docx
+
+def _tabla(n):
+    return pd.DataFrame({"Año": np.arange(1, n+1), "Costo": np.linspace(0, 1e6, n), "Nota": ["a<b & c"]*n})
+
+def test_export_docx_tabla_grande(tmp_path):
+    fp = tmp_path / "r.docx"
+    t0 = time.perf_counter()
+    export_docx(str(fp), {"titulo": "T"}, _tabla(10_000), {})
+    assert time.perf_counter() - t0 < 30
+    tbl = Document(str(fp)).tables[0]
+    assert len(tbl.rows) == 10_001
+    assert [c.text for c in tbl.rows[0].cells] == ["Año", "Costo", "Nota"]
+    assert [c.text for c in tbl.rows[-1].cells] == ["10000", "1,000,000.00", "a<b & c"]
+
+def test_export_docx_anexo_y_formatos(tmp_path):
+    fp = tmp_path / "r.docx"
+    export_docx(str(fp), {"titulo": "T"}, _tabla(50), {}, formatos={"Costo": "S/ {:,.0f}"}, max_filas=10)
+    tablas = Document(str(fp)).tables
+    assert [len(t.rows) for t in tablas] == [11, 51]
+    assert tablas[1].rows[-1].cells[1].text == "S/ 1,000,000"
+
+class _FiguraFalsa:
+    # imita la interfaz de plotly usada por el renderizador (to_json / write_image)
+    def __init__(self, datos): self.datos = datos; self.renders = 0
+    def to_json(self): return self.datos
+    def write_image(self, ruta, format="png", width=None, height=None):
+        import struct, zlib
+        self.renders += 1
+        def _chunk(tipo, datos):
+            return struct.pack(">I", len(datos)) + tipo + datos + struct.pack(">I", zlib.crc32(tipo + datos))
+        png = (b"\x89PNG\r\n\x1a\n" + _chunk(b"IHDR", struct.pack(">IIBBBBB", 1, 1, 8, 0, 0, 0, 0))
+               + _chunk(b"IDAT", zlib.compress(b"\x00\x00")) + _chunk(b"IEND", b""))
+        with open(ruta, "wb") as f: f.write(png)
+
+def test_figuras_diferidas_con_cache(tmp_path):
+    from aip.figuras import RenderizadorFiguras
+    r = RenderizadorFiguras(str(tmp_path / "figs"))
+    a, b = _FiguraFalsa('{"a":1}'), _FiguraFalsa('{"b":2}')
+    rutas = r.rutas({"A": a, "B": b})
+    assert a.renders == b.renders == 1
+    a2 = _FiguraFalsa('{"a":1}')
+    assert r.rutas({"A": a2})["A"] == rutas["A"] and a2.renders == 0
+
+def test_export_docx_acepta_figuras(tmp_path, monkeypatch):
+    monkeypatch.setenv("AIP_FIGURAS_DIR", str(tmp_path / "figs"))
+    import aip.figuras
+    monkeypatch.setattr(aip.figuras, "_por_defecto", None)
+    fp = tmp_path / "r.docx"
+    export_docx(str(fp), {"titulo": "T"}, _tabla(3), {"Figura": _FiguraFalsa('{"c":3}')})
+    assert len(Document(str(fp)).inline_shapes) == 1
@@ -0,0 +1,168 @@
+import copy
+import numpy as np
+from aip.core import Inputs, Strategy, Cohorte, ejecutar_modelo
+from aip.sensitivity import psa_monte_carlo
+
+def _ins():
+    return Inputs(
+        nombre_caso="t",
+        horizonte=3,
+        poblacion_objetivo=[100,120,140],
+        cohortes=[Cohorte("A",0.6), Cohorte("B",0.4)],
+        estrategias=[Strategy("Comp",800,100,0,{"B":1.2}), Strategy("Interv",1000,100,50)],
+        shares_actual={"Comp":[0.8,0.7,0.6],"Interv":[0.2,0.3,0.4]},
+        shares_nuevo={"Comp":[0.4,0.3,0.2],"Interv":[0.6,0.7,0.8]},
+        cobertura_actual=[1.0,1.0,1.0],
+        cobertura_nuevo=[0.9,0.9,1.0],
+        saldo_inicial=1000.0,
+        presupuesto_anual=[5e4,5e4,5e4],
+        otros_gastos_anuales=[1e4,1e4,1e4]
+    )
+
+def _config(ins):
+    gamma = {f"estrategia:{e.nombre}:{c}":(100.0, getattr(e,c)/100.0)
+             for e in ins.estrategias for c in ("costo_ts","costo_procedimientos") }
+    dirA = [{e: 20.0*ins.shares_actual[e][t] for e in ins.shares_actual} for t in range(ins.horizonte)]
+    dirN = [{e: 20.0*ins.shares_nuevo[e][t] for e in ins.shares_nuevo} for t in range(ins.horizonte)]
+    return gamma, dirA, dirN
+
+def test_psa_media_coincide_con_caso_base():
+    # AIP es lineal en costos y shares independientes: E[AIP] = AIP(E[parámetros])
+    ins = _ins(); gamma, dirA, dirN = _config(ins)
+    df = psa_monte_carlo("Modelo 1", ins, 20000, gamma, dirA, dirN, tam_lote=7000, semilla=0)
+    base = ejecutar_modelo("Modelo 1", ins)
+    assert list(df.columns) == ["sim","AIP_total","SPF_final"] and len(df) == 20000
+    for col in ("AIP_total","SPF_final"):
+        ee = df[col].std() / np.sqrt(len(df))
+        assert abs(df[col].mean() - base[col]) < 4*ee
+
+def test_psa_reproducible_con_cualquier_numero_de_workers():
+    ins = _ins(); gamma, dirA, dirN = _config(ins)
+    rr = {"costos":(0.0,0.1)}
+    d1 = psa_monte_carlo("Modelo 1", ins, 5000, gamma, dirA, dirN, rr, tam_lote=1000, semilla=123)
+    d2 = psa_monte_carlo("Modelo 1", ins, 5000, gamma, dirA, dirN, rr, tam_lote=1000, semilla=123, n_workers=3)
+    d3 = psa_monte_carlo("Modelo 1", ins, 5000, gamma, dirA, dirN, rr, tam_lote=1000, semilla=124)
+    assert d1.equals(d2)
+    assert not d1["AIP_total"].equals(d3["AIP_total"])
+
+def test_acumulador_coincide_con_muestra_completa():
+    from aip.acumulador import AcumuladorPSA
+    rng = np.random.default_rng(1)
+    x = rng.gamma(2.0, 10.0, 100000) - 15.0
+    acc = AcumuladorPSA(variables=("x",), n_bins=2048)
+    # bloques ordenados de mayor a menor para forzar la expansión del rango del histograma
+    for bloque in np.array_split(np.sort(x)[::-1], 37):
+        acc.actualizar(x=bloque)
+    assert acc.n == x.size
+    assert np.isclose(acc.media("x"), x.mean()) and np.isclose(acc.desviacion("x"), x.std(ddof=1))
+    for p in (0.025, 0.5, 0.975):
+        assert abs(acc.percentil("x", p) - np.quantile(x, p)) < 0.05
+    bordes, prob = acc.histograma("x", 50)
+    assert len(bordes) == 51 and np.isclose(prob.sum(), 1.0)
+
+def test_psa_streaming_se_detiene_al_converger():
+    from aip.sensitivity import psa_streaming
+    ins = _ins(); gamma, dirA, dirN = _config(ins)
+    acc = psa_streaming("Modelo 1", ins, 10**6, gamma, dirA, dirN, tolerancia=500.0, tam_lote=2000, semilla=7)
+    assert acc.n < 10**6 and acc.n % 2000 == 0
+    assert acc.convergido(500.0)
+    df = psa_monte_carlo("Modelo 1", ins, acc.n, gamma, dirA, dirN, tam_lote=2000, semilla=7)
+    assert np.isclose(acc.media("AIP_total"), df["AIP_total"].mean())
+
+def test_dsa_por_lotes_coincide_con_cambios_uno_a_uno():
+    import copy
+    from aip.sensitivity import dsa_univariado, dsa_grilla, tabla_calor, _apply_change
+    ins = _ins()
+    variaciones = {"estrategia:Interv:costo_ts": (900.0, 1100.0),
+                   "inputs:cobertura_nuevo:1": (0.8, 1.0),
+                   "inputs:cobertura_actual": (0.9, 1.0),
+                   "inputs:saldo_inicial": (0.0, 5000.0),
+                   "inputs:poblacion_objetivo:2": (100.0, 200.0)}
+    df = dsa_univariado("Modelo 1", ins, variaciones).set_index("Parámetro")
+    for campo,(vmin,vmax) in variaciones.items():
+        esperado = [ejecutar_modelo("Modelo 1", _apply_change(copy.deepcopy(ins), campo, v))["AIP_total"] for v in (vmin,vmax)]
+        assert np.allclose(df.loc[campo, ["AIP_min","AIP_max"]].tolist(), esperado)
+    grilla = dsa_grilla("Modelo 1", ins, {"estrategia:Comp:costo_ts": np.linspace(700, 900, 5),
+                                          "inputs:cobertura_nuevo": np.linspace(0.5, 1.0, 4)})
+    assert len(grilla) == 20
+    fila = grilla.iloc[7]
+    caso = _apply_change(copy.deepcopy(ins), "estrategia:Comp:costo_ts", fila["estrategia:Comp:costo_ts"])
+    caso = _apply_change(caso, "inputs:cobertura_nuevo", fila["inputs:cobertura_nuevo"])
+    r = ejecutar_modelo("Modelo 1", caso)
+    assert np.isclose(fila["AIP_total"], r["AIP_total"]) and np.isclose(fila["SPF_final"], r["SPF_final"])
+    assert tabla_calor(grilla, "estrategia:Comp:costo_ts", "inputs:cobertura_nuevo").shape == (5, 4)
+
+def test_psa_sobol_y_lhs_centrados_con_menor_error_entre_replicas():
+    ins = _ins(); gamma, dirA, dirN = _config(ins)
+    base = ejecutar_modelo("Modelo 1", ins)["AIP_total"]
+    ee = {}
+    for m in ("mc", "sobol", "lhs"):
+        df = psa_monte_carlo("Modelo 1", ins, 2**14, gamma, dirA, dirN, tam_lote=3000, semilla=5,
+                             muestreo=m, replicas=16)
+        ee[m] = df.attrs["error_estandar"]["AIP_total"]
+        assert len(df) == 2**14 and abs(df["AIP_total"].mean() - base) < 4*ee[m]["media"]
+    assert ee["sobol"]["media"] < ee["mc"]["media"] / 3 and ee["lhs"]["media"] < ee["mc"]["media"]
+    assert ee["sobol"]["97.5%"] < ee["mc"]["97.5%"]
+
+def test_uniformes_qmc_por_bloques_y_reproducibles():
+    from aip.muestreo import uniformes
+    s = np.random.SeedSequence(7)
+    for m in ("sobol", "lhs"):
+        todo = uniformes(m, 4, 64, 0, 64, s)
+        assert np.array_equal(todo[:40], uniformes(m, 4, 64, 0, 40, s))
+        # LHS: exactamente un punto por estrato en cada dimensión
+        if m == "lhs": assert all(np.array_equal(np.sort((todo[:, k]*64).astype(int)), np.arange(64)) for k in range(4))
+    assert np.array_equal(uniformes("sobol", 4, 64, 0, 64, s)[40:], uniformes("sobol", 4, 64, 40, 24, s))
+    # LHS en varios tramos: bloques que los cruzan reproducen el diseño completo, que sigue estratificado
+    N = 10000
+    todo = uniformes("lhs", 3, N, 0, N, s)
+    assert np.array_equal(np.concatenate([uniformes("lhs", 3, N, i, min(3000, N-i), s) for i in range(0, N, 3000)]), todo)
+    assert all(np.array_equal(np.sort((todo[:, k]*N).astype(int)), np.arange(N)) for k in range(3))
+    ins = _ins(); gamma, dirA, dirN = _config(ins)
+    d1 = psa_monte_carlo("Modelo 1", ins, 4096, gamma, dirA, dirN, tam_lote=1000, semilla=3, muestreo="sobol", replicas=4)
+    d2 = psa_monte_carlo("Modelo 1", ins, 4096, gamma, dirA, dirN, tam_lote=1000, semilla=3, muestreo="sobol", replicas=4, n_workers=2)
+    assert d1.equals(d2)
+
+def test_psa_escenarios_con_numeros_aleatorios_comunes():
+    import copy, pytest
+    from aip.sensitivity import psa_escenarios
+    ins = _ins(); gamma, dirA, dirN = _config(ins)
+    cob = copy.deepcopy(ins); cob.cobertura_nuevo = [0.8,0.8,0.9]
+    r = psa_escenarios("Modelo 1", {"base": ins, "igual": copy.deepcopy(ins), "cob": cob}, 8192, gamma, dirA, dirN,
+                       tam_lote=3000, semilla=2, muestreo="sobol", replicas=4)
+    assert r["AIP_total"].shape == (8192, 3) and list(r["diferencias"].index) == ["igual", "cob"]
+    assert np.array_equal(r["AIP_total"]["base"], r["AIP_total"]["igual"])
+    dif = r["diferencias"].loc["cob"]
+    esperado = ejecutar_modelo("Modelo 1", cob)["AIP_total"] - ejecutar_modelo("Modelo 1", ins)["AIP_total"]
+    assert abs(dif["media"] - esperado) < 4*dif["ee"] and dif["ee"] < dif["ee_sin_crn"] / 3
+    assert np.isclose(r["resumen"]["P(menor AIP)"].sum(), 1.0) and r["resumen"].loc["cob", "P(menor AIP)"] > 0.99
+    otro = copy.deepcopy(ins); otro.estrategias = otro.estrategias[::-1]
+    with pytest.raises(ValueError, match="mismas estrategias"):
+        psa_escenarios("Modelo 1", {"base": ins, "otro": otro}, 10, gamma, dirA, dirN)
+
+def _mensual(ins):
+    # el mismo caso en periodos mensuales: flujos / 12, fracciones y shares repetidas
+    men = copy.deepcopy(ins); men.periodos_por_anio = 12
+    for campo in ("poblacion_objetivo", "presupuesto_anual", "otros_gastos_anuales"):
+        setattr(men, campo, [x/12 for x in getattr(ins, campo) for _ in range(12)])
+    for campo in ("cobertura_actual", "cobertura_nuevo"):
+        setattr(men, campo, [x for x in getattr(ins, campo) for _ in range(12)])
+    for serie in ("shares_actual", "shares_nuevo"):
+        setattr(men, serie, {e: [x for x in v for _ in range(12)] for e,v in getattr(ins, serie).items()})
+    return men
+
+def test_psa_mensual_sortea_shares_por_anio():
+    # mismo caso en años y en meses (flujos / 12): mismos sorteos, misma distribución de AIP_total
+    from aip.muestreo import EspacioPSA
+    from aip.core import compilar
+    ins = _ins(); gamma, dirA, dirN = _config(ins)
+    men = _mensual(ins)
+    for muestreo in ("mc", "sobol"):
+        a = psa_monte_carlo("Modelo 1", ins, 1024, gamma, dirA, dirN, semilla=4, muestreo=muestreo, replicas=2)
+        m = psa_monte_carlo("Modelo 1", men, 1024, gamma, dirA, dirN, semilla=4, muestreo=muestreo, replicas=2)
+        assert np.allclose(a["AIP_total"], m["AIP_total"]) and np.allclose(a["SPF_final"], m["SPF_final"])
+    esp = EspacioPSA(compilar(men), gamma, dirA, dirN, agrupar_dirichlet="anio")
+    assert esp.nombres[-1] == "shares:nuevo:año 3"
+    import pytest
+    with pytest.raises(ValueError, match="para 3 años"):
+        psa_monte_carlo("Modelo 1", men, 10, gamma, dirA*12, dirN, semilla=4)
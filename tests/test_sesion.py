@@ -0,0 +1,66 @@
+import io, time
+import numpy as np
+import pytest
+from aip.core import ejecutar_modelo
+from aip.sensitivity import dsa_univariado, psa_monte_carlo, psa_streaming
+from aip.sesion import Sesion, cargar_sesion, guardar_sesion, sesion_a_bytes
+from benchmarks.escenarios import generar_config_psa, generar_inputs, generar_variaciones
+from test_sensitivity import _ins, _config
+
+def test_sesion_ida_y_vuelta(tmp_path):
+    ins = _ins(); ins.estrategias[0].multiplicador_cohortes = {"B": 1.2, "Otra": 3.0}
+    ins.periodos_por_anio, ins.tasa_descuento = 1, 0.03
+    gamma, dirA, dirN = _config(ins)
+    psa = {"nsims": 2000, "gamma_k_theta": gamma, "dirichlet_alpha_actual": dirA, "dirichlet_alpha_nuevo": dirN,
+           "lognorm_rr": {"costos": (0.0, 0.1)}, "semilla": 7}
+    variaciones = {"estrategia:Comp:costo_ts": (700.0, 900.0)}
+    acc = psa_streaming("Modelo 1", ins, 2000, gamma, dirA, dirN, semilla=7)
+    res = {"tabla": ejecutar_modelo("Modelo 1", ins)["tabla"], "PSA": acc, "DSA": dsa_univariado("Modelo 1", ins, variaciones),
+           "sims": psa_monte_carlo("Modelo 1", ins, 500, gamma, dirA, dirN, semilla=1)}
+    guardar_sesion(str(tmp_path / "caso.aip"), Sesion(ins, "Modelo 1", {"dsa": variaciones, "psa": psa}, res))
+    s = cargar_sesion(str(tmp_path / "caso.aip"))
+    assert s.inputs == ins and s.modelo == "Modelo 1"
+    assert s.config == {"dsa": variaciones, "psa": psa} and isinstance(s.config["psa"]["gamma_k_theta"]["estrategia:Comp:costo_ts"], tuple)
+    assert s.resultados["PSA"].resumen().equals(acc.resumen())
+    for k in ("tabla", "DSA", "sims"):
+        assert s.resultados[k].equals(res[k])
+    assert s.resultados["sims"].attrs == res["sims"].attrs
+    # el PSA guardado reproduce el resultado
+    cfg = dict(s.config["psa"])
+    otro = psa_streaming(s.modelo, s.inputs, cfg.pop("nsims"), cfg.pop("gamma_k_theta"), cfg.pop("dirichlet_alpha_actual"),
+                         cfg.pop("dirichlet_alpha_nuevo"), **cfg)
+    assert otro.resumen().equals(psa_streaming("Modelo 1", ins, 2000, gamma, dirA, dirN, lognorm_rr={"costos": (0.0, 0.1)}, semilla=7).resumen())
+
+def test_sesion_grande_carga_rapida_y_formato_seguro():
+    ins = generar_inputs(30, 100, 10)
+    gamma, dirA, dirN, rr = generar_config_psa(ins)
+    psa = {"nsims": 5000, "gamma_k_theta": gamma, "dirichlet_alpha_actual": dirA, "dirichlet_alpha_nuevo": dirN,
+           "lognorm_rr": rr, "semilla": 0}
+    acc = psa_streaming("Modelo 2", ins, 5000, gamma, dirA, dirN, rr, semilla=0)
+    datos = sesion_a_bytes(Sesion(ins, config={"dsa": generar_variaciones(ins, 100), "psa": psa},
+                                  resultados={"PSA": acc, "tabla": ejecutar_modelo("Modelo 2", ins)["tabla"]}))
+    assert len(datos) < 200_000
+    cargar_sesion(datos)
+    t0 = time.perf_counter()
+    s = cargar_sesion(datos)
+    assert time.perf_counter() - t0 < 0.25
+    assert s.inputs == ins and s.resultados["PSA"].n == 5000
+    with pytest.raises(ValueError, match="No es un archivo de sesión"):
+        cargar_sesion(b"no es un npz")
+    buf = io.BytesIO(); np.savez(buf, meta=np.frombuffer(b'{"formato":"aip-sesion","version":99}', dtype=np.uint8))
+    with pytest.raises(ValueError, match="versión más nueva"):
+        cargar_sesion(buf.getvalue())
+    with pytest.raises(TypeError):
+        sesion_a_bytes(Sesion(ins, resultados={"x": object()}))
+
+def test_lote_desde_sesion(tmp_path):
+    import json
+    from aip.batch import main
+    ins = _ins(); gamma, dirA, dirN = _config(ins)
+    psa = {"nsims": 1000, "gamma_k_theta": gamma, "dirichlet_alpha_actual": dirA, "dirichlet_alpha_nuevo": dirN, "semilla": 2}
+    guardar_sesion(str(tmp_path / "caso.aip"), Sesion(ins, config={"psa": psa}))
+    (tmp_path / "esc.jsonl").write_text(json.dumps({"id": "caro", "cambios": {"estrategia:Interv:costo_ts": 2000}}) + "\n")
+    assert main([str(tmp_path / "esc.jsonl"), "-o", str(tmp_path / "r.jsonl"), "--base", str(tmp_path / "caso.aip"),
+                 "--psa", str(tmp_path / "caso.aip")]) == 0
+    r = json.loads((tmp_path / "r.jsonl").read_text())
+    assert r["AIP_total"] > ejecutar_modelo("Modelo 2", ins)["AIP_total"] and r["psa"]["AIP_total"]["count"] == 1000
@@ -0,0 +1,57 @@
+import numpy as np
+from aip.core import compilar
+from aip.sobol import sobol_indices
+from test_sensitivity import _ins
+
+def test_sobol_modelo_lineal_analitico():
+    # con shares fijas, AIP_total es lineal en los costos: S1 = ST = b_i^2 Var(X_i) / sum_j b_j^2 Var(X_j)
+    ins = _ins(); c = compilar(ins)
+    gamma = {"estrategia:Comp:costo_ts": (20.0, 40.0), "estrategia:Interv:costo_ts": (50.0, 20.0)}
+    f = c.factor_cohortes
+    b = np.array([-(c.shares_actual[0]*c.cobertura_actual*c.poblacion).sum() + (c.shares_nuevo[0]*c.cobertura_nuevo*c.poblacion).sum(),
+                  -(c.shares_actual[1]*c.cobertura_actual*c.poblacion).sum() + (c.shares_nuevo[1]*c.cobertura_nuevo*c.poblacion).sum()]) * f
+    var = np.array([20*40.0**2, 50*20.0**2])
+    esperado = b**2*var / (b**2*var).sum()
+    df = sobol_indices("Modelo 1", ins, 4096, gamma, semilla=3, n_bootstrap=100).set_index("Factor")
+    for k, e in zip(gamma, esperado):
+        assert abs(df.loc[k, "S1"] - e) < 0.05 and abs(df.loc[k, "ST"] - e) < 0.05
+        assert df.loc[k, "ST_inf"] <= df.loc[k, "ST"] <= df.loc[k, "ST_sup"]
+
+def test_sobol_con_dirichlet_y_rr():
+    ins = _ins()
+    gamma = {f"estrategia:{e.nombre}:costo_ts": (100.0, e.costo_ts/100) for e in ins.estrategias}
+    dirA = [{e: 20.0*ins.shares_actual[e][t] for e in ins.shares_actual} for t in range(ins.horizonte)]
+    df = sobol_indices("Modelo 1", ins, 512, gamma, dirA, None, {"costos": (0.0, 0.2)}, semilla=1,
+                       agrupar_dirichlet="anio", n_bootstrap=50)
+    assert set(df["Factor"]) == set(gamma) | {f"shares:actual:año {t}" for t in (1,2,3)} | {"rr:costos"}
+    assert np.all(np.isfinite(df[["S1","ST"]].values))
+
+def test_sobol_no_depende_de_tam_lote():
+    # los bloques A/B/AB_i se arman sobre la marcha: lotes que cruzan bloques dan el mismo resultado
+    ins = _ins()
+    gamma = {f"estrategia:{e.nombre}:costo_ts": (100.0, e.costo_ts/100) for e in ins.estrategias}
+    dirA = [{e: 20.0*ins.shares_actual[e][t] for e in ins.shares_actual} for t in range(ins.horizonte)]
+    kw = dict(dirichlet_alpha_actual=dirA, lognorm_rr={"costos": (0.0, 0.2)}, semilla=5, n_bootstrap=20)
+    a = sobol_indices("Modelo 1", ins, 64, gamma, tam_lote=37, **kw)
+    b = sobol_indices("Modelo 1", ins, 64, gamma, **kw)
+    assert np.allclose(a[["S1","ST"]].values, b[["S1","ST"]].values)
+
+def test_sobol_memoria_del_bootstrap_no_crece_con_d():
+    # el bootstrap se reduce remuestreo a remuestreo: con 4 o 10 factores el pico es casi el mismo
+    import tracemalloc
+    ins = _ins()
+    gamma = {f"estrategia:{e.nombre}:{c}": (100.0, getattr(e, c)/100 or 1.0)
+             for e in ins.estrategias for c in ("costo_ts", "costo_procedimientos")}
+    dirA = [{e: 20.0*ins.shares_actual[e][t] for e in ins.shares_actual} for t in range(ins.horizonte)]
+    dirN = [{e: 20.0*ins.shares_nuevo[e][t] for e in ins.shares_nuevo} for t in range(ins.horizonte)]
+    picos = []
+    for kw in ({}, dict(dirichlet_alpha_actual=dirA, dirichlet_alpha_nuevo=dirN, agrupar_dirichlet="anio")):
+        tracemalloc.start()
+        try:
+            df = sobol_indices("Modelo 1", ins, 512, gamma, semilla=2, n_bootstrap=400, **kw)
+            picos.append(tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+    assert len(df) == 10
+    # materializar el bootstrap costaría ~3 x 6 factores x 400 x 512 x 8 B ≈ 30 MB más
+    assert picos[1] - picos[0] < 3 * 2**20